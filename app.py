@@ -1,14 +1,30 @@
 import streamlit as st
-import streamlit.components.v1 as components
-import pandas as pd
+import numpy as np
 import json
-import urllib.request
+import asyncio
+import collections
+import http.client
 import urllib.parse
+import os
 import datetime
-import math
 import ssl
 import warnings
 import time
+import threading
+import heapq
+import random
+import functools
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+
+from matsuri import (CIRCUIT_STATE_VALUES, DEPTH_MODES, JCG_POINTS, RESPONSE_STORE_MAX_AGE_SEC,
+                     SST_SEARCH_OFFSETS, CircuitBreaker, CircuitOpenError, Metrics, ResponseStore, SingleFlight,
+                     TideSource, TideTable, adopt_search_sst, assemble_station_batch, build_forecast_frames,
+                     calc_strategy_all_depths, calculate_best_seat, calculate_matsuri_score, copy_payload, current_sst,
+                     data_age_sec, daylight_timeline, deg_to_cardinal, fetch_jcg_tide_table, find_fixed_key,
+                     get_hybrid_tide_data, get_nearest_port, get_score_comment, get_size_label, has_sst_at,
+                     load_harmonic_tide_tables, parse_open_meteo, payload_from_json, start_metrics_server, station_batch_from_json,
+                     station_batch_points, tide_alignment, weather_to_json)
 
 # GPS取得用ライブラリ
 try:
@@ -22,8 +38,14 @@ warnings.filterwarnings("ignore")
 st.set_page_config(page_title="魔釣Pro - 海況戦術盤", page_icon="⚓️")
 
 # --- CSS ---
-st.markdown("""
-    <style>
+# 静的なので、コメントと空白を詰めたものを起動時に1回だけ作る。.streamlit/config.toml の minCachedMessageSize より大きいので、
+# 同じセッションの2回目以降の全体の再実行ではブラウザのキャッシュを指すハッシュだけが送られる
+# (送るのは main() の最初。フラグメントの再実行では送らない)
+def _minify_css(css):
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    return re.sub(r"\s+", " ", css).strip()
+
+APP_CSS = _minify_css("""
     .big-font { font-size: 20px !important; font-weight: bold; color: #2c3e50; }
     .rec-box { border: 2px solid #e74c3c; padding: 10px; border-radius: 10px; background-color: #fff5f5; text-align: center; }
     .rec-title { font-size: 16px; color: #c0392b; font-weight: bold; margin-bottom: 5px; }
@@ -84,101 +106,240 @@ st.markdown("""
     .size-l { background-color: #e74c3c; } /* 赤 (大) */
     .size-m { background-color: #3498db; } /* 青 (中) */
     .size-s { background-color: #2ecc71; } /* 緑 (小) */
-    </style>
-""", unsafe_allow_html=True)
-
-# --- 定数 (主要海峡の座標とURL) ---
-JCG_POINTS = {
-    "akashi": {
-        "name": "明石海峡",
-        "lat": 34.616, "lon": 135.021,
-        "url": "https://www1.kaiho.mlit.go.jp/KAN5/tyouryuu/stream_akashi.html",
-        "offset_min": 0, "ref_key": "akashi"
-    },
-    "naruto": {
-        "name": "鳴門海峡",
-        "lat": 34.238, "lon": 134.653,
-        "url": "https://www1.kaiho.mlit.go.jp/KAN5/tyouryuu/stream_naruto.html",
-        "offset_min": 0, "ref_key": "naruto"
-    },
-    "tomogashima": {
-        "name": "友ヶ島水道",
-        "lat": 34.283, "lon": 135.003,
-        "url": "https://www1.kaiho.mlit.go.jp/KAN5/tyouryuu/stream_tomogashima.html",
-        "offset_min": 0, "ref_key": "tomogashima"
-    },
-    "shodoshima": {
-        "name": "小豆島 (播磨灘)",
-        "lat": 34.480, "lon": 134.350, 
-        "url": None, 
-        "offset_min": 60, 
-        "ref_key": "akashi"
-    },
-    "seto_ohashi": {
-        "name": "瀬戸大橋 (備讃瀬戸)",
-        "lat": 34.396, "lon": 133.813, 
-        "url": None, 
-        "offset_min": 120, 
-        "ref_key": "akashi"
-    }
-}
-
-RELIABLE_SST_POINTS = {
-    "akashi": {"lat": 34.580, "lon": 135.000}, 
-    "naruto": {"lat": 34.230, "lon": 134.700}, 
-    "tomogashima": {"lat": 34.350, "lon": 135.000}, 
-    "shodoshima": {"lat": 34.450, "lon": 134.300},
-    "seto_ohashi": {"lat": 34.380, "lon": 133.800}
-}
-
-DEFAULT_LAT = 34.616
-DEFAULT_LON = 135.021
-
-# --- 関数群 ---
-def deg_to_cardinal(d):
-    dirs = ["北", "北北東", "北東", "東北東", "東", "東南東", "南東", "南南東", 
-            "南", "南南西", "南西", "西南西", "西", "西北西", "北西", "北北西"]
-    idx = int((d + 11.25) / 22.5)
-    return dirs[idx % 16]
-
-def get_nearest_port(lat, lon):
-    min_dist = float('inf')
-    nearest_key = "akashi"
-    for key, data in JCG_POINTS.items():
-        dist = math.sqrt((lat - data["lat"])**2 + (lon - data["lon"])**2)
-        if dist < min_dist:
-            min_dist = dist
-            nearest_key = key
-    km_dist = min_dist * 111
-    return JCG_POINTS[nearest_key], km_dist, nearest_key
-
-def calculate_historical_sst_precise(now_dt):
-    monthly_temps = {
-        1: 12.0, 2: 9.5, 3: 10.5, 4: 13.5, 5: 17.5, 6: 21.0,
-        7: 25.0, 8: 27.5, 9: 26.0, 10: 22.5, 11: 18.5, 12: 15.0
-    }
-    month = now_dt.month
-    day = now_dt.day
-    hour = now_dt.hour
-    
-    current_val = monthly_temps[month]
-    if day < 15:
-        prev_month = month - 1 if month > 1 else 12
-        prev_val = monthly_temps[prev_month]
-        ratio = (day + 15) / 30.0
-        base_temp = prev_val + (current_val - prev_val) * ratio
-    else:
-        next_month = month + 1 if month < 12 else 1
-        next_val = monthly_temps[next_month]
-        ratio = (day - 15) / 30.0
-        base_temp = current_val + (next_val - current_val) * ratio
-        
-    diurnal_variation = 0.3 * math.sin(((hour - 9) / 24.0) * 2 * math.pi)
-    final_temp = base_temp + diurnal_variation
-    return round(final_temp, 1)
-
-def fetch_open_meteo(lat, lon, retries=2):
-    url = "https://api.open-meteo.com/v1/forecast"
+""")
+
+# --- キャッシュ設定 ---
+WEATHER_TTL_SEC = 300
+TIDE_TTL_SEC = 1800
+REFRESH_AHEAD_RATIO = 0.8   # TTLの8割が経過した時点で裏で先回り更新
+REFRESH_JITTER_RATIO = 0.05 # 全地点が同時に期限切れにならないよう少しずらす
+REFRESH_RETRY_SEC = 30      # 取得失敗時の再試行間隔
+REFRESH_COLD_WAIT_SEC = 15  # 起動直後、初回の先回り取得を待つ上限
+
+# 計算済みの盤面の共有: 現在の潮は分単位で変わるので、同じ元データでもこの秒数で作り直す
+BOARD_CACHE_TTL_SEC = 60
+BOARD_CACHE_MAX_ENTRIES = 2048
+
+# GPS座標はOpen-Meteoのモデル解像度 (気象庁MSM 約5km) のグリッドに丸めて共有する
+WEATHER_GRID_DEG = float(os.environ.get("MATSURI_WEATHER_GRID_DEG", "0.05"))
+WEATHER_GRID_MAX_CELLS = 4096
+
+DEFAULT_DEPTH_MODE = "45m"
+
+SST_PROBE_WORKERS = len(SST_SEARCH_OFFSETS)
+SHARED_FETCH_POLL_SEC = 0.05  # 共有の取得を待つ間に、呼び出し側のキャンセルを確かめる間隔
+SST_LABELS = {"local": "📡 解析値", "search": "🔭 周辺補完", "none": "⚠️ 統計値 (推計)"}
+
+# 非同期I/O: ホストごとの同時接続数 (相手サーバーに負荷をかけない範囲で)
+HTTP_HOST_CONCURRENCY = {"api.open-meteo.com": 8, "www1.kaiho.mlit.go.jp": 3}
+HTTP_DEFAULT_CONCURRENCY = 4
+HTTP_POOL_WORKERS = 16       # keep-alive 接続を持つI/Oスレッドの数 (= 接続プールの大きさ)
+HTTP_LATENCY_WINDOW = 200    # ホストごとに直近何件の応答時間を残すか
+
+# 1回の描画で取得を待つ上限。超えたら前回の取得分で描き、取得は裏で続けて次の描画で使う
+RENDER_FETCH_BUDGET_SEC = float(os.environ.get("MATSURI_RENDER_BUDGET_SEC", "3.0"))
+
+# 計測: 指定があればこのポートで Prometheus 形式の /metrics を公開する (0 なら公開しない)
+METRICS_PORT = int(os.environ.get("MATSURI_METRICS_PORT", "0"))
+
+# --- 計測 (全セッション共通のヒストグラムとカウンタ) ---
+@st.cache_resource
+def get_metrics():
+    metrics = Metrics()
+    metrics.describe("render_stage", "main() の段階ごとの所要時間")
+    metrics.describe("time_to_first_board", "描画開始から魔釣指数の表示まで")
+    metrics.describe("render_total", "1回の描画全体")
+    metrics.describe("upstream_request", "外部APIへの1リクエストの応答時間")
+    metrics.describe("fetch", "取得処理 (再試行・パースを含む)")
+    metrics.describe("parse", "レスポンスのパース")
+    metrics.describe("sst_search", "周辺水温探索の合計")
+    metrics.describe("upstream_responses", "外部APIの応答 (ステータス別)")
+    metrics.describe("upstream_retries", "取得の再試行")
+    metrics.describe("upstream_failures", "再試行しても取れなかった取得")
+    metrics.describe("cache_requests", "キャッシュの参照 (hit/miss/stale)")
+    metrics.describe("board_cache_entries", "共有キャッシュにある計算済みの盤面")
+    metrics.describe("circuit_state", "上流ごとのサーキットブレーカー (0: 通常 / 1: 試行中 / 2: 遮断)")
+    metrics.describe("circuit_rejections", "遮断中のため送らなかったリクエスト")
+    metrics.describe("upstream_timeout", "上流ごとの現在のタイムアウト (秒, 応答時間から調整)")
+    metrics.describe("render_fallbacks", "予算切れ・取得失敗のため前回の取得分で描いた回数")
+    metrics.describe("coalesced_waits", "同じ取得・計算が実行中だったので、その結果を待った呼び出し")
+    if METRICS_PORT:
+        try:
+            start_metrics_server(metrics, METRICS_PORT)
+        except OSError:
+            pass  # 同じポートを別プロセスが使っている (そちらで公開済み)
+    return metrics
+
+# --- HTTP (I/Oスレッドごとに HTTPS 接続を使い回す) ---
+_http_local = threading.local()
+
+class HTTPStatusError(http.client.HTTPException):
+    def __init__(self, status, url):
+        super().__init__(f"HTTP {status} {url}")
+        self.status = status
+
+def _insecure_ssl_context():
+    ctx = ssl.create_default_context()
+    ctx.check_hostname = False
+    ctx.verify_mode = ssl.CERT_NONE
+    return ctx
+
+def http_get(url, timeout=None):
+    # どのスレッドから呼んでも非同期I/O層を通す (ホスト別の同時接続数制限・遮断と応答時間の記録)
+    # timeout を省くと、そのホストの最近の応答時間から決めたタイムアウト
+    return get_async_io().submit(get_async_io().get(url, timeout)).result()
+
+def _http_get_blocking(url, timeout):
+    parts = urllib.parse.urlsplit(url)
+    conns = getattr(_http_local, "conns", None)
+    if conns is None:
+        conns = _http_local.conns = {}
+    path = parts.path + (f"?{parts.query}" if parts.query else "")
+    for attempt in range(2):
+        conn = conns.get(parts.netloc)
+        reused = conn is not None
+        if conn is None:
+            conn = conns[parts.netloc] = http.client.HTTPSConnection(parts.netloc, timeout=timeout, context=_insecure_ssl_context())
+        elif conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        try:
+            conn.request("GET", path, headers={"Connection": "keep-alive"})
+            res = conn.getresponse()
+            body = res.read()
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            conn.close()
+            del conns[parts.netloc]
+            # 相手に切られていた使い回し接続なら、張り直して一度だけやり直す
+            if reused and attempt == 0: continue
+            raise
+        except Exception:
+            conn.close()
+            del conns[parts.netloc]
+            raise
+        if res.status != 200:
+            raise HTTPStatusError(res.status, url)
+        return body
+
+# --- 非同期I/O層 (裏スレッドのイベントループ1つを全セッションで共有) ---
+class AsyncIO:
+    def __init__(self, pool_workers=HTTP_POOL_WORKERS, metrics=None):
+        self.loop = asyncio.new_event_loop()
+        self.metrics = metrics
+        # ブロッキングな http.client 呼び出し用。スレッドごとに keep-alive 接続を持つので接続プールを兼ねる
+        self._http_pool = ThreadPoolExecutor(max_workers=pool_workers, thread_name_prefix="matsuri-http")
+        # 取得処理 (キャッシュ判定なども含む) を丸ごと載せる用。HTTP 用と分けてデッドロックを防ぐ
+        self._task_pool = ThreadPoolExecutor(max_workers=pool_workers, thread_name_prefix="matsuri-io-task")
+        # 先回り更新用。描画側の取得が先回り更新の完了を待つので、同じプールに載せない
+        self._refresh_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="matsuri-refresh-job")
+        self._limits = {}
+        self._breakers = {}
+        self._latency = {}
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="matsuri-io", daemon=True)
+        self._thread.start()
+
+    def _limit(self, host):
+        # ループのスレッドからだけ呼ぶ
+        sem = self._limits.get(host)
+        if sem is None:
+            sem = self._limits[host] = asyncio.Semaphore(HTTP_HOST_CONCURRENCY.get(host, HTTP_DEFAULT_CONCURRENCY))
+        return sem
+
+    def breaker(self, host):
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is None: breaker = self._breakers[host] = CircuitBreaker(host)
+            return breaker
+
+    def breakers(self):
+        with self._lock:
+            return dict(self._breakers)
+
+    async def get(self, url, timeout=None):
+        host = urllib.parse.urlsplit(url).netloc
+        breaker = self.breaker(host)
+        try:
+            breaker.before_call()
+        except CircuitOpenError:
+            if self.metrics is not None: self.metrics.inc("circuit_rejections", host=host)
+            raise
+        if timeout is None: timeout = breaker.timeout()
+        async with self._limit(host):
+            t0 = time.perf_counter()
+            status = "error"
+            try:
+                body = await self.loop.run_in_executor(self._http_pool, _http_get_blocking, url, timeout)
+                status = 200
+                return body
+            except HTTPStatusError as e:
+                status = e.status
+                raise
+            except TimeoutError:
+                status = "timeout"
+                raise
+            finally:
+                elapsed = time.perf_counter() - t0
+                # 4xx (429 を除く) は相手が応答できているので失敗に数えない
+                if status == 200 or (isinstance(status, int) and status < 500 and status != 429):
+                    breaker.record_success(elapsed)
+                else:
+                    breaker.record_failure()
+                self._record(host, elapsed, status)
+
+    async def _call(self, pool, fn, args):
+        return await self.loop.run_in_executor(pool, functools.partial(fn, *args))
+
+    def submit(self, coro):
+        # concurrent.futures.Future を返す (スクリプトのスレッドからは .result() で待つ)
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("イベントループのスレッドからは待てません")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call(self, fn, *args):
+        # ブロッキングな取得処理をまとめて走らせる
+        return self.submit(self._call(self._task_pool, fn, args))
+
+    def refresh(self, fn, *args):
+        return self.submit(self._call(self._refresh_pool, fn, args))
+
+    def _record(self, host, elapsed_sec, status):
+        with self._lock:
+            samples = self._latency.get(host)
+            if samples is None:
+                samples = self._latency[host] = collections.deque(maxlen=HTTP_LATENCY_WINDOW)
+            samples.append((elapsed_sec * 1000, status == 200))
+        if self.metrics is not None:
+            self.metrics.observe("upstream_request", elapsed_sec, host=host)
+            self.metrics.inc("upstream_responses", host=host, status=status)
+
+    def latency_stats(self):
+        with self._lock:
+            snapshot = {host: list(samples) for host, samples in self._latency.items()}
+        stats = {}
+        for host, samples in snapshot.items():
+            ms = np.array([s[0] for s in samples])
+            stats[host] = {
+                "count": len(samples), "errors": sum(1 for s in samples if not s[1]),
+                "p50_ms": round(float(np.percentile(ms, 50)), 1), "p95_ms": round(float(np.percentile(ms, 95)), 1),
+                "max_ms": round(float(ms.max()), 1), "last_ms": round(float(ms[-1]), 1),
+            }
+        for host, breaker in self.breakers().items():
+            if host in stats: stats[host].update(circuit=breaker.state, timeout_sec=breaker.timeout())
+        return stats
+
+@st.cache_resource
+def get_async_io():
+    metrics = get_metrics()
+    aio = AsyncIO(metrics=metrics)
+    metrics.gauge("circuit_state", lambda: {(("host", h),): CIRCUIT_STATE_VALUES[b.state] for h, b in aio.breakers().items()})
+    metrics.gauge("upstream_timeout", lambda: {(("host", h),): b.timeout() for h, b in aio.breakers().items()})
+    return aio
+
+OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast"
+OPEN_METEO_HOST = urllib.parse.urlsplit(OPEN_METEO_URL).netloc
+
+def _open_meteo_url(lat, lon):
+    # lat/lon はカンマ区切りの複数地点も可 (その場合は地点ごとのリストが返る)
     params = {
         "latitude": lat,
         "longitude": lon,
@@ -186,374 +347,599 @@ def fetch_open_meteo(lat, lon, retries=2):
         "hourly": "sea_surface_temperature,wind_speed_10m,wind_direction_10m,weather_code,rain,cloud_cover",
         "daily": "sunrise,sunset",
         "timezone": "Asia/Tokyo",
-        "forecast_days": 2,
+        "forecast_days": 3,
         "wind_speed_unit": "ms"
     }
-    req_url = f"{url}?{urllib.parse.urlencode(params)}"
-    req = urllib.request.Request(req_url)
-    ctx = ssl.create_default_context()
-    ctx.check_hostname = False
-    ctx.verify_mode = ssl.CERT_NONE
-    
+    return f"{OPEN_METEO_URL}?{urllib.parse.urlencode(params, safe=',')}"
+
+def _fetch_json(req_url, retries=2, cancel=None, source="open_meteo"):
+    metrics = get_metrics()
     for i in range(retries):
+        if cancel is not None and cancel.is_set(): return None
         try:
-            with urllib.request.urlopen(req, context=ctx, timeout=10) as res:
-                return json.loads(res.read().decode())
-        except Exception as e:
+            body = http_get(req_url)
+            with metrics.span("parse", source=source):
+                return parse_open_meteo(body)
+        except CircuitOpenError:
+            return None  # 遮断中は再試行せずにすぐ諦める (呼び出し側は前回の取得分で描く)
+        except Exception:
             if i < retries - 1:
-                time.sleep(1) 
+                metrics.inc("upstream_retries", source=source)
+                # キャンセルされたら待たずに抜ける
+                if cancel is not None:
+                    if cancel.wait(1): return None
+                else:
+                    time.sleep(1)
             else:
+                metrics.inc("upstream_failures", source=source)
                 return None
 
-@st.cache_data(ttl=300) 
-def get_current_weather(lat, lon):
-    fixed_key = None
-    for key, pt in JCG_POINTS.items():
-        if abs(lat - pt["lat"]) < 0.001 and abs(lon - pt["lon"]) < 0.001:
-            fixed_key = key
-            break
+def fetch_open_meteo(lat, lon, retries=2, cancel=None):
+    with get_metrics().span("fetch", source="open_meteo"):
+        data = _fetch_json(_open_meteo_url(lat, lon), retries=retries, cancel=cancel)
+    if data is not None: data["fetched_at"] = time.time()
+    return data
+
+def fetch_open_meteo_batch(points, retries=2):
+    # 複数地点を1リクエストでまとめて取得し、points と同じ並びで返す
+    if not points: return []
+    lats = ",".join(f"{lat:.4f}" for lat, _ in points)
+    lons = ",".join(f"{lon:.4f}" for _, lon in points)
+    with get_metrics().span("fetch", source="open_meteo_batch"):
+        payload = _fetch_json(_open_meteo_url(lats, lons), retries=retries, source="open_meteo_batch")
+    if payload is None: return None
+    if isinstance(payload, dict): payload = [payload]
+    if len(payload) != len(points): return None
+    fetched_at = time.time()
+    for data in payload: data["fetched_at"] = fetched_at
+    return payload
+
+def fetch_current_weather(lat, lon, fetch=fetch_open_meteo, probe_fetch=None):
+    fixed_key = find_fixed_key(lat, lon)
 
     fetch_lat = lat
     fetch_lon = lon
     
-    if fixed_key and fixed_key in RELIABLE_SST_POINTS:
-        fetch_lat = RELIABLE_SST_POINTS[fixed_key]['lat']
-        fetch_lon = RELIABLE_SST_POINTS[fixed_key]['lon']
+    if fixed_key:
+        fetch_lat = JCG_POINTS[fixed_key].sst_lat
+        fetch_lon = JCG_POINTS[fixed_key].sst_lon
 
-    base_data = fetch_open_meteo(fetch_lat, fetch_lon)
+    base_data = fetch(fetch_lat, fetch_lon)
     if not base_data: return None
+    base_data = copy_payload(base_data)
 
-    current_hour = datetime.datetime.now(datetime.timezone(datetime.timedelta(hours=9))).hour
-    hourly = base_data.get("hourly", {})
-    sst_list = hourly.get("sea_surface_temperature", [])
+    now = datetime.datetime.now(datetime.timezone(datetime.timedelta(hours=9)))
     
     has_sst = False
-    if sst_list and current_hour < len(sst_list) and sst_list[current_hour] is not None:
+    if has_sst_at(base_data, now):
         has_sst = True
         base_data["sst_source"] = "search" if fixed_key else "local"
     
-    if not has_sst and not fixed_key:
-        search_offsets = [
-            (-0.02, 0.00), (-0.05, 0.00), (-0.03, 0.03), (-0.03, -0.03), (0.00, 0.05)
-        ]
-        for d_lat, d_lon in search_offsets:
-            search_lat = lat + d_lat
-            search_lon = lon + d_lon
-            search_data = fetch_open_meteo(search_lat, search_lon)
-            if search_data:
-                s_sst_list = search_data["hourly"].get("sea_surface_temperature", [])
-                if s_sst_list and current_hour < len(s_sst_list) and s_sst_list[current_hour] is not None:
-                    base_data["hourly"]["sea_surface_temperature"] = s_sst_list
-                    base_data["hourly"]["cloud_cover"] = search_data["hourly"].get("cloud_cover", [])
-                    base_data["sst_source"] = "search"
-                    has_sst = True
-                    break
+    # Open-Meteo が遮断中なら周辺探索はせず、統計値で補う
+    if not has_sst and not fixed_key and get_async_io().breaker(OPEN_METEO_HOST).allows():
+        search_data, timings = probe_sst_neighbours(lat, lon, now, fetch=probe_fetch or fetch)
+        base_data["sst_probe_timings"] = timings
+        if search_data:
+            adopt_search_sst(base_data, search_data)
+            has_sst = True
     
     if not has_sst:
         base_data["sst_source"] = "none"
 
     return base_data
 
-def get_moon_age_simple(date):
-    year, month, day = date.year, date.month, date.day
-    if month < 3: year -= 1; month += 12
-    p = math.floor(year / 4)
-    age = (year + p + month * 9 / 25 + day + 11) % 30
-    return age
+# --- 定点の一括取得 (全定点・代替SST地点・周辺探索点を1往復で) ---
+def fetch_station_weather_batch():
+    payloads = fetch_open_meteo_batch(station_batch_points())
+    if payloads is None: return None
+    return assemble_station_batch(payloads, datetime.datetime.now(datetime.timezone(datetime.timedelta(hours=9))))
 
-@st.cache_data(ttl=1800)
-def get_jcg_tide_data(target_url):
-    try:
-        try: import lxml
-        except ImportError: return None 
-        ctx = ssl.create_default_context()
-        ctx.check_hostname = False
-        ctx.verify_mode = ssl.CERT_NONE
-        dfs = pd.read_html(target_url, encoding='shift_jis')
-        if dfs: return dfs[0]
-        return None
-    except Exception: return None
-
-def parse_jcg_data(df, current_hour, current_min):
-    if df is None: return None, None, False
-    try:
-        target_time = current_hour * 60 + current_min
-        best_diff = 9999
-        knot = 0.0
-        direction = "不明"
-        for index, row in df.iterrows():
-            try:
-                h = int(row[0])
-                m = int(row[1])
-                spd = float(row[3])
-                dr = str(row[2])
-                row_time = h * 60 + m
-                diff = abs(target_time - row_time)
-                if diff < best_diff:
-                    best_diff = diff
-                    knot = spd
-                    direction = dr
-            except: continue
-        return knot, direction, True
-    except Exception: return None, None, False
-
-def get_hybrid_tide_data(target_datetime, now_datetime, port_info):
-    ref_dt = target_datetime - datetime.timedelta(minutes=port_info["offset_min"])
-    ref_port_key = port_info["ref_key"]
-    ref_url = JCG_POINTS[ref_port_key]["url"]
-    is_same_day_as_source = (ref_dt.day == now_datetime.day)
-    
-    success = False
-    knot = 0.0
-    dr_text = ""
-    
-    if is_same_day_as_source and ref_url:
-        df = get_jcg_tide_data(ref_url)
-        knot, dr_text, success = parse_jcg_data(df, ref_dt.hour, ref_dt.minute)
-    
-    if success:
-        is_rising = ("西" in dr_text) or ("北" in dr_text)
-        tide_factor = min(knot / 6.0, 1.0) 
-        return tide_factor, is_rising, knot, True 
-    else:
-        moon_age = get_moon_age_simple(ref_dt)
-        tide_factor, is_rising, knot = estimate_tide_current_logic(moon_age, ref_dt.hour + ref_dt.minute/60)
-        return tide_factor, is_rising, knot, False 
-
-def estimate_tide_current_logic(moon_age, hour):
-    high_tide_base = 8.5
-    delay = 0.8
-    high_tide_time = (high_tide_base + (moon_age % 15) * delay) % 12
-    diff = abs(hour - high_tide_time)
-    if diff > 6: diff = 12 - diff 
-    current_speed_factor = math.sin(diff * (math.pi / 6))
-    is_rising = True
-    if (high_tide_time - 6) < hour < high_tide_time: is_rising = True 
-    else: is_rising = False 
-    norm_age = moon_age % 15
-    if norm_age <= 2 or norm_age >= 13: max_knot = 5.5
-    elif 3 <= norm_age <= 5 or 10 <= norm_age <= 12: max_knot = 3.5
-    else: max_knot = 2.0
-    estimated_knot = max_knot * current_speed_factor
-    return current_speed_factor, is_rising, estimated_knot
-
-def calculate_best_seat(wind_dir, tide_dir_deg):
-    boat_heading = wind_dir
-    tide_from_deg = (tide_dir_deg + 180) % 360
-    relative_angle = (tide_from_deg - boat_heading) % 360
-    seat_name = "判定中"; seat_code = "none" 
-    if 337.5 <= relative_angle or relative_angle < 22.5: seat_name = "ミヨシ (船首)"; seat_code = "m_center"
-    elif 22.5 <= relative_angle < 67.5: seat_name = "右ミヨシ"; seat_code = "m_right"
-    elif 67.5 <= relative_angle < 112.5: seat_name = "右舷 (胴の間)"; seat_code = "c_right"
-    elif 112.5 <= relative_angle < 157.5: seat_name = "右トモ"; seat_code = "t_right"
-    elif 157.5 <= relative_angle < 202.5: seat_name = "トモ (船尾)"; seat_code = "t_center"
-    elif 202.5 <= relative_angle < 247.5: seat_name = "左トモ"; seat_code = "t_left"
-    elif 247.5 <= relative_angle < 292.5: seat_name = "左舷 (胴の間)"; seat_code = "c_left"
-    elif 292.5 <= relative_angle < 337.5: seat_name = "左ミヨシ"; seat_code = "m_left"
-    return seat_name, seat_code
-
-def calculate_matsuri_score(tide_factor, is_synced, wind_spd, temp, rain):
-    score = 5.0 
-    if tide_factor > 0.7: score += 2.5
-    elif tide_factor > 0.4: score += 1.0
-    elif tide_factor < 0.2: score -= 3.0
-    if is_synced: score += 2.0
-    else: score -= 1.0
-    if 2.0 <= wind_spd <= 6.0: score += 1.0
-    elif wind_spd > 8.0: score -= 2.0
-    elif wind_spd < 1.0 and not is_synced: score -= 1.0
-    if 18.0 <= temp <= 24.0: score += 2.0 
-    elif 15.0 <= temp < 18.0 or temp > 24.0: score += 1.0
-    elif 12.0 <= temp < 15.0: score += 0.0 
-    elif 10.0 <= temp < 12.0: score -= 1.5 
-    elif temp < 10.0: score -= 3.0 
-    if rain > 0: score += 0.5
-    if score < 1: score = 1
-    if score > 10: score = 10
-    return int(score)
-
-def get_score_comment(score):
-    if score >= 9: return "🔥 超・爆釣チャンス！"
-    elif score >= 7: return "🎣 好条件！期待大"
-    elif score >= 5: return "🐟 通常 (腕の見せ所)"
-    elif score >= 3: return "😓 渋いかも (粘れ)"
-    else: return "💀 激渋警報 (修行)"
-
-def get_closest_weight(val):
-    weights = [30, 45, 60, 80, 100, 120, 150, 200, 250]
-    return min(weights, key=lambda x: abs(x - val))
-
-def get_size_label(tie_size_str):
-    if "強波動" in tie_size_str or "ビッグ" in tie_size_str or "ワイド" in tie_size_str or "ロング" in tie_size_str or "極厚" in tie_size_str:
-        return "size-l", "大"
-    elif "極細" in tie_size_str or "ショート" in tie_size_str or "マイクロ" in tie_size_str or "フィネス" in tie_size_str or "細身" in tie_size_str:
-        return "size-s", "小"
+# --- 周辺SST探索 (並列実行・優先順位を保ったまま最初の当たりで打ち切り) ---
+def _run_sst_probe(fetch, lat, lon, now, cancel):
+    t0 = time.perf_counter()
+    data = fetch(lat, lon, cancel=cancel)
+    elapsed_ms = (time.perf_counter() - t0) * 1000
+    if cancel.is_set() and data is None:
+        status = "cancelled"
+    elif data is None:
+        status = "error"
     else:
-        return "size-m", "中"
+        status = "hit" if has_sst_at(data, now) else "miss"
+    return {"status": status, "elapsed_ms": elapsed_ms, "data": data}
 
-def calc_strategy_realtime(wind_spd, wind_dir, tide_factor, is_rising, temp, cloud, rain, target_depth_mode, sunrise_dt, sunset_dt, current_dt, area_key):
-    tide_dir_deg = 280 if is_rising else 100
-    diff_angle = abs(wind_dir - tide_dir_deg)
-    if diff_angle > 180: diff_angle = 360 - diff_angle
-    is_synced = diff_angle < 90
-    
-    multiplier = 1.1 
-    if tide_factor > 0.7: multiplier += 0.5
-    elif tide_factor > 0.3: multiplier += 0.2
-    if is_synced: multiplier += 0.3 
-    if wind_spd > 7.0: multiplier += 0.2 
-    
-    base_depth = 45 
-    if target_depth_mode == "15m": base_depth = 15
-    elif target_depth_mode == "30m": base_depth = 30
-    elif target_depth_mode == "60m": base_depth = 50 
-    elif target_depth_mode == "80m": base_depth = 65 
-    
-    target_weight = get_closest_weight(base_depth * multiplier)
-    
-    current_month = current_dt.month
-    is_nori_season = current_month in [12, 1, 2, 3, 4]
-    is_summer = current_month in [6, 7, 8]
-
-    # --- ネクタイ形状とメーカー (通常時: ストレート排除ロジック) ---
-    tie_size = "標準カーリー"
-    maker_rec = "推奨例: ジャッカル マスターカーリー / 海遊 WG" 
-
-    if area_key == "naruto":
-        if target_depth_mode in ["60m", "80m"] or tide_factor > 0.5:
-            tie_size = "強波動ビッグカーリー / 極厚ツイン"
-            maker_rec = "推奨例: ジャッカル マスターカーリー強波動 / sasalabo 極厚"
-        else:
-            tie_size = "中太カーリー / バルキー"
-            maker_rec = "推奨例: sasalabo レギュラー / ジャッカル イカクロー"
-            
-    elif area_key == "seto_ohashi":
-        if target_depth_mode in ["60m", "80m"] or tide_factor > 0.6:
-            tie_size = "中太カーリー / ロングワイド"
-            maker_rec = "推奨例: START マジカーリー / 松岡スペシャル"
-        else:
-            tie_size = "スタンダードカーリー / 中細カーリー"
-            maker_rec = "推奨例: START シリコンネクタイ / START ツイン"
+@st.cache_resource
+def get_probe_pool():
+    return ThreadPoolExecutor(max_workers=SST_PROBE_WORKERS, thread_name_prefix="matsuri-sst")
 
-    elif area_key == "shodoshima":
-        if target_depth_mode in ["15m", "30m"]:
-            tie_size = "極細ショート / マイクロカーリー"
-            maker_rec = "推奨例: START スキニー / START ショートスキニー"
-        else:
-            tie_size = "ツインカーリー / ロングカーリー"
-            maker_rec = "推奨例: START ツイン / 松岡スペシャル"
-            
-    else: 
-        if is_nori_season or temp < 12.0:
-            tie_size = "極細ショート / マイクロカーリー"
-            maker_rec = "推奨例: ジャッカル フィネスカーリー / 海遊 リトル"
-        elif is_summer:
-            if target_depth_mode in ["60m", "80m"]:
-                tie_size = "ワイドカーリー / ビッグシルエット"
-                maker_rec = "推奨例: ジャッカル マスターカーリー / 海遊 WG"
-            else:
-                tie_size = "フィッシュテール / Wカーリー"
-                maker_rec = "推奨例: 海遊 WGショート / ジャッカル イカクロー"
-        else:
-            if tide_factor > 0.6:
-                tie_size = "ロングカーリー / 強波動"
-                maker_rec = "推奨例: ジャッカル マスターカーリー / 海遊 WG"
+def probe_sst_neighbours(lat, lon, now, fetch=fetch_open_meteo):
+    cancel = threading.Event()
+    pool = get_probe_pool()
+    metrics = get_metrics()
+    t0 = time.perf_counter()
+    futures = [pool.submit(_run_sst_probe, fetch, round(lat + d_lat, 4), round(lon + d_lon, 4), now, cancel)
+               for d_lat, d_lon in SST_SEARCH_OFFSETS]
+    index_of = {fut: i for i, fut in enumerate(futures)}
+    results = [None] * len(futures)
+    winner = None
+    for fut in as_completed(futures):
+        results[index_of[fut]] = fut.result()
+        # 上位のプローブが全部終わった時点で、その中の最上位の当たりを採用する
+        for res in results:
+            if res is None: break
+            if res["status"] == "hit":
+                winner = res
+                break
+        if winner is not None or all(res is not None for res in results):
+            break
+    cancel.set()
+    for fut in futures: fut.cancel()
+
+    timings = []
+    for (d_lat, d_lon), res in zip(SST_SEARCH_OFFSETS, results):
+        timings.append({
+            "offset": (d_lat, d_lon),
+            "status": res["status"] if res else "cancelled",
+            "elapsed_ms": round(res["elapsed_ms"], 1) if res else None,
+        })
+    total_sec = time.perf_counter() - t0
+    metrics.observe("sst_search", total_sec, result="hit" if winner else "miss")
+    timings.append({"offset": None, "status": "total", "elapsed_ms": round(total_sec * 1000, 1)})
+    return (winner["data"] if winner else None), timings
+
+def _open_meteo_store_key(lat, lon):
+    return f"open_meteo:{lat:.4f},{lon:.4f}"
+
+def fetch_open_meteo_stored(lat, lon, cancel=None):
+    # 保存済みなら即返し、古ければ裏で1回だけ取り直す
+    def stored():
+        return get_response_store().swr(_open_meteo_store_key(lat, lon), WEATHER_TTL_SEC, lambda: fetch_open_meteo(lat, lon),
+                                        encode=weather_to_json, decode=payload_from_json)
+    if cancel is None: return stored()
+    # 取得は他のセッションと共有するので、cancel で止めるのはこの呼び出しの待ちだけ (取得そのものは最後まで走らせて保存する)
+    future = get_async_io().call(stored)
+    while not future.done():
+        if cancel.wait(SHARED_FETCH_POLL_SEC): return None
+    return future.result()
+
+def get_current_weather(lat, lon):
+    # 定点は裏のスケジューラが温めたデータをメモリから返す (ネットワーク待ちなし)
+    fixed_key = find_fixed_key(lat, lon)
+    if fixed_key:
+        batch = get_refresh_scheduler().get(("weather", "stations"), wait=REFRESH_COLD_WAIT_SEC)
+        hit = bool(batch) and fixed_key in batch
+        get_metrics().inc("cache_requests", cache="stations", result="hit" if hit else "miss")
+        if hit: return batch[fixed_key]
+        return fetch_current_weather(lat, lon, fetch=fetch_open_meteo_stored)
+    # GPSはグリッドセルの中心で取得してセル単位のキャッシュを共有する。
+    # 周辺探索はセル中心からのずらし位置そのものを取りに行く (グリッドに通すとセル中心に寄ってしまう)
+    grid = get_weather_grid()
+    c_lat, c_lon = grid.center_of(grid.cell_of(lat, lon))
+    return fetch_current_weather(c_lat, c_lon, fetch=grid.fetch, probe_fetch=fetch_open_meteo_stored)
+
+# --- GPS用グリッドキャッシュ (全セッション共通) ---
+class GridWeatherCache:
+    def __init__(self, cell_deg=WEATHER_GRID_DEG, ttl=WEATHER_TTL_SEC, max_cells=WEATHER_GRID_MAX_CELLS):
+        self.cell_deg = cell_deg
+        self.ttl = ttl
+        self.max_cells = max_cells
+        self._cells = {}   # (i, j) -> (payload, fetched_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def cell_of(self, lat, lon):
+        return (round(lat / self.cell_deg), round(lon / self.cell_deg))
+
+    def center_of(self, cell):
+        return (round(cell[0] * self.cell_deg, 4), round(cell[1] * self.cell_deg, 4))
+
+    def fetch(self, lat, lon, cancel=None):
+        cell = self.cell_of(lat, lon)
+        now = time.time()
+        with self._lock:
+            entry = self._cells.get(cell)
+            if entry and now - entry[1] < self.ttl:
+                self.hits += 1
+                get_metrics().inc("cache_requests", cache="grid", result="hit")
+                return entry[0]
+            self.misses += 1
+        get_metrics().inc("cache_requests", cache="grid", result="miss")
+        payload = fetch_open_meteo_stored(*self.center_of(cell), cancel=cancel)
+        if payload is not None:
+            with self._lock:
+                # 保存データ由来なら元の取得時刻で期限を数える
+                self._cells[cell] = (payload, payload.get("fetched_at", now))
+                if len(self._cells) > self.max_cells:
+                    self._evict(now)
+        return payload
+
+    def _evict(self, now):
+        expired = [c for c, (_, t) in self._cells.items() if now - t >= self.ttl]
+        for c in expired: del self._cells[c]
+        if len(self._cells) > self.max_cells:
+            oldest = sorted(self._cells, key=lambda c: self._cells[c][1])
+            for c in oldest[:len(self._cells) - self.max_cells]: del self._cells[c]
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "cell_deg": self.cell_deg,
+                "cells": len(self._cells),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+            }
+
+@st.cache_resource
+def get_weather_grid():
+    return GridWeatherCache()
+
+# --- 計算済みの盤面の共有キャッシュ (全セッション共通) ---
+class BoardCache:
+    # 盤面 (値と組み立て済みの HTML) を (場所, 港, JST の時, 水深) で共有する。
+    # 元データ (天気・潮流表) の取得時刻が変わったか、作ってから ttl 秒たったら作り直す
+    def __init__(self, ttl=BOARD_CACHE_TTL_SEC, max_entries=BOARD_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}   # key -> (version, built_at, board)
+        self._lock = threading.Lock()
+        self._flight = SingleFlight(get_metrics(), name="boards")
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version, build_all):
+        # build_all() -> {水深: 盤面}。外れたら全水深ぶんをまとめて入れる (key の最後が水深)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version and now - entry[1] < self.ttl:
+                self.hits += 1
+                result = "hit"
             else:
-                tie_size = "ショートカーリー (標準)"
-                maker_rec = "推奨例: 海遊 シングル / ジャッカル マスターカーリー(カット)"
-
-    # --- 深場×激流の「底取り優先」ロジック (引き抵抗軽減 v22.7) ---
-    # 水深80mで潮が少しでも速ければ(0.4以上)、アピール力より着底を優先
-    if target_depth_mode == "80m" and tide_factor >= 0.4:
-        tie_size = "細身カーリー / スタンダード (底取り・引き抵抗軽減)"
-        if area_key == "shodoshima" or area_key == "seto_ohashi":
-            maker_rec = "推奨例: START シリコンネクタイ / ササラボ レギュラー"
-        else:
-            maker_rec = "推奨例: ジャッカル フィネスカーリー / 海遊 シングル"
+                self.misses += 1
+                result = "miss" if entry is None else "stale"
+        get_metrics().inc("cache_requests", cache="boards", result=result)
+        if result == "hit": return entry[2]
+        # 同じ盤面を同時に作り始めたセッションは、最初の1つの計算を待つ (全水深を1回で作るので水深はキーに入れない)
+        boards, _ = self._flight.do((key[:-1], version), lambda: self._build(key, version, build_all))
+        return boards[key[-1]]
 
-    # --- 激渋時のストレート解禁ロジック (どうしても渋い時の最終兵器) ---
-    if tide_factor < 0.2:
-        tie_size = "極細ストレート / マイクロ (激渋対策)"
-        if area_key == "shodoshima" or area_key == "seto_ohashi":
-            maker_rec = "推奨例: ササラボ 極薄ストレート / START スキニー"
-        else:
-            maker_rec = "推奨例: ササラボ 極薄ストレート / ジャッカル フィネス"
+    def _build(self, key, version, build_all):
+        now = time.monotonic()
+        boards = build_all()
+        with self._lock:
+            for depth, board in boards.items():
+                self._entries[key[:-1] + (depth,)] = (version, now, board)
+            if len(self._entries) > self.max_entries:
+                self._evict(now)
+        return boards
 
-    is_mazume = False
-    is_night = False
-    is_daytime = False
-    
-    if sunrise_dt and sunset_dt:
-        current_dt_naive = current_dt.replace(tzinfo=None)
-        sr = datetime.datetime.fromisoformat(sunrise_dt).replace(tzinfo=None)
-        ss = datetime.datetime.fromisoformat(sunset_dt).replace(tzinfo=None)
-        
-        if (sr - datetime.timedelta(minutes=60)) <= current_dt_naive <= (sr + datetime.timedelta(minutes=90)): 
-            is_mazume = True 
-        elif (ss - datetime.timedelta(minutes=60)) <= current_dt_naive <= (ss + datetime.timedelta(minutes=60)): 
-            is_mazume = True 
-        elif current_dt_naive > (sr + datetime.timedelta(minutes=90)) and current_dt_naive < (ss - datetime.timedelta(minutes=60)):
-            is_daytime = True 
-        
-        if current_dt_naive < (sr - datetime.timedelta(minutes=30)) or current_dt_naive > (ss + datetime.timedelta(minutes=30)): 
-            is_night = True
-
-    # --- カラーロジック ---
-    color = "オレンジ / 赤オレ"
-
-    if is_night:
-        color = "グロー / フルブラック (シルエット重視)"
-    elif is_mazume:
-        color = "蛍光オレンジ / ゼブラドット / しましまオレンジ [ファーストカラー]"
-    else:
-        if rain >= 0.5:
-            color = "黒金 (クロキン) / しましまオレンジゴールドラメ [濁り対策]"
-        elif cloud >= 80:
-            if area_key == "naruto": 
-                color = "グローゼブラ / オレンジゴールド"
-            else: 
-                color = "黒金 (クロキン) / マジョーラゼブラ [曇天パターン]"
-        else:
-            if tide_factor < 0.3:
-                if area_key == "akashi" and is_nori_season:
-                    color = "海苔グリーン / コーラ" 
-                elif area_key == "shodoshima" or area_key == "seto_ohashi":
-                    color = "グリーン / ケイムラ (ナチュラル・エビ)"
-                else:
-                    color = "赤黒 (レッドブラック) / スモーク [スレ対策]"
+    def _evict(self, now):
+        expired = [k for k, (_, t, _) in self._entries.items() if now - t >= self.ttl]
+        for k in expired: del self._entries[k]
+        if len(self._entries) > self.max_entries:
+            oldest = sorted(self._entries, key=lambda k: self._entries[k][1])
+            for k in oldest[:len(self._entries) - self.max_entries]: del self._entries[k]
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+            }
+
+@st.cache_resource
+def get_board_cache():
+    cache = BoardCache()
+    get_metrics().gauge("board_cache_entries", lambda: {(): cache.stats()["entries"]})
+    return cache
+
+def fetch_jcg_tide_data(target_url):
+    return fetch_jcg_tide_table(target_url, get=http_get, metrics=get_metrics())
+
+def start_render_fetches(lat, lon, port_info):
+    # 港が決まった時点で天気と基準港の潮流表を同時に取りに行く (描画は遅い方だけ待てばよい)
+    aio = get_async_io()
+    ref_url = JCG_POINTS[port_info.ref_key].url
+    fetches = {"weather": aio.call(get_current_weather, lat, lon)}
+    if ref_url: fetches["tide"] = aio.call(get_jcg_tide_data, ref_url)
+    return fetches
+
+def get_jcg_tide_data(target_url):
+    df = get_refresh_scheduler().get(("tide", target_url), wait=REFRESH_COLD_WAIT_SEC)
+    get_metrics().inc("cache_requests", cache="tide", result="miss" if df is None else "hit")
+    if df is not None: return df
+    return get_response_store().swr(f"tide:{target_url}", TIDE_TTL_SEC, lambda: fetch_jcg_tide_data(target_url),
+                                    encode=TideTable.to_json, decode=TideTable.from_json)
+
+@st.cache_resource
+def get_harmonic_tide_tables():
+    return load_harmonic_tide_tables()
+
+@st.cache_resource
+def get_response_store():
+    return ResponseStore(metrics=get_metrics())
+
+# --- 先回り更新スケジューラ (全セッション共通) ---
+class RefreshAheadScheduler:
+    def __init__(self, ahead_ratio=REFRESH_AHEAD_RATIO, run=None):
+        self.ahead_ratio = ahead_ratio
+        self.run = run        # run(fn) -> Future。指定があれば期限の来た取得を並行に走らせる
+        self._jobs = {}       # key -> (fetch_fn, ttl)
+        self._entries = {}    # key -> (value, fetched_at)
+        self._attempted = set()
+        self._due = []        # (due_monotonic, key) のヒープ
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def register(self, key, fetch_fn, ttl, seed=None):
+        # seed: 保存済みの (value, fetched_at)。あれば即座に配信し、更新は期限に合わせる
+        with self._cond:
+            self._jobs[key] = (fetch_fn, ttl)
+            due_in = 0
+            if seed is not None:
+                self._entries[key] = seed
+                self._attempted.add(key)
+                due_in = max(0, ttl * self.ahead_ratio - (time.time() - seed[1]))
+            heapq.heappush(self._due, (time.monotonic() + due_in, key))
+            self._cond.notify_all()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="matsuri-refresh", daemon=True)
+            self._thread.start()
+        return self
+
+    def get(self, key, wait=0):
+        with self._cond:
+            # 起動直後で初回取得がまだなら、二重に取りに行かず完了を待つ
+            if wait and key in self._jobs and key not in self._attempted:
+                self._cond.wait_for(lambda: key in self._attempted, timeout=wait)
+            entry = self._entries.get(key)
+            if entry is None: return None
+            value, fetched_at = entry
+        # 更新に失敗し続けていても、保存期限内なら手元のデータを返す (UI側で古さを表示)
+        if time.time() - fetched_at > RESPONSE_STORE_MAX_AGE_SEC:
+            return None
+        return value
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._due or self._due[0][0] > time.monotonic():
+                    timeout = self._due[0][0] - time.monotonic() if self._due else None
+                    self._cond.wait(timeout=timeout)
+                _, key = heapq.heappop(self._due)
+                fetch_fn, ttl = self._jobs[key]
+            if self.run is not None:
+                self.run(fetch_fn).add_done_callback(lambda fut, key=key, ttl=ttl: self._finish(key, ttl, fut))
+                continue
+            try:
+                value = fetch_fn()
+            except Exception:
+                value = None
+            self._finish(key, ttl, value=value)
+
+    def _finish(self, key, ttl, fut=None, value=None):
+        if fut is not None:
+            try:
+                value = fut.result()
+            except Exception:
+                value = None
+        with self._cond:
+            if value is not None:
+                self._entries[key] = (value, _fetched_at_of(value))
+                next_in = ttl * self.ahead_ratio + random.uniform(0, ttl * REFRESH_JITTER_RATIO)
             else:
-                if target_depth_mode in ["15m", "30m"]:
-                    color = "赤黒 / リバーシブル赤オレ / マスターオレンジ [セカンドカラー]"
-                elif target_depth_mode in ["45m", "60m", "80m"]:
-                    color = "エビオレ / エビチリ / 網みオレ [サードカラー]"
-                
-    speed = "Medium (等速)"
-    tactic = "バーチカル気味 (縦の釣り)"
-    if is_synced and wind_spd > 3.0:
-        tactic = "斜め引き (広範囲攻略)" 
-        speed = "High Speed (早巻き)"
-    elif tide_factor < 0.3:
-        if target_depth_mode == "15m":
-            tactic = "キャスティング (投げて横引き)"
-            speed = "Dead Slow (デッドスロー)"
-        else:
-            tactic = "キャスティング (投げて横引き)"
-            speed = "Dead Slow (デッドスロー)"
-            if temp > 15: speed = "Slow (スロー)"
-        
-    return target_weight, color, tie_size, maker_rec, speed, tactic, is_synced, tide_dir_deg
+                next_in = REFRESH_RETRY_SEC
+            self._attempted.add(key)
+            heapq.heappush(self._due, (time.monotonic() + next_in, key))
+            self._cond.notify_all()
+
+def _fetched_at_of(value):
+    if isinstance(value, dict) and value:
+        if "fetched_at" in value: return value["fetched_at"]
+        first = next(iter(value.values()))
+        if isinstance(first, dict) and "fetched_at" in first: return first["fetched_at"]
+    return getattr(value, "fetched_at", None) or time.time()
+
+def _stored_job(store, store_key, fetch_fn, encode=json.dumps):
+    def job():
+        value = fetch_fn()
+        if value is not None: store.save(store_key, value, fetched_at=_fetched_at_of(value), encode=encode)
+        return value
+    return job
+
+@st.cache_resource
+def get_refresh_scheduler():
+    scheduler = RefreshAheadScheduler(run=get_async_io().refresh)
+    store = get_response_store()
+    scheduler.register(("weather", "stations"), _stored_job(store, "weather:stations", fetch_station_weather_batch, weather_to_json),
+                       WEATHER_TTL_SEC, seed=store.load("weather:stations", station_batch_from_json))
+    for url in {station.url for station in JCG_POINTS.values() if station.url}:
+        store_key = f"tide:{url}"
+        scheduler.register(("tide", url), _stored_job(store, store_key, lambda url=url: fetch_jcg_tide_data(url), TideTable.to_json),
+                           TIDE_TTL_SEC, seed=store.load(store_key, TideTable.from_json))
+    return scheduler.start()
 
 # --- メイン画面 ---
-def main():
-    st.markdown("""
-        <h1 style='text-align: center; color: #2c3e50;'>⚓️ 魔釣 Pro</h1>
-        <p style='text-align: center; font-size: 14px; color: gray;'>
-            瀬戸内タイラバの「今」を制する<br>
-            玄人のための海況戦術盤<br>
-            [明石/鳴門/小豆島/瀬戸大橋 対応] v22.7
-        </p>
-    """, unsafe_allow_html=True)
+# HTML のひな形 (描画のたびに str.format で値を差し込む)
+FORECAST_TABLE_HEAD = ("<table class='forecast-table'><thead><tr><th style='width:12%;'>時間</th><th style='width:27%;'>天気/風</th>"
+                       "<th style='width:23%;'>潮流(推)</th><th style='width:28%;'>色(目安)/大・中・小</th>"
+                       "<th style='width:10%;'>指数</th></tr></thead><tbody>")
+FORECAST_TABLE_TAIL = "</tbody></table>"
+FORECAST_ROW = (
+    "<tr><td class='fc-time'>{day}{hour}:00</td>"
+    "<td><span style='font-size:11px;'>{weather_icon}<br>{wind_cardinal} {wind_speed}m</span></td>"
+    "<td>{tide}{tide_source}</td>"
+    "<td style='line-height:1.4;'><span style='font-size:10px; font-weight:bold; color:#d35400;'>{color}</span><br>"
+    "<span class='size-label {size_class}'>サイズ: {size_text}</span></td>"
+    "<td><span class='{score_class}'>{score}</span></td></tr>"
+)
+FORECAST_TIDE = "<span style='font-size:11px;'>{direction}<br>{knot}kt</span>"
+FORECAST_TIDE_STOP = "<span class='fc-tide-stop' style='font-size:11px;'>転流<br>潮止</span>"
+FORECAST_ESTIMATED = "<br><span style='font-size:9px;color:gray;'>(推)</span>"
+FORECAST_NEXT_DAY = "<span style='font-size:9px;color:blue;'>(翌)</span><br>"
+FORECAST_COLUMNS = ("hour", "wind_speed", "wind_dir", "weather_code", "tide_factor", "knot", "is_rising", "is_official", "score",
+                    "next_day", "color", "tie_size")
+
+SEAT_GRID = """
+    <div class="seat-grid">
+        <div class="boat-shape">
+            <div class="wind-arrow">↑ 風 (Wind)</div>
+            <div>▲ 船首 (ミヨシ)</div>
+        </div>
+        <div class="{m_left}">左ミヨシ</div>
+        <div class="{m_right}">右ミヨシ</div>
+        <div class="{c_left}">左舷(胴)</div>
+        <div class="{c_right}">右舷(胴)</div>
+        <div class="{t_left}">左トモ</div>
+        <div class="{t_right}">右トモ</div>
+        <div style="grid-column: 1 / -1; background-color: #90a4ae; color: white; border-radius: 0 0 10px 10px; padding: 5px;">
+            ▼ 船尾 (トモ)
+        </div>
+    </div>
+    <div style="text-align: center; margin-top: 10px; font-weight: bold; color: #d63031;">
+        ★今の狙い目は「{best_seat_name}」周辺です！
+    </div>
+    """
+SEAT_CODES = ("m_left", "m_right", "c_left", "c_right", "t_left", "t_right")
+SEAT_CENTERS = {"m_center": ("m_left", "m_right"), "t_center": ("t_left", "t_right")}  # 中央の席は左右とも強調
+
+SCORE_BOX = """
+    <div class="score-container">
+        <div class="score-label">🌊 魔釣指数 (Matsuri Index)</div>
+        <div class="score-value">{score}<span style="font-size: 24px;">/10</span></div>
+        <div class="score-desc">{comment}</div>
+    </div>
+    """
+
+REC_TACTIC_BOX = """
+<div class="rec-box">
+    <div class="rec-title">攻略スタイル (想定)</div>
+    <div class="rec-content" style="font-size: 22px; margin-bottom: 10px;">{tactic}</div>
+    <div class="rec-title">推奨TGウェイト</div>
+    <div class="weight-val">{weight}g</div>
+    <div class="captain-note">※重さは船長の指示がある場合はそちらに従ってください。</div>
+</div>
+"""
+REC_COLOR_BOX = """
+        <div class="rec-box" style="border-color: #f39c12; background-color: #fef9e7;">
+            <div class="rec-title">当たりネクタイ</div>
+            <div class="rec-content" style="font-size: 16px;">{color}</div>
+        </div>
+        """
+REC_SIZE_BOX = """
+        <div class="rec-box" style="border-color: #e67e22; background-color: #fdf2e9;">
+            <div class="rec-title">推奨サイズ / 形状</div>
+            <div class="rec-content" style="font-size: 16px;">{size}</div>
+            <div class="maker-rec">{maker}</div>
+        </div>
+        """
+REC_SPEED_BOX = """
+    <div class="rec-box" style="border-color: #3498db; background-color: #ebf5fb; margin-top: 5px;">
+        <div class="rec-title">リトリーブスピード</div>
+        <div class="rec-content" style="font-size: 20px;">{speed}</div>
+    </div>
+    """
+
+# --- この先6時間の予報表 (予報フレームから HTML を組む) ---
+def forecast_table_html(fc):
+    rows = [FORECAST_TABLE_HEAD]
+    lo, hi = max(fc["row"] + 1, 0), min(fc["row"] + 7, fc["n"])
+    # 6行分だけ Python の値にしてから回す (numpy のスカラーを1つずつ取り出して書式にかけるより速い)
+    columns = zip(*(fc[name][lo:hi].tolist() for name in FORECAST_COLUMNS))
+    for hour, wind_speed, wind_dir, fw_code, ft_fac, ft_knot, is_rising, is_official, f_score, next_day, color, tie_size in columns:
+        w_icon = "☀️"
+        if fw_code > 3: w_icon = "☁️"
+        if fw_code > 50: w_icon = "☔"
+
+        if ft_fac < 0.1 and ft_knot < 0.5:
+            tide = FORECAST_TIDE_STOP
+        else:
+            tide = FORECAST_TIDE.format(direction="西(上)" if is_rising else "東(下)", knot=f"{ft_knot:.1f}")
 
+        score_class = "fc-score-low"
+        if f_score >= 8:
+            score_class = "fc-score-high"
+        elif f_score >= 6:
+            score_class = "fc-score-mid"
+
+        size_class, size_text = get_size_label(tie_size)
+        rows.append(FORECAST_ROW.format(
+            day=FORECAST_NEXT_DAY if next_day else "", hour=int(hour),
+            weather_icon=w_icon, wind_cardinal=deg_to_cardinal(wind_dir), wind_speed=f"{wind_speed:.1f}",
+            tide=tide, tide_source="" if is_official else FORECAST_ESTIMATED,
+            color=color.split(" / ")[0].split(" [")[0], size_class=size_class, size_text=size_text,
+            score_class=score_class, score=f_score,
+        ))
+    rows.append(FORECAST_TABLE_TAIL)
+    return "".join(rows)
+
+# --- 釣り座の図 (潮先の席を強調) ---
+@functools.lru_cache(maxsize=64)
+def seat_grid_html(seat_code, best_seat_name):
+    best = SEAT_CENTERS.get(seat_code, (seat_code,))
+    classes = {code: "seat-cell seat-best" if code in best else "seat-cell" for code in SEAT_CODES}
+    return SEAT_GRID.format(best_seat_name=best_seat_name, **classes)
+
+def score_box_html(score, comment):
+    return SCORE_BOX.format(score=score, comment=comment)
+
+def strategy_boxes_html(strategy):
+    # 水深ごとのおすすめ (攻略スタイルとウェイト / ネクタイ / サイズ / スピード) の4枚
+    return (REC_TACTIC_BOX.format(tactic=strategy.tactic, weight=strategy.weight),
+            REC_COLOR_BOX.format(color=strategy.color),
+            REC_SIZE_BOX.format(size=strategy.tie_size, maker=strategy.maker_rec),
+            REC_SPEED_BOX.format(speed=strategy.speed))
+
+# --- 隠しデバッグパネル (?debug=1 のときだけ) ---
+def is_debug():
+    return st.query_params.get("debug") == "1"
+
+def render_debug_panel(metrics, render):
+    with st.expander("🛠️ 計測 (debug)", expanded=True):
+        st.caption("今回の描画: " + " / ".join(f"{stage} {sec * 1000:.0f}ms" for stage, sec in render.laps)
+                   + f" / 合計 {render.elapsed() * 1000:.0f}ms")
+        rows = []
+        for key in sorted(metrics.series("render_stage")):
+            labels = dict(key)
+            p50 = metrics.quantile("render_stage", 0.5, **labels)
+            p95 = metrics.quantile("render_stage", 0.95, **labels)
+            rows.append({"範囲": labels.get("scope"), "実行": labels.get("run"), "段階": labels.get("stage"),
+                         "p50 (ms)": round(p50 * 1000, 1), "p95 (ms)": round(p95 * 1000, 1)})
+        for name, label in (("time_to_first_board", "指数表示まで"), ("render_total", "描画全体")):
+            p50 = metrics.quantile(name, 0.5)
+            if p50 is None: continue
+            rows.append({"範囲": "app", "実行": "app", "段階": label,
+                         "p50 (ms)": round(p50 * 1000, 1), "p95 (ms)": round(metrics.quantile(name, 0.95) * 1000, 1)})
+        if rows: st.dataframe(rows, hide_index=True)
+        board_stats = get_board_cache().stats()
+        st.caption(f"盤面の共有キャッシュ: ヒット率 {board_stats['hit_ratio']:.0%} ({board_stats['hits']}/{board_stats['hits'] + board_stats['misses']}件・{board_stats['entries']}盤面)")
+        grid_stats = get_weather_grid().stats()
+        st.caption(f"🗺️ 気象グリッド {grid_stats['cell_deg']}° / キャッシュヒット率 {grid_stats['hit_ratio']:.0%} ({grid_stats['cells']}セル)")
+        # 外部APIごとの応答時間と遮断の状態
+        for host, t in get_async_io().latency_stats().items():
+            circuit = {"open": " / 🚫 遮断中", "half_open": " / 🔁 復旧確認中"}.get(t.get("circuit"), "")
+            st.caption(f"⏱️ {host}: 中央値 {t['p50_ms']}ms / 95% {t['p95_ms']}ms / 最大 {t['max_ms']}ms ({t['count']}件・失敗{t['errors']}件)"
+                       f" / タイムアウト {t.get('timeout_sec', 0):.1f}秒{circuit}")
+        st.code(metrics.to_prometheus(), language=None)
+
+# --- フラグメント (操作した部分だけを再実行する) ---
+# 場所の選択 → 全体を再実行 / 水深の切り替え → 水深フラグメントだけ / データの更新 → 盤面と水深フラグメントだけ (run_every)
+def is_full_run():
+    return st.session_state.get("full_run", True)
+
+def stage_timer(scope):
+    return get_metrics().stopwatch("render_stage", scope=scope, run="app" if is_full_run() else "fragment")
+
+@st.fragment
+def location_fragment():
+    timer = stage_timer("location")
     col_sw, col_status = st.columns([2, 3])
     with col_sw:
         use_gps = st.toggle("🛰️ GPSを利用する (現在地から解析)", value=True)
@@ -567,281 +953,308 @@ def main():
     else:
         manual_area = "明石海峡"
 
-    st.markdown("### 🎣 ターゲット水深 (Depth)")
-    target_depth_mode = st.radio(
-        "狙うポイントの水深を選択してください:",
-        ["15m", "30m", "45m", "60m", "80m"],
-        index=2, 
-        horizontal=True
-    )
-
     if use_gps:
         loc = get_geolocation()
         if loc and 'coords' in loc:
             lat = loc['coords']['latitude']
             lon = loc['coords']['longitude']
             st.success("📍 GPS測位完了 (座標非表示)")
-            port_info, dist_km, port_key = get_nearest_port(lat, lon)
+            _, dist_km, port_key = get_nearest_port(lat, lon)
         else:
             st.info("📡 GPS信号待ち (または拒否)...")
-            lat = JCG_POINTS["akashi"]["lat"]
-            lon = JCG_POINTS["akashi"]["lon"]
-            port_info, dist_km, port_key = get_nearest_port(lat, lon)
+            lat = JCG_POINTS["akashi"].lat
+            lon = JCG_POINTS["akashi"].lon
+            _, dist_km, port_key = get_nearest_port(lat, lon)
     else:
         if manual_area == "明石海峡":
-            lat = JCG_POINTS["akashi"]["lat"]
-            lon = JCG_POINTS["akashi"]["lon"]
+            lat = JCG_POINTS["akashi"].lat
+            lon = JCG_POINTS["akashi"].lon
             port_key = "akashi"
             msg = "⚓️ 明石海峡 (定点観測)"
         elif manual_area == "鳴門海峡":
-            lat = JCG_POINTS["naruto"]["lat"]
-            lon = JCG_POINTS["naruto"]["lon"]
+            lat = JCG_POINTS["naruto"].lat
+            lon = JCG_POINTS["naruto"].lon
             port_key = "naruto"
             msg = "⚓️ 鳴門海峡 (定点観測)"
         elif manual_area == "瀬戸大橋 (備讃瀬戸)":
-            lat = JCG_POINTS["seto_ohashi"]["lat"]
-            lon = JCG_POINTS["seto_ohashi"]["lon"]
+            lat = JCG_POINTS["seto_ohashi"].lat
+            lon = JCG_POINTS["seto_ohashi"].lon
             port_key = "seto_ohashi"
             msg = "⚓️ 瀬戸大橋/備讃瀬戸周辺 (定点観測)"
         else:
-            lat = JCG_POINTS["shodoshima"]["lat"]
-            lon = JCG_POINTS["shodoshima"]["lon"]
+            lat = JCG_POINTS["shodoshima"].lat
+            lon = JCG_POINTS["shodoshima"].lon
             port_key = "shodoshima"
             msg = "⚓️ 岡山沖/小豆島周辺 (定点観測)"
             
         st.warning(msg)
-        port_info = JCG_POINTS[port_key]
         dist_km = 0
 
+    location = {"lat": lat, "lon": lon, "port_key": port_key, "dist_km": dist_km, "use_gps": use_gps}
+    changed = st.session_state.get("location") != location
+    st.session_state["location"] = location
+    timer.lap("location")
+    # フラグメントだけの再実行で場所が変わったら、盤面も描き直すため全体を再実行する
+    if changed and not is_full_run(): st.rerun()
+
+# --- 盤面 (BoardCache に全水深ぶん持つので、辞書ではなく固定の属性で持つ) ---
+class Conditions:
+    # 水深に依らない部分 (全水深の Board で同じものを共有する)
+    __slots__ = ("now", "data", "port_info", "sst", "sst_source", "wind_spd", "wind_dir", "cloud", "rain", "tide_factor",
+                 "is_rising", "is_official", "is_synced", "best_seat_name", "seat_code", "wind_cardinal", "tide_cardinal",
+                 "knot_text", "score", "score_comment", "score_html", "seat_html")
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields[name])
+
+class Board:
+    __slots__ = ("cond", "depth", "strategy", "strategy_html", "forecast_html")
+
+    def __init__(self, cond, depth, strategy, strategy_html, forecast_html):
+        self.cond = cond
+        self.depth = depth
+        self.strategy = strategy  # matsuri.Strategy
+        self.strategy_html = strategy_html
+        self.forecast_html = forecast_html
+
+def current_conditions(now, data, port_info, tides):
+    # 現在の天気・潮から、指数と釣り座まで (水深に依らない部分)
+    current = data["current"]
+    sst, sst_source = current_sst(data, now)
+    tide_factor, is_rising, real_knot, is_official = get_hybrid_tide_data(now, now, port_info, tides)
+    wind_dir = current["wind_direction_10m"]
+    is_synced, tide_dir_deg = tide_alignment(wind_dir, is_rising)
+    best_seat_name, seat_code = calculate_best_seat(wind_dir, tide_dir_deg)
+    score = calculate_matsuri_score(tide_factor, is_synced, current["wind_speed_10m"], sst, current["rain"])
+    score_comment = get_score_comment(score)
+    return Conditions(
+        now=now, data=data, port_info=port_info, sst=sst, sst_source=sst_source,
+        wind_spd=current["wind_speed_10m"], wind_dir=wind_dir, cloud=current["cloud_cover"], rain=current["rain"],
+        tide_factor=tide_factor, is_rising=is_rising, is_official=is_official,
+        is_synced=is_synced, best_seat_name=best_seat_name, seat_code=seat_code,
+        wind_cardinal=deg_to_cardinal(wind_dir), tide_cardinal=deg_to_cardinal(tide_dir_deg),
+        knot_text=f"{real_knot:.1f} kt",
+        score=score, score_comment=score_comment, score_html=score_box_html(score, score_comment),
+        seat_html=seat_grid_html(seat_code, best_seat_name),
+    )
+
+def build_boards(now, data, port_info, port_key, tides):
+    # 全水深の盤面を1回で作る: {水深: 盤面}。水深に依らない値は全水深で同じもの
+    cond = current_conditions(now, data, port_info, tides)
+    strategies, _, _ = calc_strategy_all_depths(
+        cond.wind_spd, cond.wind_dir, cond.tide_factor, cond.is_rising, cond.sst, cond.cloud, cond.rain,
+        daylight_timeline(data), now, port_key
+    )
+    frames = build_forecast_frames(data, now, port_info, port_key, cond.sst, cond.cloud, tides)
+    return {depth: Board(cond, depth, strategies[depth], strategy_boxes_html(strategies[depth]), forecast_table_html(frames[depth]))
+            for depth in DEPTH_MODES}
+
+def board_place(location):
+    # 同じ天気データを使う場所: 定点はそのキー、GPS はグリッドセル
+    fixed_key = find_fixed_key(location["lat"], location["lon"])
+    return fixed_key or get_weather_grid().cell_of(location["lat"], location["lon"])
+
+def last_good_weather(location):
+    # 取得が間に合わない・失敗したときの代わり: 定点は先回り更新の手元分、なければ保存済みの取得分、
+    # それもなければ最寄りの定点の分。水温は統計値で補う (sst_source = none)
+    lat, lon = location["lat"], location["lon"]
+    batch = get_refresh_scheduler().get(("weather", "stations")) or {}
+    fixed_key = find_fixed_key(lat, lon)
+    if fixed_key:
+        if fixed_key in batch: return batch[fixed_key]
+        lat, lon = JCG_POINTS[fixed_key].sst_lat, JCG_POINTS[fixed_key].sst_lon
+    else:
+        grid = get_weather_grid()
+        lat, lon = grid.center_of(grid.cell_of(lat, lon))
+    hit = get_response_store().load(_open_meteo_store_key(lat, lon), payload_from_json)
+    payload = hit[0] if hit else batch.get(location["port_key"])
+    if payload is None: return None
+    payload = copy_payload(payload)
+    payload.update(sst_source="none", fallback=True)
+    return payload
+
+def last_good_tide(target_url):
+    hit = get_response_store().load(f"tide:{target_url}", TideTable.from_json)
+    return hit[0] if hit else None
+
+def session_render_fetches(location, port_info):
+    # 盤面と水深フラグメントは同じ取得と同じ待ち期限を使う (待つのは1回の描画で合わせて RENDER_FETCH_BUDGET_SEC まで)。
+    # 同じ場所の取得が期限内か、まだ取得中ならそれを使い回す。取得が終わって期限も過ぎていれば取り直す
+    fetch_key = (location["lat"], location["lon"], location["port_key"])
+    entry = st.session_state.get("render_fetches")
+    if entry is not None:
+        key, fetches, deadline = entry
+        if key == fetch_key and (time.monotonic() < deadline or not all(f.done() for f in fetches.values())):
+            return fetches, deadline
+    fetches = start_render_fetches(location["lat"], location["lon"], port_info)
+    deadline = time.monotonic() + RENDER_FETCH_BUDGET_SEC
+    st.session_state["render_fetches"] = (fetch_key, fetches, deadline)
+    return fetches, deadline
+
+def await_render_fetches(fetches, location, ref_url, deadline):
+    # 期限まで待って、揃わなかったものは前回の取得分で代える (取得は裏で続き、次の描画で使われる)
+    # 潮流表が無ければ年間予測・推定で描く。天気は代わりも無いとき (起動直後など) だけ取得の完了まで待つ
+    metrics = get_metrics()
+    done, _ = wait(fetches.values(), timeout=max(0.0, deadline - time.monotonic()))
+    weather = fetches["weather"]
+    data = weather.result() if weather in done else None
+    if data is None:
+        reason = "budget" if weather not in done else "error"
+        data = last_good_weather(location)
+        if data is not None: metrics.inc("render_fallbacks", source="weather", reason=reason)
+        elif weather not in done: data = weather.result()
+    tide_table = None
+    tide = fetches.get("tide")
+    if tide is not None:
+        tide_table = tide.result() if tide in done else None
+        if tide_table is None:
+            tide_table = last_good_tide(ref_url)
+            metrics.inc("render_fallbacks", source="tide", reason="budget" if tide not in done else "error")
+    return data, tide_table
+
+def load_board(location, depth=DEFAULT_DEPTH_MODE):
+    # 盤面と水深フラグメントの共通の入力。取得はキャッシュ・先回り更新済みのデータを引くだけで、計算は全セッションで共有する
+    port_key = location["port_key"]
+    port_info = JCG_POINTS[port_key]
+    fetches, deadline = session_render_fetches(location, port_info)
+    JST = datetime.timezone(datetime.timedelta(hours=9), 'JST')
+    now = datetime.datetime.now(JST)
+    ref_key = port_info.ref_key
+    data, tide_table = await_render_fetches(fetches, location, JCG_POINTS[ref_key].url, deadline)
+    if not data: return None
+    tides = TideSource({ref_key: tide_table} if tide_table is not None else {}, get_harmonic_tide_tables())
+    # 代わりのデータ (水温は統計値) で作った盤面を、同じ取得時刻の正常な盤面として使い回さない
+    version = (data.get("fetched_at"), data.get("fallback", False), data.get("sst_source"), getattr(tide_table, "fetched_at", None))
+    key = (board_place(location), port_key, now.strftime("%Y-%m-%d %H"), depth)
+    return get_board_cache().get(key, version, lambda: build_boards(now, data, port_info, port_key, tides))
+
+@st.fragment(run_every=WEATHER_TTL_SEC)
+def board_fragment():
+    timer = stage_timer("board")
+    location = st.session_state["location"]
     with st.spinner('気象データ解析中...'):
-        t_delta = datetime.timedelta(hours=9)
-        JST = datetime.timezone(t_delta, 'JST')
-        now = datetime.datetime.now(JST)
-
-        data = get_current_weather(lat, lon)
-        
-        if data:
-            current = data["current"]
-            current_hour = now.hour
-            
-            hourly_temps = data["hourly"].get("sea_surface_temperature", [])
-            raw_sst = hourly_temps[current_hour] if (hourly_temps and current_hour < len(hourly_temps)) else None
-            
-            sst_source = data.get("sst_source", "none")
-            if sst_source == "local":
-                sst = raw_sst
-                sst_label = "📡 解析値"
-            elif sst_source == "search":
-                sst = raw_sst
-                sst_label = "🔭 周辺補完"
-            else:
-                sst = calculate_historical_sst_precise(now)
-                sst_label = "⚠️ 統計値 (推計)"
-            
-            wind_spd = current["wind_speed_10m"]
-            wind_dir = current["wind_direction_10m"]
-            cloud = current["cloud_cover"]
-            rain = current["rain"]
-            
-            daily = data.get("daily", {})
-            sunrise = daily.get("sunrise", [None])[0]
-            sunset = daily.get("sunset", [None])[0]
-            
-            tide_factor, is_rising, real_knot, is_official = get_hybrid_tide_data(now, now, port_info)
-            
-            rec_weight, rec_color, rec_size, rec_maker, rec_speed, rec_tactic, is_synced, tide_dir_deg = calc_strategy_realtime(
-                wind_spd, wind_dir, tide_factor, is_rising, sst, cloud, rain, target_depth_mode, sunrise, sunset, now, port_key
-            )
+        board = load_board(location)
+    timer.lap("fetch_wait")
+    if board is None:
+        st.error("天気データが取得できませんでした。しばらく経ってからリロードしてください。")
+        return
+    cond = board.cond
+    data, port_info = cond.data, cond.port_info
+    sst, sst_label = cond.sst, SST_LABELS[cond.sst_source]
+    wind_spd, wind_dir = cond.wind_spd, cond.wind_dir
+    is_synced = cond.is_synced
 
-            matsuri_score = calculate_matsuri_score(tide_factor, is_synced, wind_spd, sst, rain)
-            score_comment = get_score_comment(matsuri_score)
+    probe_timings = data.get("sst_probe_timings")
+    if probe_timings and is_debug() and not find_fixed_key(location["lat"], location["lon"]):
+        with st.expander("⏱️ 周辺水温探索の内訳 (debug)"):
+            for t in probe_timings:
+                label = "合計" if t["offset"] is None else f"緯度{t['offset'][0]:+.2f} / 経度{t['offset'][1]:+.2f}"
+                ms = "-" if t["elapsed_ms"] is None else f"{t['elapsed_ms']:.0f} ms"
+                st.caption(f"{label}: {t['status']} ({ms})")
 
-            best_seat_name, seat_code = calculate_best_seat(wind_dir, tide_dir_deg)
+    timer.lap("analysis")
 
-            wind_cardinal = deg_to_cardinal(wind_dir) 
-            tide_cardinal = deg_to_cardinal(tide_dir_deg) 
-            
-            if tide_factor < 0.1 and real_knot < 0.5: 
-                tide_display = "★転流/潮止まり"
-                knot_text = f"{real_knot:.1f} kt"
-            else: 
-                tide_display_suffix = "上げ" if is_rising else "下げ"
-                tide_display = f"{tide_cardinal}流 ({tide_display_suffix})"
-                knot_text = f"{real_knot:.1f} kt"
-
-            st.markdown("---")
-            
-            st.markdown(f"""
-            <div class="score-container">
-                <div class="score-label">🌊 魔釣指数 (Matsuri Index)</div>
-                <div class="score-value">{matsuri_score}<span style="font-size: 24px;">/10</span></div>
-                <div class="score-desc">{score_comment}</div>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            st.progress(matsuri_score / 10.0)
+    st.markdown("---")
 
-            port_msg = f"{port_info['name']}"
-            if port_info["offset_min"] != 0:
-                port_msg += f" (時差補正 +{port_info['offset_min']}分)"
-            elif use_gps and dist_km > 20:
-                port_msg += f" (距離 {int(dist_km)}km ※参考値)"
-            else:
-                port_msg += " (JCG公式)"
+    st.markdown(cond.score_html, unsafe_allow_html=True)
 
-            c1, c2, c3, c4 = st.columns(4)
-            c1.metric("風向き・風速", f"{wind_cardinal}", f"{wind_spd}m / {wind_dir}°")
-            c2.metric("潮流データ元", knot_text, port_msg)
-            c3.metric("水温", f"{sst}℃", sst_label) 
-            c4.metric("流れ", "同調" if is_synced else "逆/無", delta="Go!" if is_synced else "Stay", delta_color="normal" if is_synced else "off")
+    st.progress(cond.score / 10.0)
+    if is_full_run():
+        get_metrics().observe("time_to_first_board", time.perf_counter() - st.session_state["run_started"])
 
-            st.markdown("### 💺 現在の有利ポジション (潮先)")
-            st.caption("※スパンカーを使用し、船首を風上に向ける「縦流し」時の判定です。")
-            
-            def get_style(target_code):
-                base = "seat-cell"
-                if target_code == seat_code: return base + " seat-best"
-                if seat_code == "m_center" and target_code in ["m_left", "m_right"]: return base + " seat-best"
-                if seat_code == "t_center" and target_code in ["t_left", "t_right"]: return base + " seat-best"
-                return base
-
-            st.markdown(f"""
-            <div class="seat-grid">
-                <div class="boat-shape">
-                    <div class="wind-arrow">↑ 風 (Wind)</div>
-                    <div>▲ 船首 (ミヨシ)</div>
-                </div>
-                <div class="{get_style('m_left')}">左ミヨシ</div>
-                <div class="{get_style('m_right')}">右ミヨシ</div>
-                <div class="{get_style('c_left')}">左舷(胴)</div>
-                <div class="{get_style('c_right')}">右舷(胴)</div>
-                <div class="{get_style('t_left')}">左トモ</div>
-                <div class="{get_style('t_right')}">右トモ</div>
-                <div style="grid-column: 1 / -1; background-color: #90a4ae; color: white; border-radius: 0 0 10px 10px; padding: 5px;">
-                    ▼ 船尾 (トモ)
-                </div>
-            </div>
-            <div style="text-align: center; margin-top: 10px; font-weight: bold; color: #d63031;">
-                ★今の狙い目は「{best_seat_name}」周辺です！
-            </div>
-            """, unsafe_allow_html=True)
-
-            st.markdown(f"### 🦐 {target_depth_mode}エリア・リアルタイム攻め時")
-            
-            html_content = f"""
-<div class="rec-box">
-    <div class="rec-title">攻略スタイル (想定)</div>
-    <div class="rec-content" style="font-size: 22px; margin-bottom: 10px;">{rec_tactic}</div>
-    <div class="rec-title">推奨TGウェイト</div>
-    <div class="weight-val">{rec_weight}g</div>
-    <div class="captain-note">※重さは船長の指示がある場合はそちらに従ってください。</div>
-</div>
-"""
-            st.markdown(html_content, unsafe_allow_html=True)
-            
-            col_a, col_b = st.columns(2)
-            with col_a:
-                st.markdown(f"""
-                <div class="rec-box" style="border-color: #f39c12; background-color: #fef9e7;">
-                    <div class="rec-title">当たりネクタイ</div>
-                    <div class="rec-content" style="font-size: 16px;">{rec_color}</div>
-                </div>
-                """, unsafe_allow_html=True)
-            with col_b:
-                st.markdown(f"""
-                <div class="rec-box" style="border-color: #e67e22; background-color: #fdf2e9;">
-                    <div class="rec-title">推奨サイズ / 形状</div>
-                    <div class="rec-content" style="font-size: 16px;">{rec_size}</div>
-                    <div class="maker-rec">{rec_maker}</div>
-                </div>
-                """, unsafe_allow_html=True)
-
-            st.markdown(f"""
-            <div class="rec-box" style="border-color: #3498db; background-color: #ebf5fb; margin-top: 5px;">
-                <div class="rec-title">リトリーブスピード</div>
-                <div class="rec-content" style="font-size: 20px;">{rec_speed}</div>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            st.info(f"**【玄人解説】**\n現在、風は**{wind_cardinal}**から吹いており船首はその方向を向いています。\n潮流は**{tide_cardinal}方向**へ**{knot_text}**の速さで流れているため、潮先となる**「{best_seat_name}」**にいち早くポイントが入ります。")
+    port_msg = f"{port_info.name}"
+    if port_info.offset_min != 0:
+        port_msg += f" (時差補正 +{port_info.offset_min}分)"
+    elif location["use_gps"] and location["dist_km"] > 20:
+        port_msg += f" (距離 {int(location['dist_km'])}km ※参考値)"
+    else:
+        port_msg += " (JCG公式)"
 
-            st.markdown("### 🔮 この先6時間の予報 (Wind & Tide & Index)")
-            
-            forecast_html = "<table class='forecast-table'><thead><tr><th style='width:12%;'>時間</th><th style='width:27%;'>天気/風</th><th style='width:23%;'>潮流(推)</th><th style='width:28%;'>色(目安)/大・中・小</th><th style='width:10%;'>指数</th></tr></thead><tbody>"
-            
-            for i in range(1, 7):
-                f_time = now + datetime.timedelta(hours=i)
-                f_h = f_time.hour
-                target_idx = now.hour + i
-                
-                fw_spd = 0
-                fw_dir = 0
-                ft_rain = 0
-                ft_sst = sst
-                fw_cloud = cloud 
-                fw_text = "- - -"
-                
-                if data["hourly"]["wind_speed_10m"] and len(data["hourly"]["wind_speed_10m"]) > target_idx:
-                    fw_spd = data["hourly"]["wind_speed_10m"][target_idx]
-                    fw_dir = data["hourly"]["wind_direction_10m"][target_idx]
-                    ft_rain = data["hourly"]["rain"][target_idx]
-                    
-                    if data["hourly"].get("cloud_cover") and len(data["hourly"]["cloud_cover"]) > target_idx:
-                        fw_cloud = data["hourly"]["cloud_cover"][target_idx]
-                    
-                    raw_ft_sst = data["hourly"]["sea_surface_temperature"][target_idx] if (data["hourly"]["sea_surface_temperature"] and target_idx < len(data["hourly"]["sea_surface_temperature"])) else None
-                    ft_sst = raw_ft_sst if raw_ft_sst is not None else sst
-                    
-                    fw_card = deg_to_cardinal(fw_dir)
-                    fw_code = data["hourly"]["weather_code"][target_idx]
-                    w_icon = "☀️"
-                    if fw_code > 3: w_icon = "☁️"
-                    if fw_code > 50: w_icon = "☔"
-                    fw_text = f"<span style='font-size:11px;'>{w_icon}<br>{fw_card} {fw_spd:.1f}m</span>"
-
-                ft_fac, ft_rise, ft_knot, ft_off = get_hybrid_tide_data(f_time, now, port_info)
-                tide_source = "" if ft_off else "<br><span style='font-size:9px;color:gray;'>(推)</span>"
-                
-                if ft_fac < 0.1 and ft_knot < 0.5:
-                    ft_text = f"<span class='fc-tide-stop' style='font-size:11px;'>転流<br>潮止</span>{tide_source}"
-                else:
-                    ft_dir_s = "西(上)" if ft_rise else "東(下)"
-                    ft_text = f"<span style='font-size:11px;'>{ft_dir_s}<br>{ft_knot:.1f}kt</span>{tide_source}"
-                
-                ft_tide_dir_deg = 280 if ft_rise else 100
-                diff_angle = abs(fw_dir - ft_tide_dir_deg)
-                if diff_angle > 180: diff_angle = 360 - diff_angle
-                ft_synced = diff_angle < 90
-                
-                f_score = calculate_matsuri_score(ft_fac, ft_synced, fw_spd, ft_sst, ft_rain)
-                
-                score_class = "fc-score-low"
-                if f_score >= 8:
-                    score_class = "fc-score-high"
-                elif f_score >= 6:
-                    score_class = "fc-score-mid"
-                
-                f_score_html = f"<span class='{score_class}'>{f_score}</span>"
-
-                day_str = ""
-                if f_time.day != now.day:
-                    day_str = "<span style='font-size:9px;color:blue;'>(翌)</span><br>"
-                
-                f_rec_weight, f_rec_color, f_rec_size, f_rec_maker, f_rec_speed, f_rec_tactic, f_is_synced, f_tide_dir_deg = calc_strategy_realtime(
-                    fw_spd, fw_dir, ft_fac, ft_rise, ft_sst, fw_cloud, ft_rain, target_depth_mode, sunrise, sunset, f_time, port_key
-                )
-                
-                short_color = f_rec_color.split(" / ")[0].split(" [")[0]
-                size_class, size_text = get_size_label(f_rec_size)
-                color_size_html = f"<span style='font-size:10px; font-weight:bold; color:#d35400;'>{short_color}</span><br><span class='size-label {size_class}'>サイズ: {size_text}</span>"
-                
-                forecast_html += f"<tr><td class='fc-time'>{day_str}{f_h}:00</td><td>{fw_text}</td><td>{ft_text}</td><td style='line-height:1.4;'>{color_size_html}</td><td>{f_score_html}</td></tr>"
-            
-            forecast_html += "</tbody></table>"
-            st.markdown(forecast_html, unsafe_allow_html=True)
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("風向き・風速", f"{cond.wind_cardinal}", f"{wind_spd}m / {wind_dir}°")
+    c2.metric("潮流データ元", cond.knot_text, port_msg)
+    c3.metric("水温", f"{sst}℃", sst_label)
+    c4.metric("流れ", "同調" if is_synced else "逆/無", delta="Go!" if is_synced else "Stay", delta_color="normal" if is_synced else "off")
 
-        else:
-            st.error("天気データが取得できませんでした。しばらく経ってからリロードしてください。")
+    weather_age = data_age_sec(data.get("fetched_at"))
+    if data.get("fallback"):
+        st.caption("⚡ 通信が遅いため、前回取得した天気で表示しています (水温は統計値)")
+    elif weather_age is not None and weather_age > WEATHER_TTL_SEC:
+        st.caption(f"⏳ 天気データは約{int(weather_age // 60)}分前の取得分です (裏で再取得中)")
+    if cond.is_official:
+        tide_table = get_jcg_tide_data(JCG_POINTS[port_info.ref_key].url)
+        tide_age = data_age_sec(tide_table.fetched_at) if tide_table is not None else None
+        if tide_age is not None and tide_age > TIDE_TTL_SEC:
+            st.caption(f"⏳ 潮流データは約{int(tide_age // 60)}分前の取得分です (裏で再取得中)")
+    timer.lap("board")
+
+    st.markdown("### 💺 現在の有利ポジション (潮先)")
+    st.caption("※スパンカーを使用し、船首を風上に向ける「縦流し」時の判定です。")
+
+    st.markdown(cond.seat_html, unsafe_allow_html=True)
+    timer.lap("seat")
+
+@st.fragment(run_every=WEATHER_TTL_SEC)
+def depth_fragment():
+    st.markdown("### 🎣 ターゲット水深 (Depth)")
+    target_depth_mode = st.radio(
+        "狙うポイントの水深を選択してください:",
+        list(DEPTH_MODES),
+        index=DEPTH_MODES.index(DEFAULT_DEPTH_MODE), 
+        horizontal=True,
+        key="depth_mode"
+    )
+    timer = stage_timer("depth")
+    location = st.session_state["location"]
+    board = load_board(location, target_depth_mode)
+    if board is None: return
+    tactic_html, color_html, size_html, speed_html = board.strategy_html
+    cond = board.cond
+    wind_cardinal, tide_cardinal, knot_text, best_seat_name = cond.wind_cardinal, cond.tide_cardinal, cond.knot_text, cond.best_seat_name
+    timer.lap("boards")
+
+    st.markdown(f"### 🦐 {target_depth_mode}エリア・リアルタイム攻め時")
+    st.markdown(tactic_html, unsafe_allow_html=True)
+
+    col_a, col_b = st.columns(2)
+    with col_a:
+        st.markdown(color_html, unsafe_allow_html=True)
+    with col_b:
+        st.markdown(size_html, unsafe_allow_html=True)
+
+    st.markdown(speed_html, unsafe_allow_html=True)
+
+    st.info(f"**【玄人解説】**\n現在、風は**{wind_cardinal}**から吹いており船首はその方向を向いています。\n潮流は**{tide_cardinal}方向**へ**{knot_text}**の速さで流れているため、潮先となる**「{best_seat_name}」**にいち早くポイントが入ります。")
+
+    st.markdown("### 🔮 この先6時間の予報 (Wind & Tide & Index)")
+    timer.lap("recs")
+
+    st.markdown(board.forecast_html, unsafe_allow_html=True)
+    timer.lap("forecast_table")
+
+def main():
+    st.session_state["full_run"] = True
+    st.session_state["run_started"] = time.perf_counter()
+    metrics = get_metrics()
+    render = stage_timer("app")
+    st.markdown(f"<style>{APP_CSS}</style>", unsafe_allow_html=True)
+    get_refresh_scheduler()  # 初回アクセス時に裏の先回り更新を開始
+    st.markdown("""
+        <h1 style='text-align: center; color: #2c3e50;'>⚓️ 魔釣 Pro</h1>
+        <p style='text-align: center; font-size: 14px; color: gray;'>
+            瀬戸内タイラバの「今」を制する<br>
+            玄人のための海況戦術盤<br>
+            [明石/鳴門/小豆島/瀬戸大橋 対応] v22.7
+        </p>
+    """, unsafe_allow_html=True)
+
+    location_fragment()
+    render.lap("location")
+    board_fragment()
+    render.lap("board")
+    depth_fragment()
+    render.lap("depth")
 
     st.markdown("---")
     if st.button("🔄 情報を更新する"):
@@ -890,6 +1303,12 @@ def main():
     </div>
     """, unsafe_allow_html=True)
 
+    render.lap("footer")
+    metrics.observe("render_total", render.elapsed())
+    if is_debug():
+        render_debug_panel(metrics, render)
+    st.session_state["full_run"] = False
+
 if __name__ == "__main__":
     main()
 
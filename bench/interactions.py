@@ -0,0 +1,137 @@
+# 操作ごとの再実行の重さ: 「全体の再実行」と「フラグメントだけの再実行」でスクリプトの CPU 時間と送るデータ量を比べる
+#   python bench/interactions.py                 # 各操作を5回ずつ測って bench/results/interactions-<コミット>.json に保存
+# AppTest はいつも全体を再実行するので、フラグメントの実行はブラウザと同じく fragment_id_queue を付けた再実行で再現する
+# AppTest は実行ごとにスクリプトをコンパイルし直す (本番はキャッシュ) ので、CPU 時間はスクリプト本体の実行分だけを数える
+# 通信はしない (startup.py と同じく記録データを一時的な保存データに入れて読ませる)
+# AppTest はブラウザのメッセージキャッシュを持たないので、キャッシュ対象 (.streamlit/config.toml の minCachedMessageSize 以上) の
+# 要素は、一度送ったものならハッシュだけを送ったとして数えた量も出す (cached_bytes。ブラウザでの実際の送信量)
+import argparse
+import datetime
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(BENCH_DIR, "..")
+sys.path.insert(0, ROOT)
+
+# matsuri は読み込んだときに保存先を決めるので、run / startup (→ matsuri) を読む前に一時的な保存先を指しておく
+_STORE_DIR = tempfile.TemporaryDirectory(prefix="matsuri-bench-")
+os.environ["MATSURI_RESPONSE_STORE"] = os.path.join(_STORE_DIR.name, "responses.sqlite3")
+os.environ.pop("MATSURI_METRICS_PORT", None)
+
+from run import RESULT_DIR, git_revision
+from startup import seed_store
+
+REPEAT = 5
+DEPTH_VALUES = ("80m", "15m")  # 交互に切り替える
+
+# 再実行1回分の記録 (スクリプトのスレッドの CPU 時間・送ったメッセージ)
+_RUN = {"fragments": None, "cpu_sec": 0.0, "bytes": 0, "cached_bytes": 0, "msgs": 0, "elements": {}}
+_SENT_HASHES = set()  # このセッションで送ったキャッシュ対象のメッセージ (ブラウザが持っているもの)
+
+def _install_hooks():
+    import streamlit.testing.v1.local_script_runner as lsr
+    from streamlit.runtime.forward_msg_cache import create_reference_msg
+    from streamlit.runtime.forward_msg_queue import ForwardMsgQueue
+    import streamlit.runtime.scriptrunner.script_runner as script_runner
+
+    rerun_data = lsr.RerunData
+    def fragment_rerun_data(*args, **kwargs):
+        if _RUN["fragments"]: kwargs["fragment_id_queue"] = list(_RUN["fragments"])
+        return rerun_data(*args, **kwargs)
+    lsr.RerunData = fragment_rerun_data
+
+    exec_func = script_runner.exec_func_with_error_handling
+    def timed_exec_func(func, ctx):
+        t0 = time.thread_time()
+        try:
+            return exec_func(func, ctx)
+        finally:
+            _RUN["cpu_sec"] += time.thread_time() - t0
+    script_runner.exec_func_with_error_handling = timed_exec_func
+
+    enqueue = ForwardMsgQueue.enqueue
+    def counting_enqueue(self, msg):
+        _RUN["bytes"] += msg.ByteSize()
+        _RUN["msgs"] += 1
+        if msg.metadata.cacheable and msg.hash in _SENT_HASHES:
+            _RUN["cached_bytes"] += create_reference_msg(msg).ByteSize()
+        else:
+            _RUN["cached_bytes"] += msg.ByteSize()
+            if msg.metadata.cacheable: _SENT_HASHES.add(msg.hash)
+        if msg.HasField("delta") and msg.delta.fragment_id and msg.delta.HasField("new_element"):
+            _RUN["elements"].setdefault(msg.delta.fragment_id, set()).add(msg.delta.new_element.WhichOneof("type"))
+        return enqueue(self, msg)
+    ForwardMsgQueue.enqueue = counting_enqueue
+
+def _reset(fragments=None):
+    _RUN.update(fragments=fragments, cpu_sec=0.0, bytes=0, cached_bytes=0, msgs=0, elements={})
+
+def find_fragments(elements):
+    # 最初の全体実行で出た要素の種類から、どのフラグメントがどれかを決める
+    ids = {}
+    for fragment_id, types in elements.items():
+        if "checkbox" in types: ids["location"] = fragment_id
+        elif "metric" in types: ids["board"] = fragment_id
+        elif "radio" in types: ids["depth"] = fragment_id
+    return ids
+
+def measure(at, interaction, repeat):
+    runs = []
+    for i in range(repeat):
+        _reset()
+        at.run()  # 毎回、全体を描いた状態から始める (フラグメントだけの実行のあとは画面の木が部分的になるため)
+        name, fragments, depth = interaction
+        _reset(fragments)
+        if depth is not None: at.radio(key="depth_mode").set_value(DEPTH_VALUES[i % 2])
+        at.run()
+        assert not at.exception, at.exception
+        runs.append((_RUN["cpu_sec"] * 1000, _RUN["bytes"], _RUN["msgs"], _RUN["cached_bytes"]))
+    cpu = [r[0] for r in runs]
+    return {"cpu_ms_median": round(statistics.median(cpu), 1), "cpu_ms_best": round(min(cpu), 1),
+            "bytes": runs[-1][1], "cached_bytes": runs[-1][3], "msgs": runs[-1][2], "repeat": repeat}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("-o", "--output", help="結果の保存先 (省略時は bench/results/interactions-<コミット>.json)")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    results = {}
+    with _STORE_DIR:
+        seed_store(os.environ["MATSURI_RESPONSE_STORE"])
+        _install_hooks()
+        from streamlit.testing.v1 import AppTest
+        at = AppTest.from_file(os.path.join(os.path.abspath(ROOT), "app.py"), default_timeout=60)
+        _reset()
+        at.run()
+        assert not at.exception, at.exception
+        ids = find_fragments(_RUN["elements"])
+        interactions = [
+            ("depth.full_rerun", None, True),
+            ("depth.fragment", [ids["depth"]], True),
+            ("refresh.full_rerun", None, None),
+            ("refresh.fragments", [ids["board"], ids["depth"]], None),  # run_every で盤面と水深だけ更新
+        ]
+        for interaction in interactions:
+            results[interaction[0]] = r = measure(at, interaction, args.repeat)
+            print(f"{interaction[0]:20s} {r['cpu_ms_median']:8.1f} ms cpu (best {r['cpu_ms_best']:.1f})"
+                  f"  {r['bytes'] / 1024:7.1f} KiB (cached {r['cached_bytes'] / 1024:.1f} KiB) / {r['msgs']} msgs", file=sys.stderr)
+
+    revision = git_revision()
+    report = {"revision": revision, "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+              "python": sys.version.split()[0], "results": results}
+    out = args.output or os.path.join(RESULT_DIR, f"interactions-{revision}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"-> {out}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
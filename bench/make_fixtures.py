@@ -0,0 +1,149 @@
+# ベンチマーク用の記録データを作る
+#   python bench/make_fixtures.py record     # 実際の Open-Meteo / JCG の応答をそのまま bench/fixtures/recorded/ に保存 (要ネットワーク)
+#   python bench/make_fixtures.py            # 決まった基準時刻の合成データを bench/fixtures/ に (通信できない環境での代わり)
+# 記録したものはコミットして、ベンチマークはいつもこのファイルだけを読む (通信しない)。
+# bench/run.py は recorded/ があればそちらを使い、無ければ合成データで測る (結果の fixtures.source に残る)
+import argparse
+import datetime
+import json
+import math
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from matsuri import JCG_POINTS, parse_jcg_html, parse_open_meteo, station_batch_points
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+RECORDED_DIR = os.path.join(FIXTURE_DIR, "recorded")
+JST = datetime.timezone(datetime.timedelta(hours=9))
+SYNTHETIC_NOW = datetime.datetime(2026, 5, 16, 8, 30, tzinfo=JST)
+FORECAST_DAYS = 3
+
+def _wave(i, period, phase=0.0):
+    return math.sin(2 * math.pi * i / period + phase)
+
+def synthetic_open_meteo(lat, lon, now, seed=0):
+    # アプリの _open_meteo_url と同じ項目・同じ並び (0時から72時間) の応答
+    day0 = datetime.datetime.combine(now.date(), datetime.time())
+    n = 24 * FORECAST_DAYS
+    times = [(day0 + datetime.timedelta(hours=h)).strftime("%Y-%m-%dT%H:%M") for h in range(n)]
+    phase = (lat * 7 + lon * 3 + seed) % (2 * math.pi)
+    # 沿岸の格子は水温が欠けることがある (周辺補完の経路も通るように一部の地点は null)
+    has_sst = int((lat * 1000 + lon * 1000) % 3) != 0
+    hourly = {
+        "time": times,
+        "sea_surface_temperature": [round(17.5 + 1.2 * _wave(h, 24, phase), 1) if has_sst else None for h in range(n)],
+        "wind_speed_10m": [round(max(0.0, 4 + 3.5 * _wave(h, 17, phase)), 1) for h in range(n)],
+        "wind_direction_10m": [int((240 + 90 * _wave(h, 29, phase)) % 360) for h in range(n)],
+        "weather_code": [(0, 1, 2, 3, 45, 51, 61, 80)[int(4 + 3.9 * _wave(h, 31, phase))] for h in range(n)],
+        "rain": [round(max(0.0, 1.5 * _wave(h, 23, phase) - 0.6), 1) for h in range(n)],
+        "cloud_cover": [int(50 + 49 * _wave(h, 13, phase)) for h in range(n)],
+    }
+    hour = now.hour
+    return {
+        "latitude": round(lat, 4), "longitude": round(lon, 4), "generationtime_ms": 0.1, "utc_offset_seconds": 32400,
+        "timezone": "Asia/Tokyo", "timezone_abbreviation": "GMT+9", "elevation": 0.0,
+        "current_units": {"time": "iso8601", "interval": "seconds", "temperature_2m": "°C", "wind_speed_10m": "m/s",
+                          "wind_direction_10m": "°", "cloud_cover": "%", "rain": "mm"},
+        "current": {"time": now.strftime("%Y-%m-%dT%H:%M"), "interval": 900, "temperature_2m": round(19 + 3 * _wave(hour, 24, phase), 1),
+                    "wind_speed_10m": hourly["wind_speed_10m"][hour], "wind_direction_10m": hourly["wind_direction_10m"][hour],
+                    "cloud_cover": hourly["cloud_cover"][hour], "rain": hourly["rain"][hour]},
+        "hourly_units": {"time": "iso8601", "sea_surface_temperature": "°C", "wind_speed_10m": "m/s",
+                         "wind_direction_10m": "°", "weather_code": "wmo code", "rain": "mm", "cloud_cover": "%"},
+        "hourly": hourly,
+        "daily_units": {"time": "iso8601", "sunrise": "iso8601", "sunset": "iso8601"},
+        "daily": {
+            "time": [(now.date() + datetime.timedelta(days=d)).isoformat() for d in range(FORECAST_DAYS)],
+            "sunrise": [f"{now.date() + datetime.timedelta(days=d)}T04:{50 - d:02d}" for d in range(FORECAST_DAYS)],
+            "sunset": [f"{now.date() + datetime.timedelta(days=d)}T18:{55 + d:02d}" for d in range(FORECAST_DAYS)],
+        },
+    }
+
+def synthetic_jcg_html(key):
+    # JCG の潮流ページと同じ形 (Shift_JIS、見出し行+10分ごとの行、後ろに別の表)
+    phase = {"akashi": 0.0, "naruto": 1.3, "tomogashima": 2.1}.get(key, 0.0)
+    peak = {"akashi": 6.5, "naruto": 9.8, "tomogashima": 4.2}.get(key, 5.0)
+    rows = ["<tr><th>時</th><th>分</th><th>流向</th><th>流速(ノット)</th><th>備考</th></tr>"]
+    for m in range(0, 24 * 60 + 1, 10):
+        v = peak * math.sin(2 * math.pi * m / 745.2 + phase)
+        h, mi = divmod(m, 60)
+        label = "西流" if v >= 0 else "東流"
+        note = "最強" if abs(v) > peak * 0.98 else ("転流" if abs(v) < 0.15 else "")
+        rows.append(f"<tr><td>{h}</td><td>{mi}</td><td>{label}</td><td>{abs(v):.1f}</td><td>{note}</td></tr>")
+    name = JCG_POINTS[key].name
+    html = ("<html><head><meta http-equiv='Content-Type' content='text/html; charset=Shift_JIS'>"
+            f"<title>{name} 潮流推算</title></head><body><h1>{name}</h1>"
+            f"<table border='1'>{''.join(rows)}</table>"
+            "<table><tr><td>海上保安庁</td><td>潮流推算</td></tr></table></body></html>")
+    return html.encode("shift_jis")
+
+def write_fixtures(out_dir, now, station_payloads, batch_payloads, pages, source, **extra):
+    os.makedirs(out_dir, exist_ok=True)
+    for key, body in station_payloads.items():
+        with open(os.path.join(out_dir, f"open_meteo_{key}.json"), "wb") as f: f.write(body)
+    with open(os.path.join(out_dir, "open_meteo_batch.json"), "wb") as f: f.write(batch_payloads)
+    for key, body in pages.items():
+        with open(os.path.join(out_dir, f"stream_{key}.html"), "wb") as f: f.write(body)
+    meta = {"now": now.isoformat(), "source": source, "stations": list(station_payloads), "tide_pages": list(pages),
+            "batch_points": len(station_batch_points()), **extra}
+    with open(os.path.join(out_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    print(f"{source}: {len(station_payloads)} 地点 + 一括 {meta['batch_points']} 地点 + 潮流表 {len(pages)} 枚 -> {out_dir}")
+
+def make_synthetic():
+    now = SYNTHETIC_NOW
+    stations = {key: json.dumps(synthetic_open_meteo(pt.lat, pt.lon, now), ensure_ascii=False).encode("utf-8")
+                for key, pt in JCG_POINTS.items()}
+    batch = json.dumps([synthetic_open_meteo(lat, lon, now, seed=i) for i, (lat, lon) in enumerate(station_batch_points())],
+                       ensure_ascii=False).encode("utf-8")
+    pages = {key: synthetic_jcg_html(key) for key, pt in JCG_POINTS.items() if pt.url}
+    write_fixtures(FIXTURE_DIR, now, stations, batch, pages, "synthetic",
+                   note="合成データ (記録データ bench/fixtures/recorded/ が無いときの代わり)")
+
+def check_recorded(stations, batch, pages):
+    # 読めない応答 (エラーページ・項目の欠け・地点数の違い) は保存しない。古い記録を半端に上書きしないため
+    problems = []
+    for key, body in stations.items():
+        try:
+            if len(parse_open_meteo(body)["hourly"]) < 24: problems.append(f"{key}: hourly が24時間に満たない")
+        except Exception as e:
+            problems.append(f"{key}: Open-Meteo の応答を読めない ({e})")
+    try:
+        n = len(parse_open_meteo(batch))
+        if n != len(station_batch_points()): problems.append(f"一括: {n} 地点 (期待 {len(station_batch_points())})")
+    except Exception as e:
+        problems.append(f"一括: Open-Meteo の応答を読めない ({e})")
+    for key, page in pages.items():
+        if parse_jcg_html(page) is None: problems.append(f"{key}: 潮流表が読めない")
+    return problems
+
+def record_live():
+    import app  # 取得はアプリのHTTP層を使う
+    now = datetime.datetime.now(JST).replace(second=0, microsecond=0)
+    urls = {key: app._open_meteo_url(pt.lat, pt.lon) for key, pt in JCG_POINTS.items()}
+    stations = {key: app.http_get(url, timeout=10) for key, url in urls.items()}
+    points = station_batch_points()
+    lats = ",".join(f"{lat:.4f}" for lat, _ in points)
+    lons = ",".join(f"{lon:.4f}" for _, lon in points)
+    batch = app.http_get(app._open_meteo_url(lats, lons), timeout=20)
+    pages = {key: app.http_get(pt.url, timeout=10) for key, pt in JCG_POINTS.items() if pt.url}
+    problems = check_recorded(stations, batch, pages)
+    if problems:
+        print("\n".join(problems), file=sys.stderr)
+        sys.exit("記録を中止 (何も書き換えていない)")
+    write_fixtures(RECORDED_DIR, now, stations, batch, pages, "recorded",
+                   urls={**urls, **{f"stream_{key}": pt.url for key, pt in JCG_POINTS.items() if pt.url}})
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", nargs="?", choices=["synthetic", "record"], default="synthetic")
+    args = parser.parse_args()
+    if args.command == "record":
+        record_live()
+    else:
+        make_synthetic()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# キャッシュに持つデータ1件あたりのメモリ (tracemalloc で、作ったあとに残っている分):
+# Open-Meteo の1地点分 (JSON のままの dict と HourlyForecast) と、BoardCache の1か所分の盤面 (全水深)
+#   python bench/memory.py            # bench/results/memory-<コミット>.json に保存
+# 盤面は辞書で持っていたとき (水深ごとに全項目を写した dict) と Board / Conditions を同じ値から作って比べる。
+# 戦略・HTML の文字列は両方で共有するので、比べるのは入れ物の分だけ (全体は boards.build_all を参照)
+import argparse
+import datetime
+import gc
+import json
+import os
+import sys
+import tracemalloc
+import warnings
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(BENCH_DIR, "..")
+sys.path.insert(0, ROOT)
+
+from run import RESULT_DIR, git_revision, load_fixtures
+
+from matsuri import JCG_POINTS, TideSource, parse_jcg_html, parse_open_meteo
+
+def retained(build):
+    # build() の戻り値が持っているメモリ (途中で捨てた分は数えない)
+    gc.collect()
+    tracemalloc.start()
+    value = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, size
+
+def payload_cases(fx):
+    results = {}
+    for key, body in fx["stations"].items():
+        raw, raw_size = retained(lambda: json.loads(body))
+        _, size = retained(lambda: parse_open_meteo(body))
+        results[f"payload.{key}"] = {"hours": len(raw["hourly"]["time"]), "dict_bytes": raw_size, "bytes": size,
+                                     "ratio": round(size / raw_size, 3)}
+    _, raw_size = retained(lambda: json.loads(fx["batch"]))
+    batch, size = retained(lambda: parse_open_meteo(fx["batch"]))
+    results["payload.batch"] = {"points": len(batch), "dict_bytes": raw_size, "bytes": size, "ratio": round(size / raw_size, 3)}
+    return results
+
+def board_cases(fx):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        import app
+    now = fx["now"].replace(tzinfo=datetime.timezone(datetime.timedelta(hours=9)))
+    tides = TideSource({key: parse_jcg_html(html) for key, html in fx["pages"].items()}, {})
+    results = {}
+    for key, body in fx["stations"].items():
+        data = parse_open_meteo(body)
+        boards, total = retained(lambda: app.build_boards(now, data, JCG_POINTS[key], key, tides))
+        cond = next(iter(boards.values())).cond
+        fields = {name: getattr(cond, name) for name in app.Conditions.__slots__}
+        def as_dicts():
+            # 以前の形: 水深ごとに、水深に依らない値も含めた全項目の dict
+            return {depth: dict(fields, strategy=b.strategy, strategy_html=b.strategy_html,
+                                forecast_html=b.forecast_html) for depth, b in boards.items()}
+        def as_records():
+            c = app.Conditions(**fields)
+            return {depth: app.Board(c, depth, b.strategy, b.strategy_html, b.forecast_html) for depth, b in boards.items()}
+        _, dict_size = retained(as_dicts)
+        _, size = retained(as_records)
+        results[f"boards.{key}"] = {"depths": len(boards), "dict_bytes": dict_size, "bytes": size,
+                                    "ratio": round(size / dict_size, 3), "build_all_bytes": total}
+    return results
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-o", "--output", help="結果の保存先 (省略時は bench/results/memory-<コミット>.json)")
+    args = parser.parse_args()
+
+    fx = load_fixtures()
+    results = payload_cases(fx)
+    try:
+        results.update(board_cases(fx))
+    except ImportError:
+        print("Streamlit が無いので盤面 (boards.*) は飛ばします", file=sys.stderr)
+    for name, r in results.items():
+        print(f"{name:28s} {r['dict_bytes'] / 1024:8.1f} KiB -> {r['bytes'] / 1024:8.1f} KiB  (x{r['ratio']})", file=sys.stderr)
+
+    revision = git_revision()
+    report = {"revision": revision, "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+              "python": sys.version.split()[0], "results": results}
+    out = args.output or os.path.join(RESULT_DIR, f"memory-{revision}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"-> {out}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
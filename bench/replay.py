@@ -0,0 +1,120 @@
+# 過去データの再計算 (matsuri.replay) の速さとメモリ: 全5港 × 1年分 (と3年分) の合成データを流して、
+# 時間と、ピークメモリ (tracemalloc) が期間の長さに依らないことを確かめる
+#   python bench/replay.py                 # bench/results/replay-<コミット>.json に保存
+#   python bench/replay.py --years 1 --csv # 成績表 (CSV) の書き出しも含めて測る
+# 合成データは bench/make_fixtures.py と同じ作り方の波を1年に延ばし、月ごとのファイルにして一時ディレクトリに置く
+import argparse
+import csv
+import datetime
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(BENCH_DIR, "..")
+sys.path.insert(0, ROOT)
+
+from run import RESULT_DIR, git_revision
+
+from matsuri import JCG_POINTS, ScoreHeatmap, TideSource, iter_replay, score_header, score_rows
+
+START_YEAR = 2025
+
+def _wave(i, period, phase=0.0):
+    return math.sin(2 * math.pi * i / period + phase)
+
+def synthetic_month(lat, lon, year, month):
+    # 1か月分の Open-Meteo の hourly / daily (保存データと同じ形)。日の出・日の入りは季節で動かす
+    first = datetime.datetime(year, month, 1)
+    days = ((first.replace(day=28) + datetime.timedelta(days=4)).replace(day=1) - first).days
+    h0 = int((first - datetime.datetime(START_YEAR, 1, 1)).total_seconds() // 3600)
+    phase = (lat * 7 + lon * 3) % (2 * math.pi)
+    hours = range(h0, h0 + days * 24)
+    season = [_wave(h, 24 * 365.25, -math.pi / 2) for h in hours]  # 1月に -1、7月に +1
+    hourly = {
+        "time": [(first + datetime.timedelta(hours=h - h0)).strftime("%Y-%m-%dT%H:%M") for h in hours],
+        "sea_surface_temperature": [None if h % 97 < 5 else round(18.5 + 8 * s + 1.2 * _wave(h, 24, phase), 1)
+                                    for h, s in zip(hours, season)],
+        "wind_speed_10m": [round(max(0.0, 4 + 3.5 * _wave(h, 17, phase) - 1.5 * s), 1) for h, s in zip(hours, season)],
+        "wind_direction_10m": [int((240 + 90 * _wave(h, 29, phase)) % 360) for h in hours],
+        "weather_code": [(0, 1, 2, 3, 45, 51, 61, 80)[int(4 + 3.9 * _wave(h, 31, phase))] for h in hours],
+        "rain": [round(max(0.0, 1.5 * _wave(h, 23, phase) - 0.6), 1) for h in hours],
+        "cloud_cover": [int(50 + 49 * _wave(h, 13, phase)) for h in hours],
+    }
+    dates = [first.date() + datetime.timedelta(days=d) for d in range(days)]
+    shift = [int(70 * _wave(h0 // 24 + d, 365.25, -math.pi / 2)) for d in range(days)]  # 夏至で日の出が70分早い
+    daily = {
+        "time": [d.isoformat() for d in dates],
+        "sunrise": [(datetime.datetime.combine(d, datetime.time(5, 50)) - datetime.timedelta(minutes=m)).strftime("%Y-%m-%dT%H:%M")
+                    for d, m in zip(dates, shift)],
+        "sunset": [(datetime.datetime.combine(d, datetime.time(17, 50)) + datetime.timedelta(minutes=m)).strftime("%Y-%m-%dT%H:%M")
+                   for d, m in zip(dates, shift)],
+    }
+    return {"latitude": lat, "longitude": lon, "timezone": "Asia/Tokyo", "hourly": hourly, "daily": daily}
+
+def write_archive(archive_dir, years):
+    for port_key, pt in JCG_POINTS.items():
+        os.makedirs(os.path.join(archive_dir, port_key), exist_ok=True)
+        for year in range(START_YEAR, START_YEAR + years):
+            for month in range(1, 13):
+                with open(os.path.join(archive_dir, port_key, f"{year}-{month:02d}.json"), "w", encoding="utf-8") as f:
+                    json.dump(synthetic_month(pt.lat, pt.lon, year, month), f)
+
+def replay_once(archive_dir, out_path=None):
+    tides = TideSource()  # 年間予測表は環境で有無が変わるので使わない (推計)
+    heatmap = ScoreHeatmap()
+    out = open(out_path, "w", encoding="utf-8", newline="") if out_path else None
+    writer = csv.writer(out) if out else None
+    try:
+        if writer: writer.writerow(score_header())
+        for chunk in iter_replay(archive_dir, tides):
+            heatmap.add(chunk["port"], chunk["month"], chunk["hour"], chunk["score"])
+            if writer: writer.writerows(score_rows(chunk))
+    finally:
+        if out: out.close()
+    return heatmap
+
+def measure(archive_dir, out_path):
+    t0 = time.perf_counter()
+    heatmap = replay_once(archive_dir, out_path)
+    elapsed = time.perf_counter() - t0
+    tracemalloc.start()
+    replay_once(archive_dir, out_path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    hours = sum(heatmap.hours(p) for p in heatmap.ports())
+    return {"hours": hours, "sec": round(elapsed, 3), "hours_per_sec": round(hours / elapsed), "peak_kib": round(peak / 1024)}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", default="1,3", help="カンマ区切りの年数 (それぞれ別に測る)")
+    parser.add_argument("--csv", action="store_true", help="成績表 (CSV) の書き出しも含める")
+    parser.add_argument("-o", "--output", help="結果の保存先 (省略時は bench/results/replay-<コミット>.json)")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for years in (int(y) for y in args.years.split(",")):
+            archive_dir = os.path.join(tmp, f"archive-{years}y")
+            write_archive(archive_dir, years)
+            out_path = os.path.join(tmp, "scores.csv") if args.csv else None
+            name = f"replay.{years}y_5_stations" + (".csv" if args.csv else "")
+            results[name] = r = measure(archive_dir, out_path)
+            print(f"{name:28s} {r['hours']:7d} h  {r['sec'] * 1000:8.0f} ms  ({r['hours_per_sec']} h/s)  peak {r['peak_kib']} KiB",
+                  file=sys.stderr)
+
+    revision = git_revision()
+    report = {"revision": revision, "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+              "python": sys.version.split()[0], "results": results}
+    out = args.output or os.path.join(RESULT_DIR, f"replay-{revision}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"-> {out}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+# 記録データだけを使って処理ごとの時間を測り、コミットごとに JSON で残す
+# 実際の応答を記録した bench/fixtures/recorded/ があればそれを、無ければ合成データ (bench/fixtures/) を使う。
+# MATSURI_BENCH_FIXTURES=synthetic|recorded で固定できる
+#   python bench/run.py                          # 全項目を測って bench/results/<コミット>.json に保存
+#   python bench/run.py -k forecast              # 名前に forecast を含む項目だけ
+#   python bench/run.py compare A.json B.json    # 2つの結果を項目ごとに比べる (B / A)
+# 通信はしない。Streamlit が無い環境では表の描画 (render.*) だけ飛ばす
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import timeit
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+from matsuri import (DEPTH_MODES, JCG_POINTS, TideSource, assemble_station_batch, build_forecast_frame,
+                     build_forecast_frames, calc_strategy_all_depths, calc_strategy_realtime, calculate_best_seat,
+                     calculate_matsuri_score, current_sst, daylight_timeline, get_hybrid_tide_data, iter_boards,
+                     parse_jcg_data, parse_jcg_html, parse_open_meteo, strategies_by_depth, strategy_from_buckets)
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURE_DIR = os.path.join(BENCH_DIR, "fixtures")
+RECORDED_DIR = os.path.join(FIXTURE_DIR, "recorded")
+FIXTURE_KIND = os.environ.get("MATSURI_BENCH_FIXTURES", "")
+RESULT_DIR = os.path.join(BENCH_DIR, "results")
+REPEAT = 7
+MIN_TIME_SEC = 0.2  # 1回の計測 (number 回まとめて) の最低時間
+
+def fixture_dir(kind=FIXTURE_KIND):
+    recorded = os.path.exists(os.path.join(RECORDED_DIR, "meta.json"))
+    if kind == "recorded" and not recorded: sys.exit("記録データが無い (python bench/make_fixtures.py record で作る)")
+    if kind == "recorded" or (not kind and recorded):
+        return RECORDED_DIR
+    if kind not in ("", "synthetic"): raise ValueError(f"MATSURI_BENCH_FIXTURES: {kind}")
+    if not kind: print("記録データ (bench/fixtures/recorded/) が無いので合成データで測る", file=sys.stderr)
+    return FIXTURE_DIR
+
+def load_fixtures(kind=FIXTURE_KIND):
+    base = fixture_dir(kind)
+    with open(os.path.join(base, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    fx = {"meta": meta, "now": datetime.datetime.fromisoformat(meta["now"]), "stations": {}, "pages": {}}
+    for key in meta["stations"]:
+        with open(os.path.join(base, f"open_meteo_{key}.json"), "rb") as f: fx["stations"][key] = f.read()
+    with open(os.path.join(base, "open_meteo_batch.json"), "rb") as f: fx["batch"] = f.read()
+    for key in meta["tide_pages"]:
+        with open(os.path.join(base, f"stream_{key}.html"), "rb") as f: fx["pages"][key] = f.read()
+    return fx
+
+def build_cases(fx):
+    # 名前 -> 引数なしの関数。準備 (パースなど) は測る対象から外してここで済ませる
+    now = fx["now"]
+    weather = {key: parse_open_meteo(body) for key, body in fx["stations"].items()}
+    batch = parse_open_meteo(fx["batch"])
+    tables = {key: parse_jcg_html(html) for key, html in fx["pages"].items()}
+    tides = TideSource(tables, {})  # 年間予測表は環境で有無が変わるので使わない
+    cases = {}
+
+    # --- Open-Meteo ---
+    body = fx["stations"]["akashi"]
+    cases["open_meteo.parse_station"] = lambda: parse_open_meteo(body)
+    cases["open_meteo.parse_batch"] = lambda: parse_open_meteo(fx["batch"])
+    cases["open_meteo.assemble_batch"] = lambda: assemble_station_batch(batch, now)
+
+    # --- JCG 潮流表 ---
+    for key, html in fx["pages"].items():
+        cases[f"jcg.parse_html.{key}"] = lambda html=html: parse_jcg_html(html)
+    table = tables["akashi"]
+    minutes = [(h, m) for h in range(24) for m in range(0, 60, 5)]
+    def lookup_day():
+        for h, m in minutes: parse_jcg_data(table, h, m)
+    cases["jcg.lookup_day_5min"] = lookup_day
+    port_info = JCG_POINTS["shodoshima"]
+    targets = [now + datetime.timedelta(minutes=10 * i) for i in range(144)]
+    def hybrid_day():
+        for t in targets: get_hybrid_tide_data(t, now, port_info, tides)
+    cases["tide.hybrid_day_10min"] = hybrid_day
+
+    # --- 戦略・指数 ---
+    data = weather["akashi"]
+    daylight = daylight_timeline(data)
+    H = data["hourly"]
+    args = [(H.wind_speed[i], H.wind_dir[i], 0.1 * (i % 10), i % 2 == 0, 17.5, H.cloud[i],
+             H.rain[i], DEPTH_MODES[i % len(DEPTH_MODES)], daylight, now + datetime.timedelta(hours=i), "akashi")
+            for i in range(48)]
+    def strategy_warm():
+        for a in args: calc_strategy_realtime(*a)
+    def strategy_cold():
+        strategy_from_buckets.cache_clear()
+        for a in args: calc_strategy_realtime(*a)
+    def strategy_all_depths_cold():
+        strategies_by_depth.cache_clear()
+        for a in args: calc_strategy_all_depths(*a[:7], *a[8:])
+    cases["strategy.realtime_48_warm"] = strategy_warm
+    cases["strategy.realtime_48_cold"] = strategy_cold
+    cases["strategy.all_depths_48_cold"] = strategy_all_depths_cold
+    def score_and_seat():
+        for a in args:
+            calculate_matsuri_score(a[2], a[1] > 180, a[0], a[4], a[6])
+            calculate_best_seat(a[1], 280 if a[3] else 100)
+    cases["strategy.score_seat_48"] = score_and_seat
+
+    # --- 予報フレーム (港ごと・全港全水深) ---
+    inputs = {}
+    for key, d in weather.items():
+        sst, _ = current_sst(d, now)
+        inputs[key] = (d, JCG_POINTS[key], sst, d["current"]["cloud_cover"])
+    for key, (d, info, sst, cloud) in inputs.items():
+        cases[f"forecast.frame.{key}"] = lambda d=d, info=info, key=key, sst=sst, cloud=cloud: \
+            build_forecast_frame(d, now, info, key, "45m", sst, cloud, tides)
+    def frames_all():
+        for key, (d, info, sst, cloud) in inputs.items():
+            build_forecast_frames(d, now, info, key, sst, cloud, tides)
+    def frames_all_per_depth():
+        # 水深ごとに別々に作る場合 (frames_all との差が全水深を一度に作る効果)
+        for key, (d, info, sst, cloud) in inputs.items():
+            for depth in DEPTH_MODES: build_forecast_frame(d, now, info, key, depth, sst, cloud, tides)
+    cases["forecast.frames_all"] = frames_all
+    cases["forecast.frames_all_per_depth"] = frames_all_per_depth
+    cases["boards.iter_all_48h"] = lambda: sum(1 for _ in iter_boards(weather, now, tides))
+
+    # --- 表の描画 (アプリ側) ---
+    try:
+        import app
+    except ImportError:
+        app = None
+    if app is not None:
+        d, info, sst, cloud = inputs["akashi"]
+        fc = build_forecast_frame(d, now, info, "akashi", "45m", sst, cloud, tides)
+        cases["render.forecast_table_html"] = lambda: app.forecast_table_html(fc)
+        def rerun_compute():
+            # 1回の再描画で走る計算 (現在の潮・指数・6時間予報の表)
+            s, _ = current_sst(d, now)
+            get_hybrid_tide_data(now, now, info, tides)
+            app.forecast_table_html(build_forecast_frame(d, now, info, "akashi", "45m", s, cloud, tides))
+        cases["render.rerun_compute"] = rerun_compute
+    return cases
+
+def measure(fn, repeat=REPEAT):
+    timer = timeit.Timer(fn)
+    number, elapsed = timer.autorange()
+    if elapsed < MIN_TIME_SEC: number = max(1, int(number * MIN_TIME_SEC / max(elapsed, 1e-9)))
+    runs = [t / number * 1e6 for t in timer.repeat(repeat=repeat, number=number)]
+    return {"best_us": round(min(runs), 3), "median_us": round(statistics.median(runs), 3), "number": number, "repeat": repeat}
+
+def git_revision():
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+        return sha + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def run(args):
+    fx = load_fixtures()
+    cases = build_cases(fx)
+    results = {}
+    for name, fn in cases.items():
+        if args.k and args.k not in name: continue
+        results[name] = measure(fn, args.repeat)
+        r = results[name]
+        print(f"{name:36s} {r['best_us']:12.1f} us  (median {r['median_us']:.1f}, x{r['number']})", file=sys.stderr)
+    revision = git_revision()
+    report = {
+        "revision": revision, "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(), "numpy": np.__version__, "platform": platform.platform(),
+        "fixtures": fx["meta"], "results": results,
+    }
+    out = args.output or os.path.join(RESULT_DIR, f"{revision}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"-> {out}", file=sys.stderr)
+
+def compare(path_a, path_b):
+    with open(path_a, encoding="utf-8") as f: a = json.load(f)
+    with open(path_b, encoding="utf-8") as f: b = json.load(f)
+    fa, fb = a.get("fixtures", {}), b.get("fixtures", {})
+    if (fa.get("source"), fa.get("now")) != (fb.get("source"), fb.get("now")):
+        print(f"注意: 入力データが違う ({fa.get('source')} {fa.get('now')} / {fb.get('source')} {fb.get('now')})", file=sys.stderr)
+    print(f"{'':36s} {a['revision']:>12s} {b['revision']:>12s}   ratio")
+    for name in sorted(set(a["results"]) | set(b["results"])):
+        ra, rb = a["results"].get(name), b["results"].get(name)
+        if ra is None or rb is None:
+            print(f"{name:36s} {'-' if ra is None else ra['best_us']:>12} {'-' if rb is None else rb['best_us']:>12}")
+            continue
+        ratio = rb["best_us"] / ra["best_us"] if ra["best_us"] else float("nan")
+        print(f"{name:36s} {ra['best_us']:12.1f} {rb['best_us']:12.1f}   {ratio:5.2f}x")
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="command")
+    p_cmp = sub.add_parser("compare")
+    p_cmp.add_argument("a")
+    p_cmp.add_argument("b")
+    parser.add_argument("-k", help="名前にこの文字列を含む項目だけ測る")
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("-o", "--output", help="結果の保存先 (省略時は bench/results/<コミット>.json)")
+    args = parser.parse_args()
+    if args.command == "compare":
+        compare(args.a, args.b)
+    else:
+        run(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# コールドスタートの計測: 新しいプロセスで「import にかかる時間」と「最初の描画までの時間」を測る
+#   python bench/startup.py                      # 各項目を5回ずつ測って bench/results/startup-<コミット>.json に保存
+#   python bench/startup.py --budget-ms 1500     # 最初の描画の中央値が予算を超えたら終了コード 1 (スケールアウト前の確認用)
+# 通信はしない。記録データ (bench/fixtures/) を一時的な保存データ (SQLite) に入れ、先回り更新の初回分として読ませる
+import argparse
+import datetime
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(BENCH_DIR, "..")
+sys.path.insert(0, ROOT)
+
+from run import RESULT_DIR, git_revision, load_fixtures
+
+REPEAT = 5
+HEAVY_MODULES = ("numpy", "pandas", "lxml", "matplotlib", "pyarrow")
+
+# 子プロセスで実行するコード。最後の行に結果の JSON を出す
+_IMPORT_SNIPPET = """
+import json, sys, time
+t0 = time.perf_counter()
+import streamlit
+t1 = time.perf_counter()
+{body}
+t2 = time.perf_counter()
+print(json.dumps({{"streamlit_ms": (t1 - t0) * 1000, "ms": (t2 - t1) * 1000,
+                  "modules": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+_CASES = {
+    # エンジンだけ (CLI・バッチ配信)
+    "import.matsuri": "import matsuri",
+    # アプリのモジュール読み込み (Streamlit の外なので main() は走らない)
+    "import.app": "import warnings; warnings.filterwarnings('ignore'); import app",
+    # 最初の描画まで (AppTest でスクリプトを1回実行)
+    "first_render": "from streamlit.testing.v1 import AppTest\n"
+                    "t1 = time.perf_counter()\n"
+                    "at = AppTest.from_file({app!r}, default_timeout=60); at.run()\n"
+                    "assert not at.exception, at.exception",
+}
+
+def redate(body, day, today):
+    # 記録データの日付 (YYYY-MM-DD) を day から today にずらす (hourly は時刻で行を引くので、今日の取得分に見せる)
+    shift = today - day
+    def repl(m):
+        return (datetime.date.fromisoformat(m.group().decode()) + shift).isoformat().encode()
+    return re.sub(rb"\d{4}-\d{2}-\d{2}", repl, body)
+
+def seed_store(path):
+    # 定点の天気と潮流表を「いま取得した」ことにして保存しておく (期限内なので裏の更新は走らない)
+    from matsuri import ResponseStore, assemble_station_batch, parse_jcg_html, parse_open_meteo, weather_to_json
+    fx = load_fixtures()
+    now = time.time()
+    now_jst = datetime.datetime.now(datetime.timezone(datetime.timedelta(hours=9)))
+    batch = parse_open_meteo(redate(fx["batch"], fx["now"].date(), now_jst.date()))
+    store = ResponseStore(path)
+    store.save("weather:stations", assemble_station_batch(batch, now_jst), fetched_at=now, encode=weather_to_json)
+    from matsuri import JCG_POINTS
+    for key, html in fx["pages"].items():
+        table = parse_jcg_html(html, fetched_at=now)
+        store.save(f"tide:{JCG_POINTS[key].url}", table, fetched_at=now, encode=type(table).to_json)
+
+def run_case(name, store_path):
+    body = _CASES[name].format(app=os.path.join(os.path.abspath(ROOT), "app.py"))
+    code = _IMPORT_SNIPPET.format(body=body, heavy=HEAVY_MODULES)
+    env = dict(os.environ, MATSURI_RESPONSE_STORE=store_path, PYTHONDONTWRITEBYTECODE="")
+    env.pop("MATSURI_METRICS_PORT", None)
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--budget-ms", type=float, help="最初の描画 (中央値) の上限")
+    parser.add_argument("-o", "--output", help="結果の保存先 (省略時は bench/results/startup-<コミット>.json)")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        store_path = os.path.join(tmp, "responses.sqlite3")
+        seed_store(store_path)
+        for name in _CASES:
+            runs = [run_case(name, store_path) for _ in range(args.repeat)]
+            ms = [r["ms"] for r in runs]
+            results[name] = {"best_ms": round(min(ms), 1), "median_ms": round(statistics.median(ms), 1),
+                             "streamlit_ms": round(statistics.median(r["streamlit_ms"] for r in runs), 1),
+                             "heavy_modules": runs[-1]["modules"], "repeat": args.repeat}
+            r = results[name]
+            print(f"{name:16s} {r['median_ms']:8.1f} ms (best {r['best_ms']:.1f}, +streamlit {r['streamlit_ms']:.0f} ms)"
+                  f"  loaded: {', '.join(r['heavy_modules']) or '-'}", file=sys.stderr)
+
+    revision = git_revision()
+    report = {"revision": revision, "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+              "python": sys.version.split()[0], "budget_ms": args.budget_ms, "results": results}
+    out = args.output or os.path.join(RESULT_DIR, f"startup-{revision}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"-> {out}", file=sys.stderr)
+
+    if args.budget_ms is not None and results["first_render"]["median_ms"] > args.budget_ms:
+        print(f"最初の描画が予算超過: {results['first_render']['median_ms']:.0f} ms > {args.budget_ms:.0f} ms", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
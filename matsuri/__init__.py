@@ -0,0 +1,22 @@
+# 魔釣Pro の判定エンジン (Streamlit に依存しない部分)
+from .board import BOARD_HOURS, DEPTH_MODES, frame_boards, iter_boards
+from .breaker import CIRCUIT_STATE_VALUES, CircuitBreaker, CircuitOpenError
+from .forecast import (build_forecast_frame, build_forecast_frames, current_sst, hourly_frame, matsuri_score_columns,
+                       strategy_columns, strategy_columns_by_depth)
+from .metrics import LATENCY_BUCKETS_SEC, Metrics, Stopwatch, start_metrics_server
+from .replay import (GOOD_SCORE, REPLAY_CHUNK_HOURS, ScoreHeatmap, archive_paths, iter_replay, replay_chunks, score_header,
+                     score_rows)
+from .singleflight import SingleFlight
+from .stations import (DEFAULT_LAT, DEFAULT_LON, JCG_POINTS, Station, calculate_historical_sst_precise,
+                       calculate_historical_sst_vec, deg_to_cardinal, find_fixed_key, get_nearest_port)
+from .store import RESPONSE_STORE_MAX_AGE_SEC, RESPONSE_STORE_PATH, ResponseStore, data_age_sec
+from .strategy import (DaylightTimeline, Strategy, calc_strategy_all_depths, calc_strategy_realtime, calculate_best_seat,
+                       calculate_matsuri_score, daylight_timeline, get_closest_weight, get_score_comment, get_size_label,
+                       strategies_by_depth, strategy_bucket_keys, strategy_buckets, strategy_from_buckets, tide_alignment)
+from .tide import (TIDE_INTERPOLATE, TIDE_TABLE_DIR, HarmonicTideTable, TideSource, TideTable, estimate_port_tide_series,
+                   estimate_ports_tide_series, estimate_tide_current_logic, estimate_tide_current_vec, fetch_jcg_tide_table,
+                   get_hybrid_tide_data, get_moon_age_simple, get_moon_age_vec, load_harmonic_tide_tables, parse_jcg_data,
+                   parse_jcg_html, tide_columns, tide_time_range, to_jst_minutes)
+from .weather import (HOURLY_FIELDS, SST_SEARCH_OFFSETS, HourlyForecast, adopt_search_sst, assemble_station_batch, copy_payload,
+                      has_sst_at, parse_open_meteo, payload_from_dict, payload_from_json, station_batch_from_json,
+                      station_batch_points, weather_to_json)
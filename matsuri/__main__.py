@@ -0,0 +1,84 @@
+# 全港・全水深・48時間分の盤面を JSON Lines で書き出す
+#   python -m matsuri                         # アプリの保存データ (SQLite) から
+#   python -m matsuri --input record.json     # 記録ファイル {"now", "weather": {港: Open-Meteo}, "tide": {基準港: 潮流表}} から
+import argparse
+import datetime
+import json
+import sys
+import time
+
+from . import (DEPTH_MODES, JCG_POINTS, RESPONSE_STORE_PATH, TIDE_TABLE_DIR, ResponseStore, TideSource, TideTable,
+               has_sst_at, iter_boards, load_harmonic_tide_tables, payload_from_dict, station_batch_from_json)
+
+JST = datetime.timezone(datetime.timedelta(hours=9), "JST")
+
+def load_store(path):
+    # 保存期限は問わない (記録済みデータの再計算用)
+    store = ResponseStore(path, max_age=float("inf"))
+    hit = store.load("weather:stations", station_batch_from_json)
+    weather = hit[0] if hit else {}
+    official = {}
+    for key, station in JCG_POINTS.items():
+        if not station.url: continue
+        hit = store.load(f"tide:{station.url}", TideTable.from_json)
+        if hit: official[key] = hit[0]
+    return None, weather, official
+
+def load_record(path, now_text=None):
+    with open(path, encoding="utf-8") as f:
+        record = json.load(f)
+    official = {key: TideTable.from_json(json.dumps(obj)) for key, obj in record.get("tide", {}).items()}
+    weather = {key: payload_from_dict(data) for key, data in record.get("weather", {}).items()}
+    # Open-Meteo のままの記録には sst_source が無いので、アプリと同じく基準時刻の水温の有無で決める
+    now = parse_now(now_text or record.get("now"))
+    for data in weather.values():
+        if "sst_source" not in data:
+            data["sst_source"] = "local" if has_sst_at(data, now) else "none"
+    return record.get("now"), weather, official
+
+def parse_now(text):
+    if not text: return datetime.datetime.now(JST)
+    now = datetime.datetime.fromisoformat(text)
+    return now if now.tzinfo else now.replace(tzinfo=JST)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m matsuri")
+    parser.add_argument("--input", help="記録ファイル (JSON)。省略時は --store の保存データ")
+    parser.add_argument("--store", default=RESPONSE_STORE_PATH)
+    parser.add_argument("--tide-tables", default=TIDE_TABLE_DIR)
+    parser.add_argument("--now", help="基準時刻 (ISO形式, JST)。省略時は記録の now か現在時刻")
+    parser.add_argument("--ports", help="カンマ区切りの港キー (省略時は全港)")
+    parser.add_argument("--depths", default=",".join(DEPTH_MODES))
+    parser.add_argument("--hours", type=int, default=48)
+    parser.add_argument("-o", "--output", help="出力先 (省略時は標準出力)")
+    args = parser.parse_args(argv)
+    ports = args.ports.split(",") if args.ports else None
+    depths = args.depths.split(",")
+    unknown = [p for p in ports or () if p not in JCG_POINTS]
+    if unknown: parser.error(f"--ports: 不明な港 {', '.join(unknown)} (選べるのは {', '.join(JCG_POINTS)})")
+    unknown = [d for d in depths if d not in DEPTH_MODES]
+    if unknown: parser.error(f"--depths: 不明な水深 {', '.join(unknown)} (選べるのは {', '.join(DEPTH_MODES)})")
+
+    recorded_now, weather, official = load_record(args.input, args.now) if args.input else load_store(args.store)
+    if not weather:
+        print("天気データがありません", file=sys.stderr)
+        return 1
+    now = parse_now(args.now or recorded_now)
+    tides = TideSource(official, load_harmonic_tide_tables(args.tide_tables))
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    t0 = time.perf_counter()
+    count = 0
+    try:
+        for board in iter_boards(weather, now, tides, ports=ports, depth_modes=depths, hours=args.hours):
+            out.write(json.dumps(board, ensure_ascii=False))
+            out.write("\n")
+            count += 1
+    finally:
+        if out is not sys.stdout: out.close()
+    elapsed = time.perf_counter() - t0
+    print(f"{count} boards in {elapsed * 1000:.0f} ms ({count / elapsed if elapsed else 0:.0f} boards/s)", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,43 @@
+# 盤面 (港 × 水深 × 時刻) をまとめて計算する。Streamlit なしでバッチ配信に使う
+from .forecast import build_forecast_frames, current_sst
+from .stations import JCG_POINTS, deg_to_cardinal
+from .strategy import DEPTH_MODES, calculate_best_seat, get_score_comment
+
+BOARD_HOURS = 48
+
+_ROW_COLUMNS = ("hour", "next_day", "tide_factor", "is_rising", "knot", "is_official", "wind_speed", "wind_dir",
+                "sst", "cloud", "rain", "weather_code", "score", "weight", "color", "tie_size", "maker_rec",
+                "speed", "tactic", "is_synced", "tide_dir_deg")
+
+def iter_boards(weather, now, tides, ports=None, depth_modes=DEPTH_MODES, hours=BOARD_HOURS):
+    # weather: 港 -> Open-Meteo のデータ。各港・各水深について、現在から hours 時間先まで (データのある範囲) を返す
+    for port_key in ports or list(weather):
+        data = weather.get(port_key)
+        if not data: continue
+        port_info = JCG_POINTS[port_key]
+        sst, sst_source = current_sst(data, now)
+        cloud = data["current"]["cloud_cover"]
+        frames = build_forecast_frames(data, now, port_info, port_key, sst, cloud, tides, tuple(depth_modes))
+        for depth in depth_modes:
+            yield from frame_boards(frames[depth], port_key, depth, now, hours, sst_source)
+
+def frame_boards(fc, port_key, depth, now, hours=BOARD_HOURS, sst_source="none"):
+    start = max(fc["row"], 0)
+    stop = min(start + hours, fc["n"])
+    if stop <= start: return
+    cols = {name: fc[name][start:stop].tolist() for name in _ROW_COLUMNS}
+    times = fc["time"][start:stop].astype("datetime64[m]").astype(str).tolist()
+    for i, time_str in enumerate(times):
+        row = {name: col[i] for name, col in cols.items()}
+        seat_name, seat_code = calculate_best_seat(row["wind_dir"], row["tide_dir_deg"])
+        yield {
+            "port": port_key, "depth": depth, "time": time_str, "hour": row["hour"], "next_day": row["next_day"],
+            "score": row["score"], "comment": get_score_comment(row["score"]),
+            "tide": {"factor": row["tide_factor"], "rising": row["is_rising"], "knot": row["knot"],
+                     "official": row["is_official"], "dir_deg": row["tide_dir_deg"]},
+            "wind": {"speed": row["wind_speed"], "dir": row["wind_dir"], "cardinal": deg_to_cardinal(row["wind_dir"])},
+            "sst": row["sst"], "sst_source": sst_source, "cloud": row["cloud"], "rain": row["rain"],
+            "weather_code": int(row["weather_code"]), "synced": row["is_synced"],
+            "weight": row["weight"], "color": row["color"], "tie_size": row["tie_size"], "maker_rec": row["maker_rec"],
+            "speed": row["speed"], "tactic": row["tactic"], "seat": seat_code, "seat_name": seat_name,
+        }
@@ -0,0 +1,79 @@
+# 上流ごとのサーキットブレーカーと、観測した応答時間に合わせたタイムアウト
+import collections
+import threading
+import time
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+CIRCUIT_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}  # メトリクス (ゲージ) での値
+
+BREAKER_FAILURE_THRESHOLD = 5   # 連続でこの回数失敗したら遮断する
+BREAKER_OPEN_SEC = 30.0         # 遮断してから試しに1件通すまで
+TIMEOUT_MIN_SEC = 2.0
+TIMEOUT_MAX_SEC = 10.0          # 応答時間の記録が少ないうちはこれを使う
+TIMEOUT_P95_FACTOR = 3.0        # 成功した応答の 95% 点の何倍まで待つか
+TIMEOUT_MIN_SAMPLES = 10
+TIMEOUT_WINDOW = 100
+
+class CircuitOpenError(Exception):
+    def __init__(self, name):
+        super().__init__(f"circuit open: {name}")
+        self.name = name
+
+class CircuitBreaker:
+    # closed: 通常 / open: すぐに CircuitOpenError / half_open: 1件だけ試し、成功なら closed・失敗なら open に戻す
+    def __init__(self, name, failure_threshold=BREAKER_FAILURE_THRESHOLD, open_sec=BREAKER_OPEN_SEC):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.open_sec = open_sec
+        self.state = CLOSED
+        self.failures = 0       # 連続失敗の数
+        self.opened_at = None
+        self.rejected = 0
+        self._trial = False     # half_open で試しの1件が実行中
+        self._latencies = collections.deque(maxlen=TIMEOUT_WINDOW)
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        # 呼び出しの前に。通せないなら CircuitOpenError
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.open_sec:
+                self.state = HALF_OPEN
+            if self.state == CLOSED: return
+            if self.state == HALF_OPEN and not self._trial:
+                self._trial = True
+                return
+            self.rejected += 1
+        raise CircuitOpenError(self.name)
+
+    def record_success(self, elapsed_sec):
+        with self._lock:
+            self._latencies.append(elapsed_sec)
+            self.failures = 0
+            self._trial = False
+            self.state = CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial = False
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def allows(self):
+        # 今呼んだら通るか (状態は変えない)
+        with self._lock:
+            return self.state == CLOSED or (self.state == OPEN and time.monotonic() - self.opened_at >= self.open_sec) \
+                or (self.state == HALF_OPEN and not self._trial)
+
+    def timeout(self):
+        # 最近の成功した応答の 95% 点 × 係数。記録が少なければ上限
+        with self._lock:
+            samples = list(self._latencies)
+        if len(samples) < TIMEOUT_MIN_SAMPLES: return TIMEOUT_MAX_SEC
+        p95 = sorted(samples)[int(0.95 * (len(samples) - 1))]
+        return min(TIMEOUT_MAX_SEC, max(TIMEOUT_MIN_SEC, p95 * TIMEOUT_P95_FACTOR))
+
+    def stats(self):
+        with self._lock:
+            return {"state": self.state, "failures": self.failures, "rejected": self.rejected}
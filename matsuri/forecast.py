@@ -0,0 +1,96 @@
+# 予報エンジン (Open-Meteoの hourly を列にして全時間帯を一括計算)
+import numpy as np
+
+from .stations import calculate_historical_sst_precise
+from .strategy import DEPTH_MODES, daylight_timeline, strategies_by_depth, strategy_buckets
+from .tide import tide_columns
+
+def current_sst(data, now):
+    # 現在の水温と、その出どころ (local: その地点の解析値 / search: 周辺補完 / none: 統計値)
+    hourly = data["hourly"]
+    raw_sst = hourly.sst_at(hourly.row_of(now))
+    sst_source = data.get("sst_source", "none")
+    if sst_source in ("local", "search") and raw_sst is not None:
+        return raw_sst, sst_source
+    return calculate_historical_sst_precise(now), "none"
+
+def hourly_frame(data, sst, cloud):
+    # hourly の各列を float 配列に。欠損は現在値 (水温・雲量) か 0 で埋める
+    hourly = data["hourly"]
+    return {
+        "wind_speed": hourly.column("wind_speed", 0.0),
+        "wind_dir": hourly.column("wind_dir", 0.0),
+        "rain": hourly.column("rain", 0.0),
+        "cloud": hourly.column("cloud", cloud),
+        "sst": hourly.column("sst", sst),
+        "weather_code": hourly.column("weather_code", 0.0),
+    }
+
+def matsuri_score_columns(tide_factor, is_synced, wind_spd, temp, rain):
+    tf, w, t = tide_factor, wind_spd, temp
+    score = 5.0 + np.select([tf > 0.7, tf > 0.4, tf < 0.2], [2.5, 1.0, -3.0], 0.0)
+    score = score + np.where(is_synced, 2.0, -1.0)
+    score = score + np.select([(2.0 <= w) & (w <= 6.0), w > 8.0, (w < 1.0) & ~is_synced], [1.0, -2.0, -1.0], 0.0)
+    score = score + np.select(
+        [(18.0 <= t) & (t <= 24.0), ((15.0 <= t) & (t < 18.0)) | (t > 24.0), (12.0 <= t) & (t < 15.0), (10.0 <= t) & (t < 12.0), t < 10.0],
+        [2.0, 1.0, 0.0, -1.5, -3.0], 0.0)
+    score = score + np.where(rain > 0, 0.5, 0.0)
+    return np.clip(score, 1, 10).astype(np.int64)
+
+def strategy_columns_by_depth(wind_spd, wind_dir, tide_factor, is_rising, temp, cloud, rain, months, phases, area_key,
+                              depth_modes=DEPTH_MODES):
+    # 同調判定は配列で、残りは行ごとのバケット (水深抜き) で全水深ぶんを一度に引く (同じバケットはメモ化済み)
+    tide_dir_deg = np.where(is_rising, 280, 100)
+    diff_angle = np.abs(wind_dir - tide_dir_deg)
+    diff_angle = np.where(diff_angle > 180, 360 - diff_angle, diff_angle)
+    is_synced = diff_angle < 90
+
+    rows = [strategies_by_depth(strategy_buckets(w, tf, sy, t, c, r, None, mo, ph, area_key))
+            for w, tf, sy, t, c, r, mo, ph in zip(wind_spd.tolist(), tide_factor.tolist(), is_synced.tolist(), temp.tolist(),
+                                                   cloud.tolist(), rain.tolist(), months.tolist(), phases.tolist())]
+    columns = {}
+    for depth in depth_modes:
+        d = DEPTH_MODES.index(depth)
+        weight, color, tie_size, maker_rec, speed, tactic = (np.array(col, dtype=object) for col in zip(*(row[d] for row in rows))) \
+            if rows else (np.array([], dtype=object) for _ in range(6))
+        columns[depth] = {
+            "weight": weight.astype(np.int64), "color": color, "tie_size": tie_size, "maker_rec": maker_rec,
+            "speed": speed, "tactic": tactic, "is_synced": is_synced, "tide_dir_deg": tide_dir_deg,
+        }
+    return columns
+
+def strategy_columns(wind_spd, wind_dir, tide_factor, is_rising, temp, cloud, rain, target_depth_mode, months, phases, area_key):
+    return strategy_columns_by_depth(wind_spd, wind_dir, tide_factor, is_rising, temp, cloud, rain, months, phases, area_key,
+                                     (target_depth_mode,))[target_depth_mode]
+
+def build_forecast_frames(data, now, port_info, port_key, sst, cloud, tides, depth_modes=DEPTH_MODES):
+    # 水深ごとの予報フレーム {水深: フレーム}。水深に依らない列 (天気・潮・指数) は1回だけ計算して共有する
+    # 行 k は hourly の k 番目、row は現在の時刻を含む行 (hourly の開始時刻から数える)。
+    # 各行は現在と同じ「分」で評価する (従来の now + i 時間と同じ)
+    frame = hourly_frame(data, sst, cloud)
+    n = len(frame["wind_speed"])
+    row = data["hourly"].row_of(now)
+    now_naive = now.replace(tzinfo=None)
+    offsets = (np.arange(n) - row).astype("timedelta64[h]")
+    times_us = np.datetime64(now_naive, "us") + offsets
+    times = times_us.astype("datetime64[m]")
+    frame["time"] = times_us
+    frame["next_day"] = times.astype("datetime64[D]") != np.datetime64(now_naive, "D")
+    frame["hour"] = ((times - times.astype("datetime64[D]")).astype(np.int64) // 60)
+
+    tide_factor, is_rising, knot, official = tide_columns(times, now, port_info, tides)
+    frame.update({"tide_factor": tide_factor, "is_rising": is_rising, "knot": knot, "is_official": official})
+
+    phases = daylight_timeline(data).phases_at(times_us)
+    months = times.astype("datetime64[M]").astype(np.int64) % 12 + 1
+
+    by_depth = strategy_columns_by_depth(frame["wind_speed"], frame["wind_dir"], tide_factor, is_rising, frame["sst"], frame["cloud"],
+                                         frame["rain"], months, phases, port_key, depth_modes)
+    is_synced = by_depth[depth_modes[0]]["is_synced"]  # 水深に依らない
+    frame["score"] = matsuri_score_columns(tide_factor, is_synced, frame["wind_speed"], frame["sst"], frame["rain"])
+    frame["n"] = n
+    frame["row"] = row
+    return {depth: {**frame, **strategy} for depth, strategy in by_depth.items()}
+
+def build_forecast_frame(data, now, port_info, port_key, target_depth_mode, sst, cloud, tides):
+    return build_forecast_frames(data, now, port_info, port_key, sst, cloud, tides, (target_depth_mode,))[target_depth_mode]
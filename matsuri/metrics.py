@@ -0,0 +1,176 @@
+# 処理時間と回数の集計。Prometheus のテキスト形式で書き出し、必要なら /metrics を別ポートで公開する
+import bisect
+import contextlib
+import http.server
+import threading
+import time
+
+# 所要時間のヒストグラムの区切り (秒)。Prometheus クライアントの既定値に、描画の段階向けの細かい区切りを足したもの
+LATENCY_BUCKETS_SEC = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs: return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+class _Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self, n_buckets):
+        self.counts = [0] * (n_buckets + 1)  # 最後は +Inf
+        self.total = 0.0
+        self.count = 0
+
+class Metrics:
+    def __init__(self, prefix="matsuri", buckets=LATENCY_BUCKETS_SEC):
+        self.prefix = prefix
+        self.buckets = tuple(buckets)
+        self._histograms = {}  # name -> {label_key: _Histogram}
+        self._counters = {}    # name -> {label_key: value}
+        self._gauges = {}      # name -> callable () -> {label_key: value} (書き出し時に読む)
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name, text):
+        self._help[name] = text
+
+    def observe(self, name, seconds, **labels):
+        key = _label_key(labels)
+        i = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            hist = series.get(key)
+            if hist is None: hist = series[key] = _Histogram(len(self.buckets))
+            hist.counts[i] += 1
+            hist.total += seconds
+            hist.count += 1
+
+    def inc(self, name, value=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def gauge(self, name, read):
+        # read() -> {((ラベル, 値), ...): 値}。書き出しのたびに読む
+        self._gauges[name] = read
+
+    @contextlib.contextmanager
+    def span(self, name, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0, **labels)
+
+    def stopwatch(self, name, **labels):
+        return Stopwatch(self, name, labels)
+
+    def quantile(self, name, q, **labels):
+        # バケットの中で線形補間した近似値 (秒)。記録がなければ None
+        with self._lock:
+            hist = self._histograms.get(name, {}).get(_label_key(labels))
+            if hist is None or not hist.count: return None
+            counts = list(hist.counts)
+            count = hist.count
+        rank = q * count
+        seen = 0
+        lower = 0.0
+        for i, c in enumerate(counts):
+            upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+            if c and seen + c >= rank:
+                return lower + (upper - lower) * (rank - seen) / c
+            seen += c
+            lower = upper
+        return self.buckets[-1]
+
+    def series(self, name):
+        # name のヒストグラムをラベルごとに {((ラベル, 値), ...): (件数, 合計秒)}
+        with self._lock:
+            return {key: (h.count, h.total) for key, h in self._histograms.get(name, {}).items()}
+
+    def counters(self, name):
+        with self._lock:
+            return dict(self._counters.get(name, {}))
+
+    def to_prometheus(self):
+        with self._lock:
+            histograms = {name: {key: (list(h.counts), h.total, h.count) for key, h in series.items()}
+                          for name, series in self._histograms.items()}
+            counters = {name: dict(series) for name, series in self._counters.items()}
+        lines = []
+        for name in sorted(histograms):
+            full = f"{self.prefix}_{name}_seconds"
+            if name in self._help: lines.append(f"# HELP {full} {self._help[name]}")
+            lines.append(f"# TYPE {full} histogram")
+            for key, (counts, total, count) in sorted(histograms[name].items()):
+                running = 0
+                for le, c in zip(self.buckets, counts):
+                    running += c
+                    lines.append(f"{full}_bucket{_format_labels(key, [('le', repr(le))])} {running}")
+                lines.append(f"{full}_bucket{_format_labels(key, [('le', '+Inf')])} {count}")
+                lines.append(f"{full}_sum{_format_labels(key)} {total:.6f}")
+                lines.append(f"{full}_count{_format_labels(key)} {count}")
+        for name in sorted(counters):
+            full = f"{self.prefix}_{name}_total"
+            if name in self._help: lines.append(f"# HELP {full} {self._help[name]}")
+            lines.append(f"# TYPE {full} counter")
+            for key, value in sorted(counters[name].items()):
+                lines.append(f"{full}{_format_labels(key)} {value}")
+        for name in sorted(self._gauges):
+            full = f"{self.prefix}_{name}"
+            try:
+                values = self._gauges[name]()
+            except Exception:
+                continue
+            if name in self._help: lines.append(f"# HELP {full} {self._help[name]}")
+            lines.append(f"# TYPE {full} gauge")
+            for key, value in sorted(values.items()):
+                lines.append(f"{full}{_format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+class Stopwatch:
+    # 区間ごとの時間を lap(段階名) で記録する (with で囲むほどでもない直列の処理向け)
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+        self.started = self._last = time.perf_counter()
+        self.laps = []
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.metrics.observe(self.name, now - self._last, stage=stage, **self.labels)
+        self.laps.append((stage, now - self._last))
+        self._last = now
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+def start_metrics_server(metrics, port, host="0.0.0.0"):
+    # GET /metrics だけに答える小さな HTTP サーバー (裏スレッド)
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.to_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="matsuri-metrics", daemon=True).start()
+    return server
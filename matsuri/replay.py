@@ -0,0 +1,151 @@
+# 過去の天気 (Open-Meteo の hourly を保存した JSON) を潮流推計・指数・戦略に通して、港ごと・時間ごとの成績表と
+# 月 × 時刻のヒートマップを作る (calculate_matsuri_score / calc_strategy_realtime の調整用)
+# 実行は tools/replay_history.py から
+# ARCHIVE は <港>.json か <港>/*.json (日・月・年ごとなど。ファイル名の順が時刻の順)。中身はアプリが受け取るのと同じ形
+# ({"hourly": {"time", "wind_speed_10m", ...}, "daily": {"sunrise", "sunset"}})。ファイルを1つずつ読み、
+# REPLAY_CHUNK_HOURS 時間ずつ配列で計算して書き出すので、メモリは期間の長さに依らない
+import glob
+import json
+import os
+
+import numpy as np
+
+from .forecast import matsuri_score_columns
+from .stations import JCG_POINTS, calculate_historical_sst_vec
+from .strategy import DEPTH_MODES, DaylightTimeline, strategies_by_depth, strategy_bucket_keys, strategy_buckets
+from .tide import tide_columns
+from .weather import payload_from_dict
+
+REPLAY_CHUNK_HOURS = 24 * 31
+GOOD_SCORE = 7  # ヒートマップで「釣れる時間」と数える指数
+
+_STRATEGY_FIELDS = ("weight", "color", "tie_size", "maker_rec", "speed", "tactic")
+_SCORE_FIELDS = ("port", "time", "score", "tide_factor", "knot", "is_rising", "wind_speed", "wind_dir", "sst", "sst_source",
+                 "cloud", "rain", "is_synced", "phase")
+
+def archive_paths(archive_dir, ports=None):
+    # (港, ファイル) を港ごとに時刻の順で
+    for port_key in ports or list(JCG_POINTS):
+        paths = sorted(glob.glob(os.path.join(archive_dir, port_key, "*.json")))
+        single = os.path.join(archive_dir, f"{port_key}.json")
+        if os.path.exists(single): paths.insert(0, single)
+        for path in paths: yield port_key, path
+
+def _strategy_columns(wind_spd, tide_factor, is_synced, temp, cloud, rain, months, phases, area_key, depth_modes):
+    # バケットの組み合わせごとに1回だけ判定して、同じ組み合わせの行に配る (判定自体も strategies_by_depth でメモ化済み)
+    keys = strategy_bucket_keys(wind_spd, tide_factor, is_synced, temp, cloud, rain, months, phases)
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    rows = [strategies_by_depth(strategy_buckets(w, tf, sy, t, c, r, None, mo, ph, area_key))
+            for w, tf, sy, t, c, r, mo, ph in zip(*(col[first].tolist() for col in
+                                                    (wind_spd, tide_factor, is_synced, temp, cloud, rain, months, phases)))]
+    columns = {}
+    for depth in depth_modes:
+        d = DEPTH_MODES.index(depth)
+        for name, values in zip(_STRATEGY_FIELDS, zip(*(row[d] for row in rows))):
+            columns[f"{depth}_{name}"] = np.array(values, dtype=np.int64 if name == "weight" else object)[inverse]
+    return columns
+
+def replay_chunks(data, port_key, tides, depth_modes=DEPTH_MODES, chunk_hours=REPLAY_CHUNK_HOURS, after=None):
+    # 1ファイル分を chunk_hours 時間ずつの列 {名前: 配列} にして返す。after 以前の時刻 (前のファイルと重なる分) は飛ばす
+    hourly = data["hourly"]
+    if hourly.start is None: return
+    times = hourly.times()
+    skip = int(np.searchsorted(times, after, side="right")) if after is not None else 0
+    times = times[skip:]
+    n = len(times)
+    if n == 0: return
+    port_info = JCG_POINTS[port_key]
+    daylight = DaylightTimeline.from_daily(data.get("daily", {}))
+    columns = {attr: hourly.column(attr, fill)[skip:] for attr, fill in
+               (("wind_speed", 0.0), ("wind_dir", 0.0), ("rain", 0.0), ("cloud", 0.0), ("sst", np.nan))}
+    sst = columns["sst"]
+    for start in range(0, n, chunk_hours):
+        t = times[start:start + chunk_hours]
+        wind_spd, wind_dir, rain, cloud = (columns[attr][start:start + chunk_hours]
+                                           for attr in ("wind_speed", "wind_dir", "rain", "cloud"))
+        # 水温が無い時間は統計値 (アプリの sst_source = none と同じ)
+        temp = sst[start:start + chunk_hours]
+        has_sst = ~np.isnan(temp)
+        if not has_sst.all():
+            temp = temp.copy()
+            temp[~has_sst] = calculate_historical_sst_vec(t[~has_sst])
+        tide_factor, is_rising, knot, _ = tide_columns(t, t[0].astype(object), port_info, tides)
+        diff_angle = np.abs(wind_dir - np.where(is_rising, 280, 100))
+        is_synced = np.where(diff_angle > 180, 360 - diff_angle, diff_angle) < 90  # tide_alignment と同じ
+        months = t.astype("datetime64[M]").astype(np.int64) % 12 + 1
+        phases = daylight.phases_at(t.astype("datetime64[us]"))
+        chunk = {
+            "port": port_key, "time": t, "month": months, "hour": (t - t.astype("datetime64[D]")).astype(np.int64) // 60,
+            "score": matsuri_score_columns(tide_factor, is_synced, wind_spd, temp, rain),
+            "tide_factor": tide_factor, "knot": knot, "is_rising": is_rising, "wind_speed": wind_spd, "wind_dir": wind_dir,
+            "sst": temp, "sst_source": np.where(has_sst, "local", "none"), "cloud": cloud, "rain": rain,
+            "is_synced": is_synced, "phase": phases,
+        }
+        chunk.update(_strategy_columns(wind_spd, tide_factor, is_synced, temp, cloud, rain, months, phases, port_key, depth_modes))
+        yield chunk
+
+# --- 月 × 時刻のヒートマップ (港ごとに合計と件数だけ持つ) ---
+class ScoreHeatmap:
+    def __init__(self):
+        self._sum = {}   # 港 -> (12, 24) の指数の合計
+        self._count = {}
+        self._good = {}  # 港 -> GOOD_SCORE 以上だった時間の数
+
+    def add(self, port_key, months, hours, scores):
+        if port_key not in self._sum:
+            self._sum[port_key] = np.zeros((12, 24))
+            self._count[port_key] = np.zeros((12, 24), dtype=np.int64)
+            self._good[port_key] = np.zeros((12, 24), dtype=np.int64)
+        cell = (months - 1, hours)
+        np.add.at(self._sum[port_key], cell, scores)
+        np.add.at(self._count[port_key], cell, 1)
+        np.add.at(self._good[port_key], cell, scores >= GOOD_SCORE)
+
+    def ports(self):
+        return list(self._sum)
+
+    def hours(self, port_key):
+        return int(self._count[port_key].sum())
+
+    def mean(self, port_key):
+        # 月 × 時刻の平均指数 (データの無いところは NaN)
+        count = self._count[port_key]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(count > 0, self._sum[port_key] / count, np.nan)
+
+    def good_ratio(self, port_key):
+        count = self._count[port_key]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(count > 0, self._good[port_key] / count, np.nan)
+
+    def to_json(self):
+        def cells(a): return [[None if np.isnan(v) else round(float(v), 3) for v in row] for row in a]
+        return {port_key: {"hours": self.hours(port_key), "mean_score": cells(self.mean(port_key)),
+                           "good_ratio": cells(self.good_ratio(port_key)), "hours_by_cell": self._count[port_key].tolist()}
+                for port_key in self.ports()}
+
+    def format(self, port_key):
+        # 月を行・時刻を列にした平均指数の表 (四捨五入した整数、データなしは「.」)
+        mean = self.mean(port_key)
+        lines = [f"{port_key} ({self.hours(port_key)} h)", "     " + "".join(f"{h:3d}" for h in range(24))]
+        for m in range(12):
+            lines.append(f"{m + 1:3d}月" + "".join("  ." if np.isnan(v) else f"{v:3.0f}" for v in mean[m]))
+        return "\n".join(lines)
+
+def iter_replay(archive_dir, tides, ports=None, depth_modes=DEPTH_MODES, chunk_hours=REPLAY_CHUNK_HOURS):
+    # 保存データを1ファイルずつ読んで replay_chunks を順に返す (港ごとに、前のファイルと重なる時刻は除く)
+    last = {}
+    for port_key, path in archive_paths(archive_dir, ports):
+        with open(path, encoding="utf-8") as f:
+            data = payload_from_dict(json.load(f))
+        for chunk in replay_chunks(data, port_key, tides, depth_modes, chunk_hours, after=last.get(port_key)):
+            last[port_key] = chunk["time"][-1]
+            yield chunk
+
+def score_rows(chunk, depth_modes=DEPTH_MODES):
+    names = _SCORE_FIELDS[2:] + tuple(f"{depth}_{name}" for depth in depth_modes for name in _STRATEGY_FIELDS)
+    times = chunk["time"].astype(str).tolist()
+    return zip([chunk["port"]] * len(times), times, *(chunk[name].tolist() for name in names))
+
+def score_header(depth_modes=DEPTH_MODES):
+    return list(_SCORE_FIELDS) + [f"{depth}_{name}" for depth in depth_modes for name in _STRATEGY_FIELDS]
@@ -0,0 +1,49 @@
+# 同じキーの処理を同時に1回だけ走らせる (single-flight)。後から来た呼び出しは走っている処理の結果を待って共有する
+import threading
+
+class _Call:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+class SingleFlight:
+    def __init__(self, metrics=None, name="default"):
+        self.metrics = metrics
+        self.name = name
+        self._calls = {}   # key -> 実行中の _Call
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        # (結果, 他の呼び出しの結果を共有したか)。fn が例外を出したら待っていた側にも同じ例外を出す
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            if self.metrics is not None: self.metrics.inc("coalesced_waits", flight=self.name)
+            call.done.wait()
+            if call.error is not None: raise call.error
+            return call.value, True
+        try:
+            call.value = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value, False
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
@@ -0,0 +1,104 @@
+# 定点・基準港の定義と、座標まわりの小さな計算
+import math
+
+import numpy as np
+
+# --- 定点 (基準港と、その時差補正で潮を引く港) ---
+class Station:
+    # sst_lat / sst_lon は水温の解析値が安定して取れる近くの地点 (定点の天気はここで取る)
+    __slots__ = ("key", "name", "lat", "lon", "url", "offset_min", "ref_key", "sst_lat", "sst_lon")
+
+    def __init__(self, key, name, lat, lon, url, offset_min, ref_key, sst_lat, sst_lon):
+        self.key = key
+        self.name = name
+        self.lat = lat
+        self.lon = lon
+        self.url = url                # JCG 潮流ページ (基準港だけ)
+        self.offset_min = offset_min  # 基準港からの潮時の遅れ (分)
+        self.ref_key = ref_key
+        self.sst_lat = sst_lat
+        self.sst_lon = sst_lon
+
+    def __repr__(self):
+        return f"Station({self.key!r})"
+
+# --- 定数 (主要海峡の座標とURL) ---
+JCG_POINTS = {station.key: station for station in (
+    Station("akashi", "明石海峡", 34.616, 135.021, "https://www1.kaiho.mlit.go.jp/KAN5/tyouryuu/stream_akashi.html",
+            0, "akashi", 34.580, 135.000),
+    Station("naruto", "鳴門海峡", 34.238, 134.653, "https://www1.kaiho.mlit.go.jp/KAN5/tyouryuu/stream_naruto.html",
+            0, "naruto", 34.230, 134.700),
+    Station("tomogashima", "友ヶ島水道", 34.283, 135.003, "https://www1.kaiho.mlit.go.jp/KAN5/tyouryuu/stream_tomogashima.html",
+            0, "tomogashima", 34.350, 135.000),
+    Station("shodoshima", "小豆島 (播磨灘)", 34.480, 134.350, None, 60, "akashi", 34.450, 134.300),
+    Station("seto_ohashi", "瀬戸大橋 (備讃瀬戸)", 34.396, 133.813, None, 120, "akashi", 34.380, 133.800),
+)}
+
+DEFAULT_LAT = 34.616
+DEFAULT_LON = 135.021
+
+def deg_to_cardinal(d):
+    dirs = ["北", "北北東", "北東", "東北東", "東", "東南東", "南東", "南南東", 
+            "南", "南南西", "南西", "西南西", "西", "西北西", "北西", "北北西"]
+    idx = int((d + 11.25) / 22.5)
+    return dirs[idx % 16]
+
+def get_nearest_port(lat, lon):
+    min_dist = float('inf')
+    nearest_key = "akashi"
+    for key, station in JCG_POINTS.items():
+        dist = math.sqrt((lat - station.lat)**2 + (lon - station.lon)**2)
+        if dist < min_dist:
+            min_dist = dist
+            nearest_key = key
+    km_dist = min_dist * 111
+    return JCG_POINTS[nearest_key], km_dist, nearest_key
+
+def calculate_historical_sst_precise(now_dt):
+    monthly_temps = {
+        1: 12.0, 2: 9.5, 3: 10.5, 4: 13.5, 5: 17.5, 6: 21.0,
+        7: 25.0, 8: 27.5, 9: 26.0, 10: 22.5, 11: 18.5, 12: 15.0
+    }
+    month = now_dt.month
+    day = now_dt.day
+    hour = now_dt.hour
+    
+    current_val = monthly_temps[month]
+    if day < 15:
+        prev_month = month - 1 if month > 1 else 12
+        prev_val = monthly_temps[prev_month]
+        ratio = (day + 15) / 30.0
+        base_temp = prev_val + (current_val - prev_val) * ratio
+    else:
+        next_month = month + 1 if month < 12 else 1
+        next_val = monthly_temps[next_month]
+        ratio = (day - 15) / 30.0
+        base_temp = current_val + (next_val - current_val) * ratio
+        
+    diurnal_variation = 0.3 * math.sin(((hour - 9) / 24.0) * 2 * math.pi)
+    final_temp = base_temp + diurnal_variation
+    return round(final_temp, 1)
+
+_MONTHLY_SST = np.array([15.0, 12.0, 9.5, 10.5, 13.5, 17.5, 21.0, 25.0, 27.5, 26.0, 22.5, 18.5, 15.0, 12.0])  # 前後の月つき (0月=12月, 13月=1月)
+
+def calculate_historical_sst_vec(ts):
+    # calculate_historical_sst_precise の配列版。ts: datetime64 (JST の壁時計時刻) の配列
+    ts = np.asarray(ts, dtype="datetime64[m]")
+    month = ts.astype("datetime64[M]").astype(np.int64) % 12 + 1
+    day = (ts.astype("datetime64[D]") - ts.astype("datetime64[M]")).astype(np.int64) + 1
+    hour = (ts - ts.astype("datetime64[D]")).astype(np.int64) // 60
+    current_val = _MONTHLY_SST[month]
+    early = day < 15
+    other_val = np.where(early, _MONTHLY_SST[month - 1], _MONTHLY_SST[month + 1])
+    base_temp = np.where(early, other_val + (current_val - other_val) * ((day + 15) / 30.0),
+                         current_val + (other_val - current_val) * ((day - 15) / 30.0))
+    diurnal_variation = 0.3 * np.sin(((hour - 9) / 24.0) * 2 * math.pi)
+    # 丸めはスカラー版の round と揃える (np.round は 10 倍して丸めるので境目で 0.1 ずれることがある)
+    return np.array([round(v, 1) for v in (base_temp + diurnal_variation).tolist()])
+
+def find_fixed_key(lat, lon):
+    for key, station in JCG_POINTS.items():
+        if abs(lat - station.lat) < 0.001 and abs(lon - station.lon) < 0.001:
+            return key
+    return None
+
@@ -0,0 +1,92 @@
+# 取得レスポンスの永続保存 (SQLite, stale-while-revalidate)
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .singleflight import SingleFlight
+
+# 再起動しても消えないレスポンス保存先 (SQLite)
+RESPONSE_STORE_PATH = os.environ.get(
+    "MATSURI_RESPONSE_STORE", os.path.join(os.path.expanduser("~"), ".cache", "matsuri-pro", "responses.sqlite3"))
+RESPONSE_STORE_MAX_AGE_SEC = 3 * 3600  # これより古い保存データは使わない
+
+def data_age_sec(fetched_at):
+    if not fetched_at: return None
+    return max(0.0, time.time() - fetched_at)
+
+# --- 永続レスポンスストア (SQLite, stale-while-revalidate) ---
+class ResponseStore:
+    def __init__(self, path=RESPONSE_STORE_PATH, max_age=RESPONSE_STORE_MAX_AGE_SEC, metrics=None):
+        self.max_age = max_age
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        except (OSError, sqlite3.Error):
+            # 書き込めない環境ではメモリ上だけで動かす
+            self._conn = sqlite3.connect(":memory:", check_same_thread=False, isolation_level=None)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, fetched_at REAL NOT NULL, payload TEXT NOT NULL)")
+        self._lock = threading.Lock()
+        self._revalidating = set()
+        self._flight = SingleFlight(metrics, name="store")
+
+    def load(self, key, decode=json.loads):
+        try:
+            with self._lock:
+                row = self._conn.execute("SELECT fetched_at, payload FROM responses WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error:
+            return None
+        if row is None or time.time() - row[0] > self.max_age: return None
+        try:
+            return decode(row[1]), row[0]
+        except Exception:
+            return None
+
+    def save(self, key, value, fetched_at=None, encode=json.dumps):
+        try:
+            payload = encode(value)
+            with self._lock:
+                self._conn.execute("INSERT OR REPLACE INTO responses (key, fetched_at, payload) VALUES (?, ?, ?)",
+                                   (key, fetched_at or time.time(), payload))
+        except (sqlite3.Error, TypeError, ValueError):
+            pass
+
+    def swr(self, key, ttl, fetch_fn, encode=json.dumps, decode=json.loads):
+        hit = self.load(key, decode)
+        if hit is not None:
+            value, fetched_at = hit
+            if time.time() - fetched_at >= ttl:
+                self.revalidate(key, fetch_fn, encode)
+            return value
+        # 保存がなければ取りに行く。同じキーを同時に取りに来た呼び出しは1回の取得を待って共有する
+        value, shared = self._flight.do(key, lambda: self._fetch_and_save(key, fetch_fn, encode, decode))
+        if value is None and shared:
+            # 先の取得が失敗したら取り直さない (失敗中の上流に全員で押し寄せない)。保存があればそれ、無ければ None
+            hit = self.load(key, decode)
+            value = hit[0] if hit is not None else None
+        return value
+
+    def _fetch_and_save(self, key, fetch_fn, encode, decode=None):
+        if decode is not None:
+            hit = self.load(key, decode)  # 保存を見てから取得に入るまでの間に、別の取得が保存を終えていればそれを使う
+            if hit is not None: return hit[0]
+        value = fetch_fn()
+        if value is not None: self.save(key, value, encode=encode)
+        return value
+
+    def revalidate(self, key, fetch_fn, encode=json.dumps):
+        with self._lock:
+            if key in self._revalidating: return
+            self._revalidating.add(key)
+        def run():
+            try:
+                value = fetch_fn()
+                if value is not None: self.save(key, value, encode=encode)
+            except Exception:
+                pass
+            finally:
+                with self._lock: self._revalidating.discard(key)
+        threading.Thread(target=run, name="matsuri-revalidate", daemon=True).start()
+
@@ -0,0 +1,314 @@
+# 釣り座・魔釣指数・戦略 (ウェイト/カラー/ネクタイ/攻め方) の判定
+import bisect
+import collections
+import datetime
+import functools
+
+import numpy as np
+
+def calculate_best_seat(wind_dir, tide_dir_deg):
+    boat_heading = wind_dir
+    tide_from_deg = (tide_dir_deg + 180) % 360
+    relative_angle = (tide_from_deg - boat_heading) % 360
+    seat_name = "判定中"; seat_code = "none" 
+    if 337.5 <= relative_angle or relative_angle < 22.5: seat_name = "ミヨシ (船首)"; seat_code = "m_center"
+    elif 22.5 <= relative_angle < 67.5: seat_name = "右ミヨシ"; seat_code = "m_right"
+    elif 67.5 <= relative_angle < 112.5: seat_name = "右舷 (胴の間)"; seat_code = "c_right"
+    elif 112.5 <= relative_angle < 157.5: seat_name = "右トモ"; seat_code = "t_right"
+    elif 157.5 <= relative_angle < 202.5: seat_name = "トモ (船尾)"; seat_code = "t_center"
+    elif 202.5 <= relative_angle < 247.5: seat_name = "左トモ"; seat_code = "t_left"
+    elif 247.5 <= relative_angle < 292.5: seat_name = "左舷 (胴の間)"; seat_code = "c_left"
+    elif 292.5 <= relative_angle < 337.5: seat_name = "左ミヨシ"; seat_code = "m_left"
+    return seat_name, seat_code
+
+def calculate_matsuri_score(tide_factor, is_synced, wind_spd, temp, rain):
+    score = 5.0 
+    if tide_factor > 0.7: score += 2.5
+    elif tide_factor > 0.4: score += 1.0
+    elif tide_factor < 0.2: score -= 3.0
+    if is_synced: score += 2.0
+    else: score -= 1.0
+    if 2.0 <= wind_spd <= 6.0: score += 1.0
+    elif wind_spd > 8.0: score -= 2.0
+    elif wind_spd < 1.0 and not is_synced: score -= 1.0
+    if 18.0 <= temp <= 24.0: score += 2.0 
+    elif 15.0 <= temp < 18.0 or temp > 24.0: score += 1.0
+    elif 12.0 <= temp < 15.0: score += 0.0 
+    elif 10.0 <= temp < 12.0: score -= 1.5 
+    elif temp < 10.0: score -= 3.0 
+    if rain > 0: score += 0.5
+    if score < 1: score = 1
+    if score > 10: score = 10
+    return int(score)
+
+def get_score_comment(score):
+    if score >= 9: return "🔥 超・爆釣チャンス！"
+    elif score >= 7: return "🎣 好条件！期待大"
+    elif score >= 5: return "🐟 通常 (腕の見せ所)"
+    elif score >= 3: return "😓 渋いかも (粘れ)"
+    else: return "💀 激渋警報 (修行)"
+
+def get_closest_weight(val):
+    weights = [30, 45, 60, 80, 100, 120, 150, 200, 250]
+    return min(weights, key=lambda x: abs(x - val))
+
+def get_size_label(tie_size_str):
+    if "強波動" in tie_size_str or "ビッグ" in tie_size_str or "ワイド" in tie_size_str or "ロング" in tie_size_str or "極厚" in tie_size_str:
+        return "size-l", "大"
+    elif "極細" in tie_size_str or "ショート" in tie_size_str or "マイクロ" in tie_size_str or "フィネス" in tie_size_str or "細身" in tie_size_str:
+        return "size-s", "小"
+    else:
+        return "size-m", "中"
+
+# --- 戦略の判定表 ---
+# 入力は下のバケットに丸めてから判定する。各表は上から順に見て最初に当てはまった行を採用 (if/elif と同じ)。
+# 条件は {バケット名: 許す値の集合}。書いていないバケットは何でもよい。
+# エリアを増やすときは表の行を足すだけでよい (行のないエリアは明石と同じ既定ルールになる)。
+SEASON_OF_MONTH = {12: "nori", 1: "nori", 2: "nori", 3: "nori", 4: "nori", 6: "summer", 7: "summer", 8: "summer"}
+
+def tide_bucket(tide_factor):
+    if tide_factor < 0.2: return "slack"
+    if tide_factor < 0.3: return "weak"
+    if tide_factor <= 0.3: return "turn"   # ちょうど0.3 (「<0.3」にも「>0.3」にも入らない)
+    if tide_factor < 0.4: return "low"
+    if tide_factor <= 0.5: return "mid"
+    if tide_factor <= 0.6: return "mid_high"
+    if tide_factor <= 0.7: return "high"
+    return "max"
+
+def temp_bucket(temp):
+    if temp < 12.0: return "cold"
+    if temp > 15: return "warm"
+    return "cool"
+
+def wind_bucket(wind_spd):
+    if wind_spd > 7.0: return "strong"
+    if wind_spd > 3.0: return "breeze"
+    return "calm"
+
+TIDE_LT_02 = {"slack"}
+TIDE_LT_03 = {"slack", "weak"}
+TIDE_GT_03 = {"low", "mid", "mid_high", "high", "max"}
+TIDE_GE_04 = {"mid", "mid_high", "high", "max"}
+TIDE_GT_05 = {"mid_high", "high", "max"}
+TIDE_GT_06 = {"high", "max"}
+TIDE_GT_07 = {"max"}
+DEEP = {"60m", "80m"}
+SHALLOW = {"15m", "30m"}
+SETO_SIDE = {"shodoshima", "seto_ohashi"}
+
+STRATEGY_BUCKETS = ("area", "depth", "season", "tide", "temp", "cloud", "rain", "wind", "synced", "phase")
+DEPTH_MODES = ("15m", "30m", "45m", "60m", "80m")
+_DEPTH = STRATEGY_BUCKETS.index("depth")
+
+# (ネクタイ形状, メーカー推奨)
+TIE_RULES = [
+    # 激渋時のストレート解禁 (どうしても渋い時の最終兵器)
+    ({"tide": TIDE_LT_02, "area": SETO_SIDE}, ("極細ストレート / マイクロ (激渋対策)", "推奨例: ササラボ 極薄ストレート / START スキニー")),
+    ({"tide": TIDE_LT_02}, ("極細ストレート / マイクロ (激渋対策)", "推奨例: ササラボ 極薄ストレート / ジャッカル フィネス")),
+    # 深場×激流の「底取り優先」(引き抵抗軽減 v22.7): 水深80mで潮が0.4以上ならアピールより着底
+    ({"depth": {"80m"}, "tide": TIDE_GE_04, "area": SETO_SIDE}, ("細身カーリー / スタンダード (底取り・引き抵抗軽減)", "推奨例: START シリコンネクタイ / ササラボ レギュラー")),
+    ({"depth": {"80m"}, "tide": TIDE_GE_04}, ("細身カーリー / スタンダード (底取り・引き抵抗軽減)", "推奨例: ジャッカル フィネスカーリー / 海遊 シングル")),
+    # 通常時 (ストレート排除)
+    ({"area": {"naruto"}, "depth": DEEP}, ("強波動ビッグカーリー / 極厚ツイン", "推奨例: ジャッカル マスターカーリー強波動 / sasalabo 極厚")),
+    ({"area": {"naruto"}, "tide": TIDE_GT_05}, ("強波動ビッグカーリー / 極厚ツイン", "推奨例: ジャッカル マスターカーリー強波動 / sasalabo 極厚")),
+    ({"area": {"naruto"}}, ("中太カーリー / バルキー", "推奨例: sasalabo レギュラー / ジャッカル イカクロー")),
+    ({"area": {"seto_ohashi"}, "depth": DEEP}, ("中太カーリー / ロングワイド", "推奨例: START マジカーリー / 松岡スペシャル")),
+    ({"area": {"seto_ohashi"}, "tide": TIDE_GT_06}, ("中太カーリー / ロングワイド", "推奨例: START マジカーリー / 松岡スペシャル")),
+    ({"area": {"seto_ohashi"}}, ("スタンダードカーリー / 中細カーリー", "推奨例: START シリコンネクタイ / START ツイン")),
+    ({"area": {"shodoshima"}, "depth": SHALLOW}, ("極細ショート / マイクロカーリー", "推奨例: START スキニー / START ショートスキニー")),
+    ({"area": {"shodoshima"}}, ("ツインカーリー / ロングカーリー", "推奨例: START ツイン / 松岡スペシャル")),
+    ({"season": {"nori"}}, ("極細ショート / マイクロカーリー", "推奨例: ジャッカル フィネスカーリー / 海遊 リトル")),
+    ({"temp": {"cold"}}, ("極細ショート / マイクロカーリー", "推奨例: ジャッカル フィネスカーリー / 海遊 リトル")),
+    ({"season": {"summer"}, "depth": DEEP}, ("ワイドカーリー / ビッグシルエット", "推奨例: ジャッカル マスターカーリー / 海遊 WG")),
+    ({"season": {"summer"}}, ("フィッシュテール / Wカーリー", "推奨例: 海遊 WGショート / ジャッカル イカクロー")),
+    ({"tide": TIDE_GT_06}, ("ロングカーリー / 強波動", "推奨例: ジャッカル マスターカーリー / 海遊 WG")),
+    ({}, ("ショートカーリー (標準)", "推奨例: 海遊 シングル / ジャッカル マスターカーリー(カット)")),
+]
+
+COLOR_RULES = [
+    ({"phase": {"night"}}, "グロー / フルブラック (シルエット重視)"),
+    ({"phase": {"mazume"}}, "蛍光オレンジ / ゼブラドット / しましまオレンジ [ファーストカラー]"),
+    ({"rain": {True}}, "黒金 (クロキン) / しましまオレンジゴールドラメ [濁り対策]"),
+    ({"cloud": {True}, "area": {"naruto"}}, "グローゼブラ / オレンジゴールド"),
+    ({"cloud": {True}}, "黒金 (クロキン) / マジョーラゼブラ [曇天パターン]"),
+    ({"tide": TIDE_LT_03, "area": {"akashi"}, "season": {"nori"}}, "海苔グリーン / コーラ"),
+    ({"tide": TIDE_LT_03, "area": SETO_SIDE}, "グリーン / ケイムラ (ナチュラル・エビ)"),
+    ({"tide": TIDE_LT_03}, "赤黒 (レッドブラック) / スモーク [スレ対策]"),
+    ({"depth": SHALLOW}, "赤黒 / リバーシブル赤オレ / マスターオレンジ [セカンドカラー]"),
+    ({"depth": {"45m", "60m", "80m"}}, "エビオレ / エビチリ / 網みオレ [サードカラー]"),
+    ({}, "オレンジ / 赤オレ"),
+]
+
+# (攻略スタイル, リトリーブスピード)
+TACTIC_RULES = [
+    ({"synced": {True}, "wind": {"breeze", "strong"}}, ("斜め引き (広範囲攻略)", "High Speed (早巻き)")),
+    ({"tide": TIDE_LT_03, "depth": {"15m"}}, ("キャスティング (投げて横引き)", "Dead Slow (デッドスロー)")),
+    ({"tide": TIDE_LT_03, "temp": {"warm"}}, ("キャスティング (投げて横引き)", "Slow (スロー)")),
+    ({"tide": TIDE_LT_03}, ("キャスティング (投げて横引き)", "Dead Slow (デッドスロー)")),
+    ({}, ("バーチカル気味 (縦の釣り)", "Medium (等速)")),
+]
+
+# TGウェイト倍率の加算 (当てはまる行を全部、上から順に足す)
+MULTIPLIER_BASE = 1.1
+MULTIPLIER_RULES = [
+    ({"tide": TIDE_GT_07}, 0.5),
+    ({"tide": TIDE_GT_03 - TIDE_GT_07}, 0.2),
+    ({"synced": {True}}, 0.3),
+    ({"wind": {"strong"}}, 0.2),
+]
+DEPTH_BASE = {"15m": 15, "30m": 30, "45m": 45, "60m": 50, "80m": 65}
+
+def _compile_rules(rules):
+    # {名前: 集合} をバケット位置つきの (index, frozenset) に直しておく
+    compiled = []
+    for conds, value in rules:
+        unknown = set(conds) - set(STRATEGY_BUCKETS)
+        if unknown: raise ValueError(f"unknown strategy bucket: {unknown}")
+        compiled.append((tuple((STRATEGY_BUCKETS.index(name), frozenset(allowed)) for name, allowed in conds.items()), value))
+    return tuple(compiled)
+
+def _matches(conds, buckets):
+    return all(buckets[i] in allowed for i, allowed in conds)
+
+def _first_match(compiled, buckets):
+    for conds, value in compiled:
+        if _matches(conds, buckets): return value
+    raise LookupError(f"no strategy rule matched {buckets}")
+
+def _split_depth(compiled):
+    # 水深の条件だけ取り出しておく (残りの条件は全水深で1回見れば済む)。水深の条件がない行は None
+    split = []
+    for conds, value in compiled:
+        depths = next((allowed for i, allowed in conds if i == _DEPTH), None)
+        split.append((tuple(c for c in conds if c[0] != _DEPTH), depths, value))
+    return tuple(split)
+
+def _first_match_by_depth(split, buckets):
+    # 各水深について、最初に当てはまった行の値 (DEPTH_MODES の順)
+    found = {}
+    for conds, depths, value in split:
+        if not _matches(conds, buckets): continue
+        for depth in DEPTH_MODES:
+            if depth not in found and (depths is None or depth in depths): found[depth] = value
+        if len(found) == len(DEPTH_MODES): return tuple(found[d] for d in DEPTH_MODES)
+    raise LookupError(f"no strategy rule matched {buckets}")
+
+_TIE_TABLE = _compile_rules(TIE_RULES)
+_COLOR_TABLE = _compile_rules(COLOR_RULES)
+_TACTIC_TABLE = _compile_rules(TACTIC_RULES)
+_MULTIPLIER_TABLE = _compile_rules(MULTIPLIER_RULES)
+_TIE_BY_DEPTH = _split_depth(_TIE_TABLE)
+_COLOR_BY_DEPTH = _split_depth(_COLOR_TABLE)
+_TACTIC_BY_DEPTH = _split_depth(_TACTIC_TABLE)
+_MULTIPLIER_BY_DEPTH = _split_depth(_MULTIPLIER_TABLE)
+
+# 判定結果 (ウェイト, カラー, ネクタイ形状, メーカー, スピード, 攻め方)。タプルとしても並びで取り出せる
+Strategy = collections.namedtuple("Strategy", ("weight", "color", "tie_size", "maker_rec", "speed", "tactic"))
+
+def strategy_buckets(wind_spd, tide_factor, is_synced, temp, cloud, rain, target_depth_mode, month, phase, area_key):
+    return (area_key, target_depth_mode, SEASON_OF_MONTH.get(month, "other"), tide_bucket(tide_factor), temp_bucket(temp),
+            cloud is not None and cloud >= 80, rain >= 0.5, wind_bucket(wind_spd), bool(is_synced), phase)
+
+@functools.lru_cache(maxsize=None)
+def strategy_from_buckets(buckets):
+    multiplier = MULTIPLIER_BASE
+    for conds, inc in _MULTIPLIER_TABLE:
+        if _matches(conds, buckets): multiplier += inc
+    target_weight = get_closest_weight(DEPTH_BASE.get(buckets[1], 45) * multiplier)
+    tie_size, maker_rec = _first_match(_TIE_TABLE, buckets)
+    color = _first_match(_COLOR_TABLE, buckets)
+    tactic, speed = _first_match(_TACTIC_TABLE, buckets)
+    return Strategy(target_weight, color, tie_size, maker_rec, speed, tactic)
+
+@functools.lru_cache(maxsize=None)
+def strategies_by_depth(buckets):
+    # 水深以外が同じバケットについて、全水深の戦略を1回で判定する (buckets の水深の位置は見ない)。DEPTH_MODES の順
+    multipliers = dict.fromkeys(DEPTH_MODES, MULTIPLIER_BASE)
+    for conds, depths, inc in _MULTIPLIER_BY_DEPTH:
+        if not _matches(conds, buckets): continue
+        for depth in DEPTH_MODES:
+            if depths is None or depth in depths: multipliers[depth] += inc
+    ties = _first_match_by_depth(_TIE_BY_DEPTH, buckets)
+    colors = _first_match_by_depth(_COLOR_BY_DEPTH, buckets)
+    tactics = _first_match_by_depth(_TACTIC_BY_DEPTH, buckets)
+    return tuple(Strategy(get_closest_weight(DEPTH_BASE[depth] * multipliers[depth]), color, tie_size, maker_rec, speed, tactic)
+                 for depth, (tie_size, maker_rec), color, (tactic, speed) in zip(DEPTH_MODES, ties, colors, tactics))
+
+# --- 長い期間の一括判定: 行ごとのバケット (水深抜き) を1つの整数キーにまとめる ---
+_SEASON_CODE = np.array([0] + [{"nori": 1, "summer": 2}.get(SEASON_OF_MONTH.get(m), 0) for m in range(1, 13)])
+
+def strategy_bucket_keys(wind_spd, tide_factor, is_synced, temp, cloud, rain, months, phases):
+    # 境界は tide_bucket / temp_bucket / wind_bucket と同じ。キーが同じ行は strategy_buckets も同じになる
+    tide = np.select([tide_factor < 0.2, tide_factor < 0.3, tide_factor <= 0.3, tide_factor < 0.4, tide_factor <= 0.5,
+                      tide_factor <= 0.6, tide_factor <= 0.7], [0, 1, 2, 3, 4, 5, 6], 7)
+    temp_code = np.select([temp < 12.0, temp > 15], [0, 2], 1)
+    wind = np.select([wind_spd > 7.0, wind_spd > 3.0], [2, 1], 0)
+    phase = np.select([phases == "night", phases == "mazume"], [0, 1], 2)
+    key = tide
+    for code, radix in ((temp_code, 3), (cloud >= 80, 2), (rain >= 0.5, 2), (wind, 3), (is_synced, 2), (phase, 3),
+                        (_SEASON_CODE[months], 3)):
+        key = key * radix + code
+    return key
+
+# --- 日の出・日の入りのタイムライン (取得データごとに1回だけ作る) ---
+class DaylightTimeline:
+    # boundaries[i] 以降は phases[i + 1]。boundaries[0] より前は phases[0] (夜)
+    def __init__(self, boundaries, phases):
+        self.boundaries = boundaries
+        self.phases = phases
+        self._boundaries_us = np.array(boundaries, dtype="datetime64[us]")
+        self._phases_arr = np.array(phases, dtype=object)
+
+    @classmethod
+    def from_daily(cls, daily):
+        # 夜 < 日の出-30分 ≦ マズメ ≦ 日の出+90分 < 日中 < 日の入り-60分 ≦ マズメ ≦ 日の入り+30分 < 夜
+        # (日の入り後30〜60分はマズメでもあるが、カラー判定では夜が優先)
+        boundaries = []
+        phases = ["night"]
+        just_after = datetime.timedelta(microseconds=1)
+        for sunrise, sunset in zip(daily.get("sunrise") or [], daily.get("sunset") or []):
+            if not (sunrise and sunset): continue
+            sr = datetime.datetime.fromisoformat(sunrise).replace(tzinfo=None)
+            ss = datetime.datetime.fromisoformat(sunset).replace(tzinfo=None)
+            boundaries += [sr - datetime.timedelta(minutes=30), sr + datetime.timedelta(minutes=90) + just_after,
+                           ss - datetime.timedelta(minutes=60), ss + datetime.timedelta(minutes=30) + just_after]
+            phases += ["mazume", "day", "mazume", "night"]
+        if not boundaries:
+            return cls([], ["day"])  # 日の出・日の入りが無ければ日中扱い
+        return cls(boundaries, phases)
+
+    def phase_at(self, current_dt):
+        return self.phases[bisect.bisect_right(self.boundaries, current_dt.replace(tzinfo=None))]
+
+    def phases_at(self, times_us):
+        return self._phases_arr[np.searchsorted(self._boundaries_us, times_us, side="right")]
+
+@functools.lru_cache(maxsize=256)
+def _daylight_timeline(sunrises, sunsets):
+    return DaylightTimeline.from_daily({"sunrise": list(sunrises), "sunset": list(sunsets)})
+
+def daylight_timeline(data):
+    daily = data.get("daily", {}) if data else {}
+    return _daylight_timeline(tuple(daily.get("sunrise") or ()), tuple(daily.get("sunset") or ()))
+
+def tide_alignment(wind_dir, is_rising):
+    # 潮の向き (上げ=西 280° / 下げ=東 100°) と風向きの差が90°未満なら同調。水深には依らない
+    tide_dir_deg = 280 if is_rising else 100
+    diff_angle = abs(wind_dir - tide_dir_deg)
+    if diff_angle > 180: diff_angle = 360 - diff_angle
+    return diff_angle < 90, tide_dir_deg
+
+def calc_strategy_realtime(wind_spd, wind_dir, tide_factor, is_rising, temp, cloud, rain, target_depth_mode, daylight, current_dt, area_key):
+    is_synced, tide_dir_deg = tide_alignment(wind_dir, is_rising)
+    phase = daylight.phase_at(current_dt)
+    buckets = strategy_buckets(wind_spd, tide_factor, is_synced, temp, cloud, rain, target_depth_mode, current_dt.month, phase, area_key)
+    return (*strategy_from_buckets(buckets), is_synced, tide_dir_deg)
+
+def calc_strategy_all_depths(wind_spd, wind_dir, tide_factor, is_rising, temp, cloud, rain, daylight, current_dt, area_key):
+    # 水深を選ぶ前に全水深ぶんを出しておく: ({水深: Strategy}, 同調, 潮の向き)
+    is_synced, tide_dir_deg = tide_alignment(wind_dir, is_rising)
+    phase = daylight.phase_at(current_dt)
+    buckets = strategy_buckets(wind_spd, tide_factor, is_synced, temp, cloud, rain, None, current_dt.month, phase, area_key)
+    return dict(zip(DEPTH_MODES, strategies_by_depth(buckets))), is_synced, tide_dir_deg
+
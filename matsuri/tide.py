@@ -0,0 +1,486 @@
+# 潮流: JCG潮流表の正規化、年間予測、月齢からの推計、それらを組み合わせた現在値
+import bisect
+import codecs
+import contextlib
+import datetime
+import html
+import json
+import math
+import os
+import re
+import ssl
+import time
+import urllib.request
+from array import array
+
+import numpy as np
+
+TIDE_INTERPOLATE = False  # True なら潮流表の前後の行を線形補間する
+JCG_FETCH_TIMEOUT_SEC = 10.0  # get を渡さずに取りに行くときのタイムアウト
+
+# 調和定数から作った年間の潮流予測 (tools/build_tide_tables.py で生成)
+TIDE_TABLE_DIR = os.environ.get(
+    "MATSURI_TIDE_TABLES", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tide_tables"))
+
+def get_moon_age_simple(date):
+    year, month, day = date.year, date.month, date.day
+    if month < 3: year -= 1; month += 12
+    p = math.floor(year / 4)
+    age = (year + p + month * 9 / 25 + day + 11) % 30
+    return age
+
+def _is_rising_direction(dr_text):
+    return ("西" in dr_text) or ("北" in dr_text)
+
+def _tide_row(row):
+    # (時, 分, 流向, 流速, ...) を (0:00からの分, 流向, 流速) に。潮流表の行でなければ None
+    # 時は 0〜24 (24:00 の行まで)、流速は 0 以上だけを採る。向きは流向の列で表すので、
+    # 範囲外の時や負の流速は日付・見出しなど別の表の行か読み違いとして捨てる
+    try:
+        h = int(row[0])
+        m = int(row[1])
+        dr = str(row[2])
+        spd = float(row[3])
+    except (TypeError, ValueError, IndexError):
+        return None
+    if not (0 <= h <= 24 and 0 <= m < 60) or spd != spd or spd < 0: return None
+    return h * 60 + m, dr, spd
+
+# --- 潮流表 (取得時に1回だけ正規化し、時刻は二分探索で引く) ---
+class TideTable:
+    def __init__(self, minutes, knots, dir_codes, dir_labels, fetched_at=None):
+        self.minutes = minutes        # array('H') 0:00からの分 (昇順・重複なし)
+        self.knots = knots            # array('d') 流速 (kt)
+        self.dir_codes = dir_codes    # array('B') dir_labels への番号
+        self.dir_labels = dir_labels  # 流向の文字列 (西流/東流 など)
+        self.fetched_at = fetched_at
+
+    def __len__(self):
+        return len(self.minutes)
+
+    @classmethod
+    def from_rows(cls, rows, fetched_at=None):
+        # 行は (時, 分, 流向, 流速, ...) の並び。数値にならない行はここで捨てる
+        parsed = {}
+        labels = []
+        for row in rows:
+            hit = _tide_row(row)
+            if hit is None: continue
+            row_time, dr, spd = hit
+            if row_time in parsed: continue  # 同じ時刻は先に出た行を採用
+            if dr not in labels: labels.append(dr)
+            parsed[row_time] = (spd, labels.index(dr))
+        order = sorted(parsed)
+        return cls(array("H", order), array("d", (parsed[t][0] for t in order)),
+                   array("B", (parsed[t][1] for t in order)), tuple(labels), fetched_at)
+
+    def lookup(self, hour, minute, interpolate=False):
+        if not self.minutes: return None
+        target_time = hour * 60 + minute
+        i = bisect.bisect_left(self.minutes, target_time)
+        if i < len(self.minutes) and self.minutes[i] == target_time:
+            return self.knots[i], self.dir_labels[self.dir_codes[i]]
+        if i == 0: near = 0
+        elif i == len(self.minutes): near = i - 1
+        else:
+            # 等距離なら早い時刻の行 (元の表の並びで先に出る行)
+            near = i if (self.minutes[i] - target_time) < (target_time - self.minutes[i - 1]) else i - 1
+        if not interpolate or i == 0 or i == len(self.minutes):
+            return self.knots[near], self.dir_labels[self.dir_codes[near]]
+        # 上げ(西/北)を正、下げを負にした流速で補間し、符号の合う側の流向を使う
+        lo, hi = i - 1, i
+        v_lo = self._signed(lo)
+        v_hi = self._signed(hi)
+        w = (target_time - self.minutes[lo]) / (self.minutes[hi] - self.minutes[lo])
+        v = v_lo + (v_hi - v_lo) * w
+        if v_lo == 0: side = hi
+        elif v_hi == 0: side = lo
+        else: side = lo if (v > 0) == (v_lo > 0) else hi
+        return abs(v), self.dir_labels[self.dir_codes[side]]
+
+    def lookup_many(self, minutes_of_day):
+        # lookup() の最寄り行 (補間なし) を配列でまとめて引く。戻り値は (流速, 上げ潮フラグ)
+        mins = np.frombuffer(self.minutes, dtype=np.uint16).astype(np.int64)
+        target = np.asarray(minutes_of_day, dtype=np.int64)
+        i = np.searchsorted(mins, target, side="left")
+        lo = np.clip(i - 1, 0, len(mins) - 1)
+        hi = np.clip(i, 0, len(mins) - 1)
+        near = np.where((i < len(mins)) & ((i == 0) | ((mins[hi] - target) < (target - mins[lo]))), hi, lo)
+        rising_label = np.array([_is_rising_direction(label) for label in self.dir_labels], dtype=bool)
+        codes = np.frombuffer(self.dir_codes, dtype=np.uint8)
+        return np.frombuffer(self.knots, dtype=np.float64)[near], rising_label[codes[near]]
+
+    def signed_knots(self):
+        # 行ごとの流速を、上げ(西/北)を正・下げを負にした配列で (minutes と同じ並び)
+        rising_label = np.array([_is_rising_direction(label) for label in self.dir_labels], dtype=bool)
+        knots = np.frombuffer(self.knots, dtype=np.float64)
+        return np.where(rising_label[np.frombuffer(self.dir_codes, dtype=np.uint8)], knots, -knots)
+
+    def _signed(self, i):
+        knot = self.knots[i]
+        return knot if _is_rising_direction(self.dir_labels[self.dir_codes[i]]) else -knot
+
+    def to_json(self):
+        return json.dumps({"minutes": list(self.minutes), "knots": list(self.knots), "dir_codes": list(self.dir_codes),
+                           "dir_labels": list(self.dir_labels), "fetched_at": self.fetched_at}, ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, text):
+        obj = json.loads(text)
+        return cls(array("H", obj["minutes"]), array("d", obj["knots"]), array("B", obj["dir_codes"]),
+                   tuple(obj["dir_labels"]), obj.get("fetched_at"))
+
+# --- JCG 潮流ページの読み取り (潮流の行がある最初の表だけを逐次パース) ---
+JCG_PAGE_ENCODING = "cp932"  # Shift_JIS の上位互換 (機種依存文字で落ちないように)
+_JCG_FEED_BYTES = 8192
+_JCG_MIN_CELLS = 4  # 時・分・流向・流速
+
+# 字句: コメント / script・style の中身ごと / 開始・終了タグ / 文字列 / タグでない "<"
+_HTML_TOKEN = re.compile(
+    r"<!--.*?-->|<(script|style)\b.*?</\1\s*>|<(/?)([a-zA-Z][a-zA-Z0-9]*)([^>]*)>|<![^>]*>|[^<]+|<(?![a-zA-Z/!])",
+    re.S | re.I)
+_HTML_SPAN = re.compile(r"""(rowspan|colspan)\s*=\s*["']?(\d+)""", re.I)
+_SPAN_MAX = 1000
+
+class _OpenTable:
+    # 読み取り中の <table> 1つ分 (行・セル・上の行から続く rowspan)
+    def __init__(self):
+        self.rows = []
+        self.row = None
+        self.cell = None
+        self.spans = (1, 1)
+        self.carry = {}    # 列番号 -> (残り行数, 文字列)。上の行の rowspan の続き
+
+    def fill_carry(self):
+        while len(self.row) in self.carry:
+            col = len(self.row)
+            left, text = self.carry[col]
+            self.row.append(text)
+            if left > 1: self.carry[col] = (left - 1, text)
+            else: del self.carry[col]
+
+    def end_cell(self):
+        if self.cell is None: return
+        text = "".join(self.cell)
+        if "&" in text: text = html.unescape(text)
+        text = " ".join(text.split())
+        rowspan, colspan = self.spans
+        self.cell = None
+        self.fill_carry()
+        for _ in range(colspan):
+            if rowspan > 1: self.carry[len(self.row)] = (rowspan - 1, text)
+            self.row.append(text)
+
+    def end_row(self):
+        # 閉じた行を返す。時・分・流向・流速がそろわない行 (見出し・注記など) は捨てて None
+        self.end_cell()
+        if self.row is None: return None
+        self.fill_carry()
+        row, self.row = self.row, None
+        if len(row) < _JCG_MIN_CELLS: return None
+        row = tuple(row)
+        self.rows.append(row)
+        return row
+
+class _TideTableRows:
+    # 潮流の行 (_tide_row が読める行) が最初に出てきた表の行を (セルの文字列, ...) で集め、その表が閉じたら止まる。
+    # 前に置かれた別の表や、全体を囲むレイアウト用の表は読み飛ばす。rowspan/colspan は展開し、
+    # 入れ子の表の文字列は外側のセルにも含める (lxml の text_content と同じ)。
+    # 表の読み取りに要るタグ (table/tr/td/th/br) だけを見る小さな逐次パーサ (途中で切れたタグは次の feed まで持ち越す)
+    def __init__(self):
+        self.rows = []
+        self.done = False
+        self._buf = ""
+        self._tables = []   # 開いている <table> (外側から順に)
+        self._data = None   # 潮流の表と決まった _OpenTable (以後の行は self.rows に直接入る)
+
+    def feed(self, text, final=False):
+        buf = self._buf + text
+        pos, n = 0, len(buf)
+        while pos < n and not self.done:
+            m = _HTML_TOKEN.match(buf, pos)
+            if m is None:
+                if not final: break  # タグやコメントの途中で切れている
+                m = _HTML_TOKEN.match(buf, pos + 1) if buf[pos] == "<" else None
+                if m is None: break
+                self._text("<")
+                pos += 1
+                continue
+            if m.end() == n and not final and m.group() == "<": break  # "<" の直後で切れている (タグの始まりかもしれない)
+            tag = m.group(3)
+            if tag is not None:
+                if m.end() == n and not final: break  # 属性の途中で切れているかもしれない
+                lower = tag.lower()
+                if lower in ("script", "style") and not final: break  # 閉じタグまで届くのを待つ
+                if m.group(2): self._end(lower)
+                else: self._start(lower, m.group(4))
+            elif m.group(1) is None and not buf.startswith("<!", pos):
+                self._text(m.group())
+            pos = m.end()
+        self._buf = "" if self.done else buf[pos:]
+        if final:
+            while self._tables and not self.done: self._close_table()
+
+    def _start(self, tag, attrs):
+        if tag == "table":
+            self._tables.append(_OpenTable())
+            return
+        if not self._tables: return
+        table = self._tables[-1]
+        if tag == "br":
+            self._text(" ")
+        elif tag == "tr":
+            self._end_row(table)
+            table.row = []
+        elif tag in ("td", "th"):
+            table.end_cell()
+            if table.row is None: table.row = []
+            table.cell = []
+            rowspan = colspan = 1
+            if attrs and "span" in attrs.lower():
+                for name, value in _HTML_SPAN.findall(attrs):
+                    if name.lower() == "rowspan": rowspan = max(1, min(int(value), _SPAN_MAX))
+                    else: colspan = max(1, min(int(value), _SPAN_MAX))
+            table.spans = (rowspan, colspan)
+
+    def _end(self, tag):
+        if not self._tables: return
+        if tag == "table":
+            self._close_table()
+        elif tag in ("td", "th"):
+            self._tables[-1].end_cell()
+        elif tag == "tr":
+            self._end_row(self._tables[-1])
+
+    def _text(self, text):
+        for table in self._tables:
+            if table.cell is not None: table.cell.append(text)
+
+    def _end_row(self, table):
+        row = table.end_row()
+        if row is not None and self._data is None and _tide_row(row) is not None:
+            # 最初の潮流の行が出た表を採る。それまでの行 (見出しなど) もまとめて渡す
+            self._data = table
+            self.rows.extend(table.rows)
+            table.rows = self.rows
+
+    def _close_table(self):
+        table = self._tables.pop()
+        self._end_row(table)
+        if table is self._data: self.done = True
+
+def iter_jcg_rows(page):
+    # page: JCG の潮流ページのバイト列。潮流の表の行 (セルの文字列のタプル) を返す。表が閉じた時点で読むのをやめる
+    decoder = codecs.getincrementaldecoder(JCG_PAGE_ENCODING)(errors="replace")
+    parser = _TideTableRows()
+    view = memoryview(page)
+    for i in range(0, len(view), _JCG_FEED_BYTES):
+        parser.feed(decoder.decode(view[i:i + _JCG_FEED_BYTES]))
+        yield from parser.rows
+        parser.rows.clear()
+        if parser.done: return
+    parser.feed(decoder.decode(b"", final=True), final=True)
+    yield from parser.rows
+
+def parse_jcg_html(page, fetched_at=None):
+    # JCG の潮流ページ (Shift_JIS) の潮流の表を TideTable にする。表が無い・空なら None
+    table = TideTable.from_rows(iter_jcg_rows(page), fetched_at=fetched_at)
+    return table if len(table) else None
+
+def _jcg_get(url, timeout=JCG_FETCH_TIMEOUT_SEC):
+    # JCG の証明書はチェーンが揃わないことがあるので検証しない (アプリの HTTP 層と同じ扱い)
+    ctx = ssl.create_default_context()
+    ctx.check_hostname = False
+    ctx.verify_mode = ssl.CERT_NONE
+    with urllib.request.urlopen(url, timeout=timeout, context=ctx) as res:
+        return res.read()
+
+def fetch_jcg_tide_table(url, get=None, metrics=None):
+    # 潮流ページを取って TideTable にする。失敗・空なら None
+    # get を渡せば呼び出し側の HTTP 層 (接続の使い回し・遮断) を使う。metrics を渡せば取得・解析の時間と失敗を記録
+    span = metrics.span if metrics is not None else (lambda *a, **k: contextlib.nullcontext())
+    try:
+        with span("fetch", source="jcg"):
+            page = (get or _jcg_get)(url)
+            with span("parse", source="jcg"):
+                return parse_jcg_html(page, fetched_at=time.time())
+    except Exception:
+        if metrics is not None: metrics.inc("upstream_failures", source="jcg")
+        return None
+
+# --- 年間の潮流予測 (メモリマップした float32 配列を時刻から直接引く) ---
+class HarmonicTideTable:
+    def __init__(self, knots, start, step_min):
+        self.knots = knots  # 上げ潮(西/北)を正にした流速 (kt)。start から step_min 分おき
+        self.start = np.datetime64(start, "m")
+        self.start_dt = self.start.astype(datetime.datetime)
+        self.step_min = step_min
+
+    def __len__(self):
+        return len(self.knots)
+
+    def signed_knot(self, dt):
+        minutes = (dt.replace(tzinfo=None) - self.start_dt) // datetime.timedelta(minutes=1)
+        i = (minutes + self.step_min // 2) // self.step_min
+        if not 0 <= i < len(self.knots): return None
+        return float(self.knots[i])
+
+    def signed_knots(self, ts):
+        # ts: datetime64[m] (JST) の配列。範囲外は NaN
+        minutes = (np.asarray(ts, dtype="datetime64[m]") - self.start).astype(np.int64)
+        i = (minutes + self.step_min // 2) // self.step_min
+        ok = (i >= 0) & (i < len(self.knots))
+        out = np.full(i.shape, np.nan)
+        out[ok] = self.knots[i[ok]]
+        return out
+
+def load_harmonic_tide_tables(table_dir=TIDE_TABLE_DIR):
+    try:
+        with open(os.path.join(table_dir, "index.json"), encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    tables = {}
+    for ref_key, meta in index.items():
+        try:
+            knots = np.load(os.path.join(table_dir, meta["file"]), mmap_mode="r")
+        except (OSError, ValueError, KeyError):
+            continue
+        tables[ref_key] = HarmonicTideTable(knots, meta["start"], meta["step_min"])
+    return tables
+
+# --- 潮流データの入手先 (アプリは取得・キャッシュ付き、バッチは記録済みデータを渡す) ---
+class TideSource:
+    def __init__(self, official=None, harmonic=None):
+        self._official = official or {}  # 基準港 -> 当日の TideTable
+        self._harmonic = harmonic or {}  # 基準港 -> HarmonicTideTable
+
+    def official(self, ref_key):
+        return self._official.get(ref_key)
+
+    def harmonic(self, ref_key):
+        return self._harmonic.get(ref_key)
+
+def parse_jcg_data(table, current_hour, current_min, interpolate=TIDE_INTERPOLATE):
+    if table is None: return None, None, False
+    hit = table.lookup(current_hour, current_min, interpolate=interpolate)
+    if hit is None: return None, None, False
+    knot, direction = hit
+    return knot, direction, True
+
+def get_hybrid_tide_data(target_datetime, now_datetime, port_info, tides):
+    ref_dt = target_datetime - datetime.timedelta(minutes=port_info.offset_min)
+    ref_port_key = port_info.ref_key
+    is_same_day_as_source = (ref_dt.day == now_datetime.day)
+    
+    success = False
+    knot = 0.0
+    dr_text = ""
+    
+    if is_same_day_as_source:
+        table = tides.official(ref_port_key)
+        knot, dr_text, success = parse_jcg_data(table, ref_dt.hour, ref_dt.minute)
+    
+    if success:
+        is_rising = _is_rising_direction(dr_text)
+        tide_factor = min(knot / 6.0, 1.0) 
+        return tide_factor, is_rising, knot, True 
+    harmonic = tides.harmonic(ref_port_key)
+    signed = harmonic.signed_knot(ref_dt) if harmonic is not None else None
+    if signed is not None:
+        knot = abs(signed)
+        return min(knot / 6.0, 1.0), signed > 0, knot, False
+    else:
+        moon_age = get_moon_age_simple(ref_dt)
+        tide_factor, is_rising, knot = estimate_tide_current_logic(moon_age, ref_dt.hour + ref_dt.minute/60)
+        return tide_factor, is_rising, knot, False 
+
+def estimate_tide_current_logic(moon_age, hour):
+    high_tide_base = 8.5
+    delay = 0.8
+    high_tide_time = (high_tide_base + (moon_age % 15) * delay) % 12
+    diff = abs(hour - high_tide_time)
+    if diff > 6: diff = 12 - diff 
+    current_speed_factor = math.sin(diff * (math.pi / 6))
+    is_rising = True
+    if (high_tide_time - 6) < hour < high_tide_time: is_rising = True 
+    else: is_rising = False 
+    norm_age = moon_age % 15
+    if norm_age <= 2 or norm_age >= 13: max_knot = 5.5
+    elif 3 <= norm_age <= 5 or 10 <= norm_age <= 12: max_knot = 3.5
+    else: max_knot = 2.0
+    estimated_knot = max_knot * current_speed_factor
+    return current_speed_factor, is_rising, estimated_knot
+
+# --- 潮流推計のベクトル版 (時刻の配列をまとめて計算) ---
+def to_jst_minutes(datetimes):
+    # JSTの datetime 列 (tz付きでも可) を datetime64[m] の壁時計時刻に揃える
+    return np.array([d.replace(tzinfo=None) for d in datetimes], dtype="datetime64[m]")
+
+def tide_time_range(start_dt, hours, step_min=10):
+    start = np.datetime64(start_dt.replace(tzinfo=None), "m")
+    return start + np.arange(0, hours * 60, step_min).astype("timedelta64[m]")
+
+def get_moon_age_vec(ts):
+    days = ts.astype("datetime64[D]")
+    months_since_epoch = days.astype("datetime64[M]").astype(np.int64)
+    year = months_since_epoch // 12 + 1970
+    month = months_since_epoch % 12 + 1
+    day = (days - days.astype("datetime64[M]")).astype(np.int64) + 1
+    early = month < 3
+    year = np.where(early, year - 1, year)
+    month = np.where(early, month + 12, month)
+    p = np.floor(year / 4)
+    # get_moon_age_simple と同じ順序で足し合わせる (スカラー版とビット単位で一致)
+    return (year + p + month * 9 / 25 + day + 11) % 30
+
+def estimate_tide_current_vec(moon_age, hour):
+    high_tide_base = 8.5
+    delay = 0.8
+    high_tide_time = (high_tide_base + (moon_age % 15) * delay) % 12
+    diff = np.abs(hour - high_tide_time)
+    diff = np.where(diff > 6, 12 - diff, diff)
+    current_speed_factor = np.sin(diff * (math.pi / 6))
+    is_rising = ((high_tide_time - 6) < hour) & (hour < high_tide_time)
+    norm_age = moon_age % 15
+    max_knot = np.where((norm_age <= 2) | (norm_age >= 13), 5.5,
+                        np.where(((3 <= norm_age) & (norm_age <= 5)) | ((10 <= norm_age) & (norm_age <= 12)), 3.5, 2.0))
+    estimated_knot = max_knot * current_speed_factor
+    return current_speed_factor, is_rising, estimated_knot
+
+def estimate_port_tide_series(ts, port_info):
+    # ts: datetime64[m] の配列 (JST)。港の時差補正をかけた基準港時刻で推計する
+    factor, rising, knot = estimate_ports_tide_series(ts, [port_info.offset_min])
+    return factor[0], rising[0], knot[0]
+
+def estimate_ports_tide_series(ts, offsets_min):
+    # 複数港の時差補正を (港, 時刻) の2次元配列にして1回で推計する
+    ref = ts[np.newaxis, :] - np.asarray(offsets_min, dtype="timedelta64[m]")[:, np.newaxis]
+    minute_of_day = (ref - ref.astype("datetime64[D]")).astype(np.int64)
+    hour = minute_of_day // 60 + (minute_of_day % 60) / 60
+    return estimate_tide_current_vec(get_moon_age_vec(ref), hour)
+
+def tide_columns(times, now, port_info, tides):
+    # get_hybrid_tide_data の配列版: 基準港が当日なら公式表、それ以外は年間予測、それも無ければ推計
+    ref = times - np.timedelta64(port_info.offset_min, "m")
+    factor, rising, knot = estimate_ports_tide_series(times, [port_info.offset_min])
+    factor, rising, knot = factor[0], rising[0], knot[0]
+    harmonic = tides.harmonic(port_info.ref_key)
+    if harmonic is not None:
+        signed = harmonic.signed_knots(ref)
+        has = ~np.isnan(signed)
+        knot = np.where(has, np.abs(signed), knot)
+        rising = np.where(has, signed > 0, rising)
+        factor = np.where(has, np.minimum(np.abs(signed) / 6.0, 1.0), factor)
+    official = np.zeros(len(times), dtype=bool)
+    same_day = ref.astype("datetime64[D]") == np.datetime64(now.replace(tzinfo=None), "D")
+    table = tides.official(port_info.ref_key) if same_day.any() else None
+    if table is not None and len(table):
+        minute_of_day = (ref - ref.astype("datetime64[D]")).astype(np.int64)
+        off_knot, off_rising = table.lookup_many(minute_of_day)
+        official = same_day
+        knot = np.where(official, off_knot, knot)
+        rising = np.where(official, off_rising, rising)
+        factor = np.where(official, np.minimum(off_knot / 6.0, 1.0), factor)
+    return factor, rising, knot, official
+
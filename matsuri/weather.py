@@ -0,0 +1,152 @@
+# Open-Meteo のレスポンスの解釈と、定点ごとの天気データの組み立て (取得そのものはアプリ側)
+import json
+import math
+from array import array
+
+import numpy as np
+
+from .stations import JCG_POINTS
+
+# 水温(SST)が欠けている地点の周辺探索 (並びが優先順位)
+SST_SEARCH_OFFSETS = [
+    (-0.02, 0.00), (-0.05, 0.00), (-0.03, 0.03), (-0.03, -0.03), (0.00, 0.05)
+]
+
+# --- hourly を列で持つ (取得時に1回だけ作り、以後は書き換えない) ---
+# Open-Meteo の項目名 -> 属性名
+HOURLY_FIELDS = {"sea_surface_temperature": "sst", "wind_speed_10m": "wind_speed", "wind_direction_10m": "wind_dir",
+                 "weather_code": "weather_code", "rain": "rain", "cloud_cover": "cloud"}
+
+def _hourly_array(values, n):
+    # 長さ n の array('d')。None と足りない分は NaN
+    values = (values or [])[:n]
+    col = array("d", (math.nan if v is None else v for v in values))
+    if len(col) < n: col.extend([math.nan] * (n - len(col)))
+    return col
+
+class HourlyForecast:
+    # 各列は array('d') (欠損は NaN)。時刻は start (JST の壁時計、分) から1時間おき (Open-Meteo の hourly はいつもそう)
+    __slots__ = ("start", "n", "sst", "wind_speed", "wind_dir", "weather_code", "rain", "cloud")
+
+    def __init__(self, start, n, sst, wind_speed, wind_dir, weather_code, rain, cloud):
+        self.start = start  # datetime64[m] か None (時刻の列が無いとき)
+        self.n = n
+        self.sst = sst
+        self.wind_speed = wind_speed
+        self.wind_dir = wind_dir
+        self.weather_code = weather_code
+        self.rain = rain
+        self.cloud = cloud
+
+    def __len__(self):
+        return self.n
+
+    @classmethod
+    def from_dict(cls, hourly):
+        times = hourly.get("time") or []
+        n = len(times) if times else len(hourly.get("wind_speed_10m") or [])
+        start = None
+        if times:
+            ts = np.array(times, dtype="datetime64[m]")
+            if n > 1 and not (np.diff(ts) == np.timedelta64(60, "m")).all(): raise ValueError("hourly time is not hourly")
+            start = ts[0]
+        return cls(start, n, *(_hourly_array(hourly.get(name), n) for name in HOURLY_FIELDS))
+
+    def to_dict(self):
+        hourly = {}
+        if self.start is not None: hourly["time"] = self.times().astype(str).tolist()
+        for name, attr in HOURLY_FIELDS.items():
+            hourly[name] = [None if v != v else v for v in getattr(self, attr)]
+        return hourly
+
+    def times(self):
+        return self.start + np.arange(self.n).astype("timedelta64[h]")
+
+    def row_of(self, now):
+        # now (JST) を含む1時間の行番号。取得から日付をまたいだ保存データでも、行の時刻で数える
+        # (時刻の列が無いときは当日0時起点とみなす)。データの範囲外なら負か n 以上
+        if self.start is None: return now.hour
+        hour = np.datetime64(now.replace(tzinfo=None), "h")
+        return int((hour - self.start.astype("datetime64[h]")).astype(np.int64))
+
+    def sst_at(self, row):
+        if not 0 <= row < self.n: return None
+        v = self.sst[row]
+        return None if v != v else v
+
+    def column(self, attr, fill):
+        # float64 の配列 (欠損は fill で埋めた複製)
+        col = np.frombuffer(getattr(self, attr), dtype=np.float64)
+        return np.where(np.isnan(col), fill, col)
+
+    def with_columns(self, **cols):
+        # 一部の列だけ差し替えた新しい HourlyForecast (他の列は共有)。長さはこちらに合わせる
+        values = {attr: getattr(self, attr) for attr in HOURLY_FIELDS.values()}
+        for attr, col in cols.items():
+            col = array("d", col[:self.n])
+            if len(col) < self.n: col.extend([math.nan] * (self.n - len(col)))
+            values[attr] = col
+        return HourlyForecast(self.start, self.n, *values.values())
+
+def payload_from_dict(data):
+    # Open-Meteo の1地点分 (JSON のまま) の hourly を HourlyForecast にする
+    if isinstance(data.get("hourly"), dict): data["hourly"] = HourlyForecast.from_dict(data["hourly"])
+    return data
+
+def parse_open_meteo(body):
+    # 1地点なら dict、複数地点 (カンマ区切り指定) なら dict のリスト
+    data = json.loads(body)
+    if isinstance(data, dict): return payload_from_dict(data)
+    if isinstance(data, list): return [payload_from_dict(d) for d in data]
+    raise ValueError("unexpected Open-Meteo response")
+
+# --- 保存データ (SQLite) との出し入れ ---
+def weather_to_json(value):
+    # 1地点分・定点ごとの dict のどちらも。HourlyForecast は Open-Meteo と同じ形に戻す
+    return json.dumps(value, default=HourlyForecast.to_dict)
+
+def payload_from_json(text):
+    return payload_from_dict(json.loads(text))
+
+def station_batch_from_json(text):
+    return {key: payload_from_dict(data) for key, data in json.loads(text).items()}
+
+def has_sst_at(data, now):
+    if not data: return False
+    hourly = data.get("hourly")
+    return hourly is not None and hourly.sst_at(hourly.row_of(now)) is not None
+
+def copy_payload(data):
+    # キャッシュ共有中の生データを書き換えないよう複製する (hourly は書き換えないので共有)
+    return dict(data)
+
+def adopt_search_sst(base_data, search_data):
+    base_data["hourly"] = base_data["hourly"].with_columns(sst=search_data["hourly"].sst, cloud=search_data["hourly"].cloud)
+    base_data["sst_source"] = "search"
+
+# --- 定点の一括取得 (全定点・代替SST地点・周辺探索点を1往復で) ---
+def station_batch_points():
+    points = [(station.sst_lat, station.sst_lon) for station in JCG_POINTS.values()]
+    for station in JCG_POINTS.values():
+        points += [(round(station.lat + d_lat, 4), round(station.lon + d_lon, 4)) for d_lat, d_lon in SST_SEARCH_OFFSETS]
+    return points
+
+def assemble_station_batch(payloads, now):
+    # payloads は station_batch_points() と同じ並び。定点 -> 天気データ (水温の出どころ付き) にする
+    n_probe = len(SST_SEARCH_OFFSETS)
+    probe_start = len(JCG_POINTS)
+    result = {}
+    for i, key in enumerate(JCG_POINTS):
+        if not payloads[i]: continue
+        base_data = copy_payload(payloads[i])
+        if has_sst_at(base_data, now):
+            base_data["sst_source"] = "search"
+        else:
+            base_data["sst_source"] = "none"
+            # 代替地点にも水温がなければ、定点周辺の探索点を優先順に当てる
+            for probe in payloads[probe_start + i * n_probe: probe_start + (i + 1) * n_probe]:
+                if has_sst_at(probe, now):
+                    adopt_search_sst(base_data, probe)
+                    break
+        result[key] = base_data
+    return result
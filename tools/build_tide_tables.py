@@ -0,0 +1,134 @@
+# JCG の潮流表を日ごとに保存し、その蓄積から調和定数を当てはめて1年分の潮流予測を作る。
+# 予測は基準港ごとに float32 の .npy (上げ潮=正の流速kt、一定間隔) に書き出し、アプリはメモリマップで引く。
+#   python tools/build_tide_tables.py archive                 # 今日の表を tide_archive/<港>/<日付>.json に保存 (毎日cron等で)
+#   python tools/build_tide_tables.py build [--year 2027]     # 蓄積から tide_tables/<港>.npy と index.json を作る
+import argparse
+import datetime
+import glob
+import json
+import os
+import sys
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from matsuri import JCG_POINTS, TIDE_TABLE_DIR, TideTable, fetch_jcg_tide_table, parse_jcg_html
+
+ARCHIVE_DIR = os.path.join(ROOT, "tide_archive")
+EPOCH = np.datetime64("2000-01-01T00:00", "m")  # 位相の基準 (JST)
+STEP_MIN = 10
+
+# 主要分潮と角速度 (度/時)。優先度順に並べ、記録長で分離できるものだけ使う (レイリー基準)
+CONSTITUENTS = [
+    ("M2", 28.9841042), ("K1", 15.0410686), ("S2", 30.0000000), ("O1", 13.9430356),
+    ("N2", 28.4397295), ("M4", 57.9682084), ("MS4", 58.9841042), ("P1", 14.9589314),
+    ("K2", 30.0821373), ("Q1", 13.3986609), ("M6", 86.9523127),
+]
+
+def reference_stations():
+    return {key: station.url for key, station in JCG_POINTS.items() if station.url}
+
+def archive_today(archive_dir):
+    today = datetime.datetime.now(datetime.timezone(datetime.timedelta(hours=9))).date()
+    for key, url in reference_stations().items():
+        table = fetch_jcg_tide_table(url)
+        if table is None:
+            print(f"{key}: 取得失敗")
+            continue
+        os.makedirs(os.path.join(archive_dir, key), exist_ok=True)
+        path = os.path.join(archive_dir, key, f"{today.isoformat()}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(table.to_json())
+        print(f"{key}: {len(table)} 行 -> {path}")
+
+def load_archive(archive_dir, key):
+    # 保存済みの表 (TideTable の JSON、または保存したJCGページの .html) を (時刻, 上げ潮=正の流速) に並べる
+    times, values = [], []
+    for path in sorted(glob.glob(os.path.join(archive_dir, key, "*"))):
+        name, ext = os.path.splitext(os.path.basename(path))
+        try:
+            day = np.datetime64(name, "D")
+        except ValueError:
+            continue
+        if ext == ".json":
+            with open(path, encoding="utf-8") as f:
+                table = TideTable.from_json(f.read())
+        elif ext in (".html", ".htm"):
+            with open(path, "rb") as f:
+                table = parse_jcg_html(f.read())
+            if table is None: continue
+        else:
+            continue
+        times.extend(day + np.frombuffer(table.minutes, dtype=np.uint16).astype("timedelta64[m]"))
+        values.extend(table.signed_knots().tolist())
+    order = np.argsort(np.array(times, dtype="datetime64[m]"), kind="stable")
+    return np.array(times, dtype="datetime64[m]")[order], np.array(values, dtype=np.float64)[order]
+
+def hours_since_epoch(ts):
+    return (ts - EPOCH).astype(np.int64) / 60.0
+
+def select_constituents(span_hours):
+    chosen = []
+    for name, speed in CONSTITUENTS:
+        if all(abs(speed - s) * span_hours / 360.0 >= 1.0 for _, s in chosen):
+            chosen.append((name, speed))
+    return chosen
+
+def design_matrix(hours, constituents):
+    cols = [np.ones_like(hours)]
+    for _, speed in constituents:
+        w = np.deg2rad(speed) * hours
+        cols += [np.cos(w), np.sin(w)]
+    return np.column_stack(cols)
+
+def fit(times, values):
+    # 交点補正は省略 (1年分の予測なので毎年作り直す前提)
+    hours = hours_since_epoch(times)
+    constituents = select_constituents(hours[-1] - hours[0])
+    coef, *_ = np.linalg.lstsq(design_matrix(hours, constituents), values, rcond=None)
+    rmse = float(np.sqrt(np.mean((design_matrix(hours, constituents) @ coef - values) ** 2)))
+    return constituents, coef, rmse
+
+def predict(constituents, coef, start, count, step_min=STEP_MIN):
+    ts = start + np.arange(count) * np.timedelta64(step_min, "m")
+    return (design_matrix(hours_since_epoch(ts), constituents) @ coef).astype(np.float32)
+
+def build(archive_dir, out_dir, year):
+    start = np.datetime64(f"{year}-01-01T00:00", "m")
+    end = np.datetime64(f"{year + 1}-01-02T00:00", "m")  # 年末の夜に時差補正した港も引けるよう1日余分に
+    count = int((end - start).astype(np.int64) // STEP_MIN)
+    os.makedirs(out_dir, exist_ok=True)
+    index = {}
+    for key in reference_stations():
+        times, values = load_archive(archive_dir, key)
+        if len(times) < 2 * (1 + 2 * len(CONSTITUENTS)):
+            print(f"{key}: 蓄積が足りないのでスキップ ({len(times)} 行)")
+            continue
+        constituents, coef, rmse = fit(times, values)
+        np.save(os.path.join(out_dir, f"{key}.npy"), predict(constituents, coef, start, count))
+        index[key] = {
+            "file": f"{key}.npy", "start": str(start), "step_min": STEP_MIN,
+            "fitted_from": [str(times[0]), str(times[-1])], "rows": len(times), "rmse_kt": round(rmse, 3),
+            "constituents": {name: {"amp_kt": round(float(np.hypot(a, b)), 4), "phase_deg": round(float(np.degrees(np.arctan2(b, a)) % 360), 2)}
+                             for (name, _), a, b in zip(constituents, coef[1::2], coef[2::2])},
+        }
+        print(f"{key}: {len(times)} 行から {len(constituents)} 分潮を当てはめ (RMSE {rmse:.2f} kt)")
+    with open(os.path.join(out_dir, "index.json"), "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["archive", "build"])
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    parser.add_argument("--out-dir", default=TIDE_TABLE_DIR)
+    parser.add_argument("--year", type=int, default=datetime.date.today().year)
+    args = parser.parse_args()
+    if args.command == "archive":
+        archive_today(args.archive_dir)
+    else:
+        build(args.archive_dir, args.out_dir, args.year)
+
+if __name__ == "__main__":
+    main()
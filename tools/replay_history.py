@@ -0,0 +1,57 @@
+# 過去の天気の保存データ (Open-Meteo の hourly を日・月・年ごとに保存した JSON) を指数・戦略の判定に通して、
+# 時間ごとの成績表 (CSV) と、港ごとの月 × 時刻のヒートマップ (平均指数) を出す。判定を調整したときに過去の季節で見比べる用
+#   python tools/replay_history.py weather_archive                              # ヒートマップを表示するだけ
+#   python tools/replay_history.py weather_archive -o scores.csv --heatmap heatmap.json --depths 45m
+# 保存データの置き方は matsuri/replay.py の先頭を参照。過去の日の JCG 公式表は無いので、潮は年間予測 (tide_tables) か推計
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from matsuri import (DEPTH_MODES, TIDE_TABLE_DIR, ScoreHeatmap, TideSource, iter_replay, load_harmonic_tide_tables,
+                     score_header, score_rows)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python tools/replay_history.py")
+    parser.add_argument("archive", help="保存した Open-Meteo の JSON の置き場 (<港>.json か <港>/*.json)")
+    parser.add_argument("--tide-tables", default=TIDE_TABLE_DIR)
+    parser.add_argument("--ports", help="カンマ区切りの港キー (省略時は全港)")
+    parser.add_argument("--depths", default=",".join(DEPTH_MODES))
+    parser.add_argument("-o", "--output", help="時間ごとの成績表 (CSV) の出力先。省略時は書き出さない")
+    parser.add_argument("--heatmap", help="月 × 時刻のヒートマップ (JSON) の出力先")
+    args = parser.parse_args(argv)
+
+    tides = TideSource(None, load_harmonic_tide_tables(args.tide_tables))
+    ports = args.ports.split(",") if args.ports else None
+    depth_modes = tuple(args.depths.split(","))
+    heatmap = ScoreHeatmap()
+    out = open(args.output, "w", encoding="utf-8", newline="") if args.output else None
+    writer = csv.writer(out) if out else None
+    t0 = time.perf_counter()
+    try:
+        if writer: writer.writerow(score_header(depth_modes))
+        for chunk in iter_replay(args.archive, tides, ports, depth_modes):
+            heatmap.add(chunk["port"], chunk["month"], chunk["hour"], chunk["score"])
+            if writer: writer.writerows(score_rows(chunk, depth_modes))
+    finally:
+        if out: out.close()
+    elapsed = time.perf_counter() - t0
+    if not heatmap.ports():
+        print("保存データがありません", file=sys.stderr)
+        return 1
+    if args.heatmap:
+        with open(args.heatmap, "w", encoding="utf-8") as f:
+            json.dump(heatmap.to_json(), f, ensure_ascii=False)
+    for port_key in heatmap.ports():
+        print(heatmap.format(port_key))
+    hours = sum(heatmap.hours(p) for p in heatmap.ports())
+    print(f"{hours} hours x {len(depth_modes)} depths in {elapsed * 1000:.0f} ms ({hours / elapsed if elapsed else 0:.0f} hours/s)",
+          file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
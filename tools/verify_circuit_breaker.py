@@ -0,0 +1,91 @@
+# 上流ごとのサーキットブレーカー (matsuri.breaker.CircuitBreaker) の状態の移り変わりと、応答時間に合わせたタイムアウトを確かめる。
+# 遮断中はすぐに CircuitOpenError になり (待たない)、時間が経つと1件だけ試しに通し、その結果で閉じるか遮断に戻る。
+#   python tools/verify_circuit_breaker.py
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from matsuri import CircuitBreaker, CircuitOpenError
+from matsuri.breaker import TIMEOUT_MAX_SEC, TIMEOUT_MIN_SEC, TIMEOUT_MIN_SAMPLES
+
+OPEN_SEC = 0.1  # 確認用に短くする
+
+def call(breaker, ok, elapsed=0.1):
+    # AsyncIO.get と同じ順: 通せるか聞いてから呼び、結果を記録する。遮断中なら "rejected"
+    try:
+        breaker.before_call()
+    except CircuitOpenError:
+        return "rejected"
+    if ok: breaker.record_success(elapsed)
+    else: breaker.record_failure()
+    return "ok" if ok else "failed"
+
+def main():
+    failures = 0
+    def check(ok, label):
+        nonlocal failures
+        print(("OK  " if ok else "NG  ") + label)
+        failures += not ok
+
+    # 1) 連続で閾値回失敗したら遮断し、遮断中は呼ばずに断る
+    b = CircuitBreaker("upstream", failure_threshold=3, open_sec=OPEN_SEC)
+    results = [call(b, False) for _ in range(3)]
+    check(results == ["failed"] * 3 and b.state == "open", f"3回失敗で遮断 ({b.state})")
+    t0 = time.perf_counter()
+    results = [call(b, True) for _ in range(100)]
+    elapsed_ms = (time.perf_counter() - t0) * 1000
+    check(results == ["rejected"] * 100 and b.stats()["rejected"] == 100 and not b.allows(),
+          f"遮断中の100件はすぐに断る ({elapsed_ms:.2f} ms)")
+
+    # 2) 途中で成功すれば連続失敗の数は戻る
+    b2 = CircuitBreaker("flaky", failure_threshold=3, open_sec=OPEN_SEC)
+    for ok in (False, False, True, False, False):
+        call(b2, ok)
+    check(b2.state == "closed" and b2.failures == 2, "成功を挟めば遮断しない")
+
+    # 3) 時間が経つと試しに1件だけ通す (同時に来た残りは断る)。失敗なら遮断に戻る
+    time.sleep(OPEN_SEC * 1.5)
+    check(b.allows(), "遮断から時間が経てば通せる")
+    barrier = threading.Barrier(8)
+    admitted = []
+    def trial():
+        barrier.wait()
+        try:
+            b.before_call()
+            admitted.append(1)
+        except CircuitOpenError:
+            pass
+    threads = [threading.Thread(target=trial) for _ in range(8)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    check(len(admitted) == 1 and b.state == "half_open", f"同時の8件のうち試しに通すのは {len(admitted)} 件")
+    b.record_failure()
+    check(b.state == "open" and call(b, True) == "rejected", "試しが失敗したら遮断に戻る")
+
+    # 4) 試しが成功したら閉じて、普段どおり通す
+    time.sleep(OPEN_SEC * 1.5)
+    results = [call(b, True) for _ in range(3)]
+    check(results == ["ok"] * 3 and b.state == "closed" and b.failures == 0, "試しが成功したら閉じる")
+
+    # 5) タイムアウト: 記録が少ないうちは上限、その後は成功した応答の 95% 点 × 係数 (下限・上限で抑える)
+    b3 = CircuitBreaker("latency")
+    check(b3.timeout() == TIMEOUT_MAX_SEC, f"記録が少ないうちは上限 {b3.timeout():.1f} 秒")
+    for i in range(TIMEOUT_MIN_SAMPLES * 2):
+        b3.record_success(0.8 if i % 20 else 3.0)
+    t = b3.timeout()
+    check(abs(t - 2.4) < 1e-9, f"95% 点 0.8 秒 → タイムアウト {t:.1f} 秒")
+    for _ in range(100):
+        b3.record_success(0.05)
+    check(b3.timeout() == TIMEOUT_MIN_SEC, f"速い上流でも下限 {b3.timeout():.1f} 秒")
+    for _ in range(100):
+        b3.record_success(8.0)
+    check(b3.timeout() == TIMEOUT_MAX_SEC, f"遅い上流でも上限 {b3.timeout():.1f} 秒")
+
+    print(f"{failures} 件の不一致")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+# 日付をまたいだ保存データでも、hourly の行を「行の時刻」で引いていることを確かめる。
+# 前日 0 時から始まる 72 時間分 (風速 = 行番号、水温は前日分だけ) を、翌日 01:30 の現在時刻で読ませ、
+# 現在の水温・予報の各行の風速・一括取得の水温判定・盤面の行が、同じ時刻の hourly を使っているかを見る。
+#   python tools/verify_hourly_alignment.py
+import datetime
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from matsuri import (JCG_POINTS, SST_SEARCH_OFFSETS, TideSource, assemble_station_batch, build_forecast_frames, current_sst,
+                     frame_boards, has_sst_at, payload_from_dict)
+
+JST = datetime.timezone(datetime.timedelta(hours=9), "JST")
+START = datetime.datetime(2026, 5, 16)
+HOURS = 72
+
+def payload(sst_hours=24):
+    # 行 k の風速は k、水温は最初の sst_hours 時間だけ (それ以降は欠損)
+    times = [(START + datetime.timedelta(hours=k)).strftime("%Y-%m-%dT%H:%M") for k in range(HOURS)]
+    days = [(START + datetime.timedelta(days=d)).date().isoformat() for d in range(3)]
+    return payload_from_dict({
+        "current": {"cloud_cover": 50},
+        "hourly": {"time": times, "sea_surface_temperature": [15.0 + k / 100 if k < sst_hours else None for k in range(HOURS)],
+                   "wind_speed_10m": [float(k) for k in range(HOURS)], "wind_direction_10m": [180.0] * HOURS,
+                   "weather_code": [0] * HOURS, "rain": [0.0] * HOURS, "cloud_cover": [50.0] * HOURS},
+        "daily": {"time": days, "sunrise": [f"{d}T05:00" for d in days], "sunset": [f"{d}T19:00" for d in days]},
+        "sst_source": "local",
+    })
+
+def main():
+    failures = 0
+    def check(ok, label):
+        nonlocal failures
+        print(("OK  " if ok else "NG  ") + label)
+        failures += not ok
+
+    now = datetime.datetime(2026, 5, 17, 1, 30, tzinfo=JST)  # 取得の翌日 (行 25 が現在)
+    data = payload()
+    row = data["hourly"].row_of(now)
+    check(row == 25, f"翌日 01:30 は行 {row} (0 時起点の 1 ではなく、前日 0 時起点の 25)")
+
+    # 水温は前日分しか無いので、現在 (翌日 01 時) の解析値は無い
+    check(not has_sst_at(data, now), "前日 01 時の水温を現在の値として使わない")
+    sst, source = current_sst(data, now)
+    check(source == "none" and sst is not None, f"現在の行に水温が無ければ統計値: {sst}℃ ({source})")
+
+    port_info = JCG_POINTS["akashi"]
+    frames = build_forecast_frames(data, now, port_info, "akashi", 18.0, 50, TideSource())
+    fc = frames["45m"]
+    times = fc["time"].astype("datetime64[m]").astype(str).tolist()
+    check(fc["row"] == 25 and times[25] == "2026-05-17T01:30", f"現在の行は {fc['row']} ({times[fc['row']]})")
+    i = times.index("2026-05-17T02:30")
+    check(fc["wind_speed"][i] == 26.0, f"05-17 02:30 の行は 05-17 02:00 の風速 (行 26): {fc['wind_speed'][i]}")
+    check(not fc["next_day"][25] and fc["next_day"][25 + 23], "翌日の印は現在の日付から数える")
+
+    boards = list(frame_boards(fc, "akashi", "45m", now, hours=3))
+    check([b["time"] for b in boards] == ["2026-05-17T01:30", "2026-05-17T02:30", "2026-05-17T03:30"]
+          and [b["wind"]["speed"] for b in boards] == [25.0, 26.0, 27.0], "盤面は現在の行から 3 時間分")
+
+    # 一括取得: 定点の代替地点に現在の水温が無ければ、探索点の水温 (現在の行にあるもの) を使う
+    n_probe = len(SST_SEARCH_OFFSETS)
+    stale, fresh = payload(), payload(sst_hours=HOURS)
+    payloads = [stale] * len(JCG_POINTS) + [stale, fresh] + [stale] * (len(JCG_POINTS) * n_probe - 2)
+    batch = assemble_station_batch(payloads, now)
+    first = next(iter(JCG_POINTS))
+    check(batch[first]["sst_source"] == "search" and batch[first]["hourly"].sst_at(25) == fresh["hourly"].sst_at(25),
+          f"一括取得は現在の行に水温のある探索点を使う: {batch[first]['sst_source']}")
+
+    # 同じ日の取得分は従来どおり (行番号 = 時)
+    same_day = datetime.datetime(2026, 5, 16, 9, 0, tzinfo=JST)
+    check(data["hourly"].row_of(same_day) == 9 and has_sst_at(data, same_day), "当日分は 0 時起点の行番号")
+
+    print(f"{failures} 件の不一致")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+# JCG 潮流ページのパーサ (matsuri.tide.parse_jcg_html) を記録データ3港分・実際のページに近い書き方・崩れたページで確かめる。
+# 実際の応答を記録したページ (bench/fixtures/recorded/、bench/make_fixtures.py record で作る) があればそれも読む。
+# pandas と lxml があれば、以前の pd.read_html 経由の読み取りと行ごとに突き合わせ、時間とピークメモリも比べる。
+#   python tools/verify_jcg_parser.py
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import matsuri.tide
+from matsuri import TideTable, parse_jcg_html
+
+FIXTURE_DIR = os.path.join(ROOT, "bench", "fixtures")
+RECORDED_DIR = os.path.join(FIXTURE_DIR, "recorded")
+STATIONS = ("akashi", "naruto", "tomogashima")
+ROWS_PER_DAY = 24 * 6 + 1  # 0:00 から 24:00 まで10分ごと
+
+def legacy_parse(page):
+    # 置き換え前の読み取り (表を DataFrame にして行を渡す)。以前は dfs[0] だけを見ていたが、
+    # 前に別の表があるページでも比べられるよう、潮流の行が読める最初の表を使う
+    import pandas as pd
+    for df in pd.read_html(io.BytesIO(page), encoding="shift_jis"):
+        table = TideTable.from_rows(df.itertuples(index=False))
+        if len(table): return table
+    return None
+
+def measure(fn, page, number=20):
+    t0 = time.perf_counter()
+    for _ in range(number): fn(page)
+    elapsed_ms = (time.perf_counter() - t0) / number * 1000
+    tracemalloc.start()
+    fn(page)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed_ms, peak
+
+def page_of(rows_html, extra=""):
+    return (f"<html><body>{extra}<table>{rows_html}</table><table><tr><td>9</td><td>0</td><td>東流</td><td>9.9</td></tr></table>"
+            "</body></html>").encode("cp932")
+
+DATA_ROWS = ("<tr><td>0</td><td>0</td><td>西流</td><td>1.2</td></tr>"
+             "<tr><td>0</td><td>10</td><td>東流</td><td>0.4</td></tr>")
+DATA_EXPECTED = [(0, 1.2, "西流"), (10, 0.4, "東流")]
+HEADER = "<tr><th>時</th><th>分</th><th>流向</th><th>流速<br>(ノット)</th></tr>"
+
+# 実際のページに近い書き方: (名前, ページ, 期待する (時刻(分), 流速, 流向) の並び)。read_html とも突き合わせる
+REALISTIC_PAGES = [
+    ("見出し行 (th)", page_of(HEADER + DATA_ROWS), DATA_EXPECTED),
+    ("見出し2段 (colspan の表題 + 列名)",
+     page_of("<tr><th colspan='4'>明石海峡 10月17日(土) 潮流推算</th></tr>" + HEADER + DATA_ROWS), DATA_EXPECTED),
+    ("thead / tbody", page_of(f"<thead>{HEADER}</thead><tbody>{DATA_ROWS}</tbody>"), DATA_EXPECTED),
+    ("セル内の <br> と実体参照",
+     page_of("<tr><td>1</td><td>5</td><td>西流<br>(最強)</td><td>&nbsp;3.5&nbsp;</td></tr>"
+             "<tr><td>1</td><td>15</td><td>&#x6771;&#27969;</td><td>0&#46;5</td></tr>"
+             "<tr><td>1</td><td>25</td><td>北流&amp;南流</td><td>0.3<br/></td></tr>"),
+     [(65, 3.5, "西流 (最強)"), (75, 0.5, "東流"), (85, 0.3, "北流&南流")]),
+    ("前に別の表 (表題・日付)",
+     page_of(HEADER + DATA_ROWS, extra="<table><tr><td>海上保安庁</td><td>潮流推算</td></tr></table>"
+                                       "<table><tr><td>2026</td><td>10</td><td>17</td><td>土</td></tr></table>"),
+     DATA_EXPECTED),
+    ("全体を囲むレイアウト用の表",
+     (f"<html><body><table><tr><td><h1>明石海峡</h1></td></tr><tr><td><table>{HEADER}{DATA_ROWS}</table></td></tr>"
+      "</table></body></html>").encode("cp932"),
+     DATA_EXPECTED),
+]
+
+# 崩れたページ: (名前, ページ, 期待する (時刻(分), 流速, 流向) の並び)
+BROKEN_PAGES = [
+    ("見出し・注記・欠けた行は捨てる",
+     page_of("<tr><th>時</th><th>分</th><th>流向</th><th>流速</th></tr>"
+             "<tr><td>0</td><td>0</td><td>西流</td><td>1.2</td></tr>"
+             "<tr><td colspan='4'>※ 推算値</td></tr>"
+             "<tr><td>0</td><td>10</td><td>西流</td></tr>"
+             "<tr><td>0</td><td>20</td><td>西流</td><td>-</td></tr>"
+             "<tr><td>0</td><td>40</td><td>東流</td><td>0.4</td></tr>"),
+     [(0, 1.2, "西流"), (40, 0.4, "東流")]),
+    # 向きは流向の列で表すので、負の流速は表の読み違いとして捨てる (以前の読み取りは符号ごと流速にしていた)
+    ("負の流速は捨てる",
+     page_of("<tr><td>0</td><td>0</td><td>西流</td><td>1.2</td></tr>"
+             "<tr><td>0</td><td>30</td><td>西流</td><td>-1.0</td></tr>"),
+     [(0, 1.2, "西流")]),
+    # 時は 24:00 の行まで。範囲外の時・分は日付など別の表の行として捨てる
+    ("時が 0〜24・分が 0〜59 の外の行は捨てる",
+     page_of("<tr><td>23</td><td>50</td><td>西流</td><td>1.0</td></tr>"
+             "<tr><td>24</td><td>0</td><td>西流</td><td>1.1</td></tr>"
+             "<tr><td>25</td><td>0</td><td>西流</td><td>1.0</td></tr>"
+             "<tr><td>-1</td><td>0</td><td>西流</td><td>1.0</td></tr>"
+             "<tr><td>1</td><td>60</td><td>西流</td><td>1.0</td></tr>"),
+     [(1430, 1.0, "西流"), (1440, 1.1, "西流")]),
+    ("時の rowspan を各行に広げる",
+     page_of("<tr><td rowspan='3'>8</td><td>0</td><td>西流</td><td>2.0</td></tr>"
+             "<tr><td>10</td><td>西流</td><td>2.5</td></tr>"
+             "<tr><td>20</td><td>東流</td><td>0.3</td></tr>"),
+     [(480, 2.0, "西流"), (490, 2.5, "西流"), (500, 0.3, "東流")]),
+    ("空白・改行・実体参照・入れ子の表",
+     page_of("<tr><td> 1 </td><td>\n5</td><td>北<br>流</td><td>&nbsp;3.5 </td></tr>"
+             "<tr><td>1</td><td>15</td><td><table><tr><td>南流</td></tr></table></td><td>0.5</td></tr>"),
+     [(65, 3.5, "北 流"), (75, 0.5, "南流")]),
+    ("表が閉じていない",
+     "<table><tr><td>2</td><td>0</td><td>西流</td><td>1.0</td></tr><tr><td>2</td><td>10</td><td>西流</td><td>1.5".encode("cp932"),
+     [(120, 1.0, "西流"), (130, 1.5, "西流")]),
+    ("機種依存文字があっても読める",
+     page_of("<tr><td>3</td><td>0</td><td>西流</td><td>1.0</td><td>①最強</td></tr>"),
+     [(180, 1.0, "西流")]),
+]
+
+def rows_of(table):
+    if table is None: return []
+    return [(table.minutes[i], table.knots[i], table.dir_labels[table.dir_codes[i]]) for i in range(len(table))]
+
+def main():
+    failures = 0
+    try:
+        import pandas, lxml  # noqa: F401
+        has_legacy = True
+    except ImportError:
+        has_legacy = False
+        print("pandas/lxml が無いので以前の読み取りとの突き合わせは省略")
+
+    pages = [(key, os.path.join(FIXTURE_DIR, f"stream_{key}.html"), False) for key in STATIONS]
+    pages += [(f"{key} (記録)", os.path.join(RECORDED_DIR, f"stream_{key}.html"), True) for key in STATIONS
+              if os.path.exists(os.path.join(RECORDED_DIR, f"stream_{key}.html"))]
+    if len(pages) == len(STATIONS): print("記録したページ (bench/fixtures/recorded/) が無いので合成ページだけ読む")
+    for key, path, recorded in pages:
+        with open(path, "rb") as f:
+            page = f.read()
+        table = parse_jcg_html(page, fetched_at=1.0)
+        # 合成ページは行数・流向まで決まっている。記録したページは読めて、以前の読み取りと一致すればよい
+        ok = table is not None and table.fetched_at == 1.0 and (recorded or (
+            len(table) == ROWS_PER_DAY and table.minutes[0] == 0 and table.minutes[-1] == 24 * 60
+            and set(table.dir_labels) == {"西流", "東流"}))
+        line = f"{key:12s} {len(table) if table else 0:4d} 行"
+        ms, peak = measure(parse_jcg_html, page)
+        line += f"  {ms:6.2f} ms  peak {peak / 1024:7.1f} KiB"
+        if has_legacy:
+            legacy = legacy_parse(page)
+            same = legacy is not None and table is not None and legacy.to_json() == TideTable(
+                table.minutes, table.knots, table.dir_codes, table.dir_labels).to_json()
+            ok = ok and same
+            ms_l, peak_l = measure(legacy_parse, page)
+            line += f"  | read_html {ms_l:6.2f} ms  peak {peak_l / 1024:7.1f} KiB  {'一致' if same else '不一致'}"
+        print(("OK  " if ok else "NG  ") + line)
+        failures += not ok
+
+    for name, page, expected in REALISTIC_PAGES:
+        got = rows_of(parse_jcg_html(page))
+        ok = got == expected
+        detail = "" if ok else f"\n    got      {got}\n    expected {expected}"
+        if has_legacy:
+            legacy = rows_of(legacy_parse(page))
+            ok = ok and legacy == got
+            detail += "  (read_html と一致)" if legacy == got else f"\n    read_html {legacy}"
+        print(("OK  " if ok else "NG  ") + name + detail)
+        failures += not ok
+
+    for name, page, expected in BROKEN_PAGES:
+        got = rows_of(parse_jcg_html(page))
+        ok = got == expected
+        print(("OK  " if ok else "NG  ") + name + ("" if ok else f"\n    got      {got}\n    expected {expected}"))
+        failures += not ok
+
+    # 取得したバイト列を区切って読むので、タグや全角文字の途中で区切れても同じ行になること
+    feed_bytes = matsuri.tide._JCG_FEED_BYTES
+    try:
+        whole = [rows_of(parse_jcg_html(page)) for _, page, _ in REALISTIC_PAGES + BROKEN_PAGES]
+        split = {}
+        for size in (1, 2, 7):
+            matsuri.tide._JCG_FEED_BYTES = size
+            split[size] = [rows_of(parse_jcg_html(page)) for _, page, _ in REALISTIC_PAGES + BROKEN_PAGES]
+    finally:
+        matsuri.tide._JCG_FEED_BYTES = feed_bytes
+    bad = [size for size, got in split.items() if got != whole]
+    ok = not bad
+    print(("OK  " if ok else "NG  ") + "1・2・7 バイトずつ読んでも同じ行" + ("" if ok else f" (違う区切り: {bad})"))
+    failures += not ok
+
+    ok = parse_jcg_html(b"<html><body><p>no table</p></body></html>") is None
+    print(("OK  " if ok else "NG  ") + "表が無ければ None")
+    failures += not ok
+
+    print(f"{failures} 件の不一致")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
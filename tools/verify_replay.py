@@ -0,0 +1,102 @@
+# 過去データの再計算 (matsuri.replay) が、アプリの予報フレーム (build_forecast_frames) と同じ指数・戦略を出すことを確かめる。
+# あわせて、バケットの整数キー・水温の統計値 (配列版)・区切り方 (chunk) やファイルの重なりで結果が変わらないことも見る。
+#   python tools/verify_replay.py
+import datetime
+import itertools
+import json
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from matsuri import (DEPTH_MODES, JCG_POINTS, ScoreHeatmap, TideSource, build_forecast_frames, calculate_historical_sst_precise,
+                     calculate_historical_sst_vec, iter_replay, parse_open_meteo, replay_chunks, strategy_bucket_keys,
+                     strategy_buckets)
+
+FIXTURE_DIR = os.path.join(ROOT, "bench", "fixtures")
+STRATEGY_FIELDS = ("weight", "color", "tie_size", "maker_rec", "speed", "tactic")
+
+def load_station(key):
+    with open(os.path.join(FIXTURE_DIR, f"open_meteo_{key}.json"), encoding="utf-8") as f:
+        return parse_open_meteo(f.read())
+
+def concat(chunks):
+    chunks = list(chunks)
+    return {name: np.concatenate([c[name] for c in chunks]) for name in chunks[0] if name != "port"}
+
+def main():
+    failures = 0
+    def check(ok, label):
+        nonlocal failures
+        print(("OK  " if ok else "NG  ") + label)
+        failures += not ok
+
+    with open(os.path.join(FIXTURE_DIR, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    now = datetime.datetime.fromisoformat(meta["now"]).replace(minute=0)  # 予報フレームは「現在の分」で評価するので正時に揃える
+    tides = TideSource()  # 過去の日と同じく公式表なし (推計)
+
+    # 1) アプリの予報フレームと同じ指数・戦略 (水温のある時間。無い時間はアプリが現在の値で埋めるので比べない)
+    for key in meta["stations"]:
+        data = load_station(key)
+        frames = build_forecast_frames(data, now, JCG_POINTS[key], key, 0.0, data["current"]["cloud_cover"], tides)
+        replayed = concat(replay_chunks(data, key, tides))
+        has_sst = ~np.isnan(data["hourly"].column("sst", np.nan))
+        if not has_sst.any():
+            print(f"--  {key:12s} 水温なし (比べない)")
+            continue
+        fc = frames[DEPTH_MODES[0]]
+        same = all(np.array_equal(fc[name][has_sst], replayed[name][has_sst]) for name in ("score", "tide_factor", "is_synced"))
+        same = same and all(np.array_equal(frames[depth][field][has_sst], replayed[f"{depth}_{field}"][has_sst])
+                            for depth in DEPTH_MODES for field in STRATEGY_FIELDS)
+        check(same, f"{key:12s} {int(has_sst.sum())} 時間 × {len(DEPTH_MODES)} 水深が予報フレームと一致")
+
+    # 2) 整数キーが同じ行は strategy_buckets も同じ (境界値を含む全組み合わせ)
+    values = {
+        "wind": [0.0, 3.0, 3.1, 7.0, 7.1], "tide": [0.0, 0.19, 0.2, 0.29, 0.3, 0.31, 0.39, 0.4, 0.5, 0.51, 0.6, 0.61, 0.7, 0.71, 1.0],
+        "synced": [False, True], "temp": [11.9, 12.0, 15.0, 15.1], "cloud": [79.0, 80.0], "rain": [0.4, 0.5],
+        "month": list(range(1, 13)), "phase": ["night", "mazume", "day"],
+    }
+    rows = list(itertools.product(*values.values()))
+    cols = [np.array(c, dtype=object if name == "phase" else None) for name, c in zip(values, zip(*rows))]
+    wind, tide, synced, temp, cloud, rain, month, phase = cols
+    keys = strategy_bucket_keys(wind, tide, synced, temp, cloud, rain, month, phase).tolist()
+    by_key = {}
+    for k, (w, tf, sy, t, c, r, mo, ph) in zip(keys, rows):
+        by_key.setdefault(k, set()).add(strategy_buckets(w, tf, sy, t, c, r, None, mo, ph, "akashi"))
+    distinct = {b for buckets in by_key.values() for b in buckets}
+    check(all(len(b) == 1 for b in by_key.values()) and len(by_key) == len(distinct),
+          f"バケットの整数キー: {len(rows)} 通り → {len(by_key)} キー = {len(distinct)} バケット")
+
+    # 3) 水温の統計値 (配列版) はスカラー版と同じ (2年分・1時間ごと)
+    ts = np.arange(np.datetime64("2024-01-01T00:00"), np.datetime64("2026-01-01T00:00"), np.timedelta64(60, "m"))
+    scalar = np.array([calculate_historical_sst_precise(t.astype(datetime.datetime)) for t in ts])
+    check(np.array_equal(calculate_historical_sst_vec(ts), scalar), f"水温の統計値: {len(ts)} 時間がスカラー版と一致")
+
+    # 4) 区切り方を変えても、ファイルが重なっていても、結果は同じ
+    data = load_station("akashi")
+    whole = concat(replay_chunks(data, "akashi", tides))
+    pieces = concat(replay_chunks(data, "akashi", tides, chunk_hours=5))
+    check(all(np.array_equal(whole[name], pieces[name]) for name in whole), "5時間ずつ区切っても同じ")
+    with tempfile.TemporaryDirectory() as tmp:
+        os.makedirs(os.path.join(tmp, "akashi"))
+        hourly = data["hourly"].to_dict()
+        for name, lo, hi in (("a", 0, 48), ("b", 24, len(hourly["time"]))):  # 24時間ぶん重ねる
+            part = dict(data, hourly={k: v[lo:hi] for k, v in hourly.items()})
+            with open(os.path.join(tmp, "akashi", f"{name}.json"), "w", encoding="utf-8") as f:
+                json.dump(part, f)
+        heatmap = ScoreHeatmap()
+        split = concat(iter_replay(tmp, tides, ports=["akashi"]))
+        heatmap.add("akashi", split["month"], split["hour"], split["score"])
+    check(all(np.array_equal(whole[name], split[name]) for name in whole) and heatmap.hours("akashi") == len(hourly["time"]),
+          f"重なったファイル: {heatmap.hours('akashi')} 時間 (重複なし)")
+
+    print(f"{failures} 件の不一致")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
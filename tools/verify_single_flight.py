@@ -0,0 +1,92 @@
+# 期限切れの直後に多数のセッションが同じデータを取りに来ても、上流への取得が1回で済むことを確かめる。
+# 保存データ (ResponseStore.swr) に 50 スレッドで同時に取りに行き、取得の回数と合流 (待って共有) の回数を数える。
+#   python tools/verify_single_flight.py
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from matsuri import Metrics, ResponseStore, SingleFlight
+
+SESSIONS = 50
+UPSTREAM_SEC = 0.2  # 上流の応答時間 (この間に来た呼び出しが合流する)
+
+def herd(store, key, fetch_fn, sessions=SESSIONS):
+    barrier = threading.Barrier(sessions)
+    results = [None] * sessions
+    def session(i):
+        barrier.wait()
+        results[i] = store.swr(key, ttl=300, fetch_fn=fetch_fn)
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+    t0 = time.perf_counter()
+    for t in threads: t.start()
+    for t in threads: t.join()
+    return results, time.perf_counter() - t0
+
+def coalesced(metrics):
+    return sum(metrics.counters("coalesced_waits").values())
+
+def main():
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        # 1) 保存がない状態で一斉に取りに来る: 取得は1回、残りは合流するか保存済みを読む
+        metrics = Metrics()
+        store = ResponseStore(os.path.join(tmp, "herd.sqlite3"), metrics=metrics)
+        calls = []
+        def fetch():
+            calls.append(1)
+            time.sleep(UPSTREAM_SEC)
+            return {"fetched_at": time.time(), "value": 42}
+        results, elapsed = herd(store, "open_meteo:34.6,135.0", fetch)
+        ok = len(calls) == 1 and all(r and r["value"] == 42 for r in results)
+        print(("OK  " if ok else "NG  ") + f"{SESSIONS} セッション → 上流 {len(calls)} 回 / 合流 {coalesced(metrics)} / "
+              f"保存済みを読んだ {SESSIONS - 1 - coalesced(metrics)} ({elapsed * 1000:.0f} ms)")
+        failures += not ok
+
+        # 2) 先頭の取得が失敗 (None) しても、待っていた側は取り直さずに失敗を受け取る (上流に押し寄せない)
+        metrics = Metrics()
+        store = ResponseStore(os.path.join(tmp, "fail.sqlite3"), metrics=metrics)
+        calls = []
+        def flaky():
+            calls.append(1)
+            time.sleep(UPSTREAM_SEC if len(calls) == 1 else 0)
+            return None if len(calls) == 1 else {"fetched_at": time.time(), "value": 7}
+        results, _ = herd(store, "tide:flaky", flaky, sessions=5)
+        ok = len(calls) == 1 and results.count(None) == 5
+        print(("OK  " if ok else "NG  ") + f"先頭が失敗: 上流 {len(calls)} 回 / 失敗を返したのは {results.count(None)} セッション")
+        failures += not ok
+
+    # 3) 例外は待っていた側にも同じものを出し、終わったキーは次の呼び出しでまた実行する
+    flight = SingleFlight()
+    started = threading.Event()
+    errors = []
+    def boom():
+        started.set()
+        time.sleep(0.05)
+        raise RuntimeError("upstream down")
+    def waiter():
+        started.wait()
+        try:
+            flight.do("k", lambda: None)
+        except RuntimeError as e:
+            errors.append(e)
+    t = threading.Thread(target=waiter)
+    t.start()
+    try:
+        flight.do("k", boom)
+    except RuntimeError as e:
+        errors.append(e)
+    t.join()
+    value, shared = flight.do("k", lambda: "again")
+    ok = len(errors) == 2 and errors[0] is errors[1] and (value, shared) == ("again", False) and flight.in_flight() == 0
+    print(("OK  " if ok else "NG  ") + "例外の共有と、完了後の再実行")
+    failures += not ok
+
+    print(f"{failures} 件の不一致")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,228 @@
+# calc_strategy_realtime (判定表版) が、判定表化する前の if/elif 版と同じ結果を返すことを
+# 全バケットの組み合わせ (各バケットの境界値を含む代表値) で確かめる。全水深をまとめて出す calc_strategy_all_depths も同じ入力で比べる。
+#   python tools/verify_strategy_table.py
+import datetime
+import itertools
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from matsuri import (JCG_POINTS, DaylightTimeline, calc_strategy_all_depths, calc_strategy_realtime, get_closest_weight,
+                     strategy_from_buckets)
+
+# --- 判定表化する前の実装 (v22.7 そのまま) ---
+def legacy_calc_strategy_realtime(wind_spd, wind_dir, tide_factor, is_rising, temp, cloud, rain, target_depth_mode, sunrise_dt, sunset_dt, current_dt, area_key):
+    tide_dir_deg = 280 if is_rising else 100
+    diff_angle = abs(wind_dir - tide_dir_deg)
+    if diff_angle > 180: diff_angle = 360 - diff_angle
+    is_synced = diff_angle < 90
+    
+    multiplier = 1.1 
+    if tide_factor > 0.7: multiplier += 0.5
+    elif tide_factor > 0.3: multiplier += 0.2
+    if is_synced: multiplier += 0.3 
+    if wind_spd > 7.0: multiplier += 0.2 
+    
+    base_depth = 45 
+    if target_depth_mode == "15m": base_depth = 15
+    elif target_depth_mode == "30m": base_depth = 30
+    elif target_depth_mode == "60m": base_depth = 50 
+    elif target_depth_mode == "80m": base_depth = 65 
+    
+    target_weight = get_closest_weight(base_depth * multiplier)
+    
+    current_month = current_dt.month
+    is_nori_season = current_month in [12, 1, 2, 3, 4]
+    is_summer = current_month in [6, 7, 8]
+
+    # --- ネクタイ形状とメーカー (通常時: ストレート排除ロジック) ---
+    tie_size = "標準カーリー"
+    maker_rec = "推奨例: ジャッカル マスターカーリー / 海遊 WG" 
+
+    if area_key == "naruto":
+        if target_depth_mode in ["60m", "80m"] or tide_factor > 0.5:
+            tie_size = "強波動ビッグカーリー / 極厚ツイン"
+            maker_rec = "推奨例: ジャッカル マスターカーリー強波動 / sasalabo 極厚"
+        else:
+            tie_size = "中太カーリー / バルキー"
+            maker_rec = "推奨例: sasalabo レギュラー / ジャッカル イカクロー"
+            
+    elif area_key == "seto_ohashi":
+        if target_depth_mode in ["60m", "80m"] or tide_factor > 0.6:
+            tie_size = "中太カーリー / ロングワイド"
+            maker_rec = "推奨例: START マジカーリー / 松岡スペシャル"
+        else:
+            tie_size = "スタンダードカーリー / 中細カーリー"
+            maker_rec = "推奨例: START シリコンネクタイ / START ツイン"
+
+    elif area_key == "shodoshima":
+        if target_depth_mode in ["15m", "30m"]:
+            tie_size = "極細ショート / マイクロカーリー"
+            maker_rec = "推奨例: START スキニー / START ショートスキニー"
+        else:
+            tie_size = "ツインカーリー / ロングカーリー"
+            maker_rec = "推奨例: START ツイン / 松岡スペシャル"
+            
+    else: 
+        if is_nori_season or temp < 12.0:
+            tie_size = "極細ショート / マイクロカーリー"
+            maker_rec = "推奨例: ジャッカル フィネスカーリー / 海遊 リトル"
+        elif is_summer:
+            if target_depth_mode in ["60m", "80m"]:
+                tie_size = "ワイドカーリー / ビッグシルエット"
+                maker_rec = "推奨例: ジャッカル マスターカーリー / 海遊 WG"
+            else:
+                tie_size = "フィッシュテール / Wカーリー"
+                maker_rec = "推奨例: 海遊 WGショート / ジャッカル イカクロー"
+        else:
+            if tide_factor > 0.6:
+                tie_size = "ロングカーリー / 強波動"
+                maker_rec = "推奨例: ジャッカル マスターカーリー / 海遊 WG"
+            else:
+                tie_size = "ショートカーリー (標準)"
+                maker_rec = "推奨例: 海遊 シングル / ジャッカル マスターカーリー(カット)"
+
+    # --- 深場×激流の「底取り優先」ロジック (引き抵抗軽減 v22.7) ---
+    # 水深80mで潮が少しでも速ければ(0.4以上)、アピール力より着底を優先
+    if target_depth_mode == "80m" and tide_factor >= 0.4:
+        tie_size = "細身カーリー / スタンダード (底取り・引き抵抗軽減)"
+        if area_key == "shodoshima" or area_key == "seto_ohashi":
+            maker_rec = "推奨例: START シリコンネクタイ / ササラボ レギュラー"
+        else:
+            maker_rec = "推奨例: ジャッカル フィネスカーリー / 海遊 シングル"
+
+    # --- 激渋時のストレート解禁ロジック (どうしても渋い時の最終兵器) ---
+    if tide_factor < 0.2:
+        tie_size = "極細ストレート / マイクロ (激渋対策)"
+        if area_key == "shodoshima" or area_key == "seto_ohashi":
+            maker_rec = "推奨例: ササラボ 極薄ストレート / START スキニー"
+        else:
+            maker_rec = "推奨例: ササラボ 極薄ストレート / ジャッカル フィネス"
+
+    is_mazume = False
+    is_night = False
+    is_daytime = False
+    
+    if sunrise_dt and sunset_dt:
+        current_dt_naive = current_dt.replace(tzinfo=None)
+        sr = datetime.datetime.fromisoformat(sunrise_dt).replace(tzinfo=None)
+        ss = datetime.datetime.fromisoformat(sunset_dt).replace(tzinfo=None)
+        
+        if (sr - datetime.timedelta(minutes=60)) <= current_dt_naive <= (sr + datetime.timedelta(minutes=90)): 
+            is_mazume = True 
+        elif (ss - datetime.timedelta(minutes=60)) <= current_dt_naive <= (ss + datetime.timedelta(minutes=60)): 
+            is_mazume = True 
+        elif current_dt_naive > (sr + datetime.timedelta(minutes=90)) and current_dt_naive < (ss - datetime.timedelta(minutes=60)):
+            is_daytime = True 
+        
+        if current_dt_naive < (sr - datetime.timedelta(minutes=30)) or current_dt_naive > (ss + datetime.timedelta(minutes=30)): 
+            is_night = True
+
+    # --- カラーロジック ---
+    color = "オレンジ / 赤オレ"
+
+    if is_night:
+        color = "グロー / フルブラック (シルエット重視)"
+    elif is_mazume:
+        color = "蛍光オレンジ / ゼブラドット / しましまオレンジ [ファーストカラー]"
+    else:
+        if rain >= 0.5:
+            color = "黒金 (クロキン) / しましまオレンジゴールドラメ [濁り対策]"
+        elif cloud >= 80:
+            if area_key == "naruto": 
+                color = "グローゼブラ / オレンジゴールド"
+            else: 
+                color = "黒金 (クロキン) / マジョーラゼブラ [曇天パターン]"
+        else:
+            if tide_factor < 0.3:
+                if area_key == "akashi" and is_nori_season:
+                    color = "海苔グリーン / コーラ" 
+                elif area_key == "shodoshima" or area_key == "seto_ohashi":
+                    color = "グリーン / ケイムラ (ナチュラル・エビ)"
+                else:
+                    color = "赤黒 (レッドブラック) / スモーク [スレ対策]"
+            else:
+                if target_depth_mode in ["15m", "30m"]:
+                    color = "赤黒 / リバーシブル赤オレ / マスターオレンジ [セカンドカラー]"
+                elif target_depth_mode in ["45m", "60m", "80m"]:
+                    color = "エビオレ / エビチリ / 網みオレ [サードカラー]"
+                
+    speed = "Medium (等速)"
+    tactic = "バーチカル気味 (縦の釣り)"
+    if is_synced and wind_spd > 3.0:
+        tactic = "斜め引き (広範囲攻略)" 
+        speed = "High Speed (早巻き)"
+    elif tide_factor < 0.3:
+        if target_depth_mode == "15m":
+            tactic = "キャスティング (投げて横引き)"
+            speed = "Dead Slow (デッドスロー)"
+        else:
+            tactic = "キャスティング (投げて横引き)"
+            speed = "Dead Slow (デッドスロー)"
+            if temp > 15: speed = "Slow (スロー)"
+        
+    return target_weight, color, tie_size, maker_rec, speed, tactic, is_synced, tide_dir_deg
+
+# --- 各バケットの代表値 (内側と境界)。組み合わせごとに順に使い回して、境界値も全部通す ---
+AREAS = list(JCG_POINTS) + ["unknown_area"]
+DEPTHS = ["15m", "30m", "45m", "60m", "80m"]
+SEASON_MONTHS = {"nori": [1, 4, 12], "summer": [6, 8], "other": [5, 10]}
+TIDE_FACTORS = {
+    "slack": [0.0, 0.1], "weak": [0.2, 0.25], "turn": [0.3], "low": [0.35],
+    "mid": [0.4, 0.5], "mid_high": [0.55, 0.6], "high": [0.65, 0.7], "max": [0.71, 1.0],
+}
+TEMPS = {"cold": [8.0, 11.9], "cool": [12.0, 15.0], "warm": [15.1, 24.0]}
+CLOUDS = {True: [80, 100], False: [0, 79.9, None]}
+RAINS = {True: [0.5, 2.0], False: [0.0, 0.49]}
+WINDS = {"calm": [0.0, 3.0], "breeze": [3.1, 7.0], "strong": [7.1, 12.0]}
+# (風向, 上げ潮)
+SYNCED = {True: [(280, True), (100, False), (200, True)], False: [(100, True), (280, False), (10, True)]}
+SUNRISE = "2025-{m:02d}-15T05:00"
+SUNSET = "2025-{m:02d}-15T19:00"
+# 夜 / マズメ (夜と重なる時間を含む) / 日中 と、その境界
+CLOCKS = {
+    "night": [(2, 0, 0), (4, 15, 0), (4, 29, 59), (19, 30, 1), (19, 45, 0), (23, 0, 0)],
+    "mazume": [(4, 30, 0), (5, 0, 0), (6, 30, 0), (18, 0, 0), (19, 30, 0)],
+    "day": [(6, 30, 1), (12, 0, 0), (17, 59, 59)],
+}
+
+def pick(table, key, k):
+    values = table[key]
+    return values[k % len(values)]
+
+def main():
+    t0 = time.perf_counter()
+    checked = 0
+    skipped = 0
+    mismatches = 0
+    for k, (area, depth, season, tide, temp_b, cloud_b, rain_b, wind_b, synced, phase) in enumerate(itertools.product(
+            AREAS, DEPTHS, SEASON_MONTHS, TIDE_FACTORS, TEMPS, CLOUDS, RAINS, WINDS, SYNCED, CLOCKS)):
+        month = pick(SEASON_MONTHS, season, k)
+        hh, mm, ss = pick(CLOCKS, phase, k)
+        wind_dir, rising = pick(SYNCED, synced, k)
+        args = (pick(WINDS, wind_b, k), wind_dir, pick(TIDE_FACTORS, tide, k), rising, pick(TEMPS, temp_b, k),
+                pick(CLOUDS, cloud_b, k), pick(RAINS, rain_b, k), depth, SUNRISE.format(m=month), SUNSET.format(m=month),
+                datetime.datetime(2025, month, 15, hh, mm, ss), area)
+        try:
+            expected = legacy_calc_strategy_realtime(*args)
+        except TypeError:
+            skipped += 1  # 元の実装は雲量 None を比較すると落ちる
+            continue
+        daylight = DaylightTimeline.from_daily({"sunrise": [args[8]], "sunset": [args[9]]})
+        got = calc_strategy_realtime(*args[:8], daylight, *args[10:])
+        by_depth, is_synced, tide_dir_deg = calc_strategy_all_depths(*args[:7], daylight, *args[10:])
+        got_all = by_depth[depth] + (is_synced, tide_dir_deg)
+        checked += 1
+        if tuple(got) != tuple(expected) or got_all != tuple(expected):
+            mismatches += 1
+            if mismatches <= 10:
+                print("MISMATCH", args, "\n  legacy:", expected, "\n  table: ", got, "\n  all depths:", got_all)
+    info = strategy_from_buckets.cache_info()
+    print(f"checked {checked} inputs ({skipped} skipped) over {info.currsize} buckets, "
+          f"{mismatches} mismatches ({time.perf_counter() - t0:.1f}s)")
+    return 1 if mismatches else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+# 潮流表の蓄積 -> 年間予測 (.npy + index.json) -> アプリでの読み込み、の往復を確かめる。
+# 既知の分潮 (M2・K1) から作った10分おきの表を TideTable の JSON として45日分保存し、build で作った予測を
+# load_harmonic_tide_tables で読み直して、蓄積の外の時刻でも元の潮流を再現しているかを見る。
+# あわせて、JCG ページの取得 (fetch_jcg_tide_table) が成功・失敗をどう返すかも見る。
+#   python tools/verify_tide_tables.py
+import contextlib
+import datetime
+import io
+import json
+import os
+import sys
+import tempfile
+from array import array
+
+import numpy as np
+
+TOOLS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TOOLS, ".."))
+sys.path.insert(0, TOOLS)
+
+import build_tide_tables
+from matsuri import JCG_POINTS, Metrics, TideSource, TideTable, fetch_jcg_tide_table, load_harmonic_tide_tables, tide_columns
+
+JST = datetime.timezone(datetime.timedelta(hours=9), "JST")
+FIXTURES = os.path.join(TOOLS, "..", "bench", "fixtures")
+KEY = "akashi"
+YEAR = 2026
+ARCHIVE_START = np.datetime64("2026-03-01", "D")
+ARCHIVE_DAYS = 45
+TOLERANCE_KT = 0.1  # 表は 0.1kt 刻みなので、その丸め分だけずれてよい
+
+# 元にする潮流: 上げ潮(西流)を正にした流速 = 平均 + Σ 振幅 cos(角速度 × 経過時間 - 位相)
+TRUTH = [(0.2, 0.0, 0.0), (2.5, 28.9841042, 40.0), (0.8, 15.0410686, 110.0)]
+
+def truth(ts):
+    hours = build_tide_tables.hours_since_epoch(np.asarray(ts, dtype="datetime64[m]"))
+    return sum(amp * (np.cos(np.deg2rad(speed * hours - phase)) if speed else 1.0) for amp, speed, phase in TRUTH)
+
+def write_archive(archive_dir):
+    os.makedirs(os.path.join(archive_dir, KEY))
+    minutes = np.arange(0, 24 * 60, build_tide_tables.STEP_MIN)
+    for d in range(ARCHIVE_DAYS):
+        day = ARCHIVE_START + np.timedelta64(d, "D")
+        signed = np.round(truth(day + minutes.astype("timedelta64[m]")), 1)
+        table = TideTable(array("H", minutes.tolist()), array("d", np.abs(signed).tolist()),
+                          array("B", (signed < 0).astype(np.uint8).tolist()), ("西流", "東流"))
+        with open(os.path.join(archive_dir, KEY, f"{day}.json"), "w", encoding="utf-8") as f:
+            f.write(table.to_json())
+
+def main():
+    failures = 0
+    def check(ok, label):
+        nonlocal failures
+        print(("OK  " if ok else "NG  ") + label)
+        failures += not ok
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archive_dir, out_dir = os.path.join(tmp, "archive"), os.path.join(tmp, "tables")
+        write_archive(archive_dir)
+        with contextlib.redirect_stdout(io.StringIO()):
+            build_tide_tables.build(archive_dir, out_dir, YEAR)
+        with open(os.path.join(out_dir, "index.json"), encoding="utf-8") as f:
+            index = json.load(f)
+        check(list(index) == [KEY], f"蓄積のある基準港だけ書き出す: {list(index)}")
+        meta = index[KEY]
+        check(meta["start"] == f"{YEAR}-01-01T00:00" and meta["step_min"] == build_tide_tables.STEP_MIN
+              and meta["rows"] == ARCHIVE_DAYS * 144, f"index.json: {meta['start']} から {meta['step_min']} 分おき、{meta['rows']} 行から")
+        m2 = meta["constituents"]["M2"]
+        check(abs(m2["amp_kt"] - 2.5) < 0.02 and abs(m2["phase_deg"] - 40.0) < 1.0, f"M2 の振幅・位相: {m2}")
+
+        tables = load_harmonic_tide_tables(out_dir)
+        harmonic = tables.get(KEY)
+        check(harmonic is not None and len(harmonic) == (365 + 1) * 144, f"読み込んだ予測の長さ: {len(harmonic) if harmonic is not None else None}")
+        check(isinstance(harmonic.knots, np.memmap), "予測はメモリマップで読む")
+
+        # 蓄積 (3〜4月半ば) の外の時刻でも元の潮流を再現する
+        ts = np.datetime64(f"{YEAR}-01-01T00:00", "m") + np.arange(0, 365 * 144, 997) * np.timedelta64(10, "m")
+        err = np.abs(harmonic.signed_knots(ts) - truth(ts))
+        check(err.max() < TOLERANCE_KT, f"年間を通じて元の潮流との差 {err.max():.3f} kt 以内")
+
+        dt = datetime.datetime(YEAR, 8, 10, 13, 20, tzinfo=JST)
+        one = harmonic.signed_knot(dt)
+        check(one is not None and abs(one - float(truth([np.datetime64("2026-08-10T13:20")])[0])) < TOLERANCE_KT,
+              f"1時刻だけ引いても同じ: {one:.2f} kt")
+        outside = harmonic.signed_knots(np.array(["2025-12-31T23:00", f"{YEAR + 1}-01-02T00:10"], dtype="datetime64[m]"))
+        check(np.isnan(outside).all() and harmonic.signed_knot(datetime.datetime(YEAR + 1, 1, 3, tzinfo=JST)) is None,
+              "予測の範囲外は NaN / None")
+
+        # 公式表の無い日は、予測の符号から流向・流速を決める
+        port_info = JCG_POINTS[KEY]
+        now = datetime.datetime(YEAR, 8, 9, 12, 0, tzinfo=JST)
+        times = np.datetime64("2026-08-10T06:00", "m") + np.arange(12) * np.timedelta64(60, "m")
+        _, rising, knot, official = tide_columns(times, now, port_info, TideSource(harmonic=tables))
+        signed = truth(times - np.timedelta64(port_info.offset_min, "m"))
+        check(not official.any() and np.abs(knot - np.abs(signed)).max() < TOLERANCE_KT and (rising == (signed > 0)).all(),
+              "翌日の予報列は年間予測を使う")
+
+    # JCG の取得: 渡した get でページを取り、失敗は None と upstream_failures で返す
+    with open(os.path.join(FIXTURES, f"stream_{KEY}.html"), "rb") as f:
+        page = f.read()
+    metrics = Metrics()
+    table = fetch_jcg_tide_table(JCG_POINTS[KEY].url, get=lambda url: page, metrics=metrics)
+    check(table is not None and len(table) and table.fetched_at is not None, f"取得したページを表にする: {len(table) if table else 0} 行")
+    check(set(metrics.series("fetch")) == {(("source", "jcg"),)} and set(metrics.series("parse")) == {(("source", "jcg"),)},
+          "取得・解析の時間を記録する")
+    def broken(url):
+        raise OSError("connection refused")
+    check(fetch_jcg_tide_table(JCG_POINTS[KEY].url, get=broken, metrics=metrics) is None
+          and metrics.counters("upstream_failures") == {(("source", "jcg"),): 1}, "取得に失敗したら None と失敗数")
+    check(fetch_jcg_tide_table(JCG_POINTS[KEY].url, get=lambda url: b"<html></html>") is None, "表の無いページは None")
+
+    print(f"{failures} 件の不一致")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())